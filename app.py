@@ -1,13 +1,134 @@
 import streamlit as st
-from core.session import init_state
-from ui.layout import render_header, render_messages, render_footer
+from core.session import init_state, reset_messages
+from core.timeline import Timeline, StoredTimeline
+from ui.layout import render_header, render_messages, render_history, render_footer
 from ui.sidebar import render_sidebar
-from core.processor import process_uploaded_files
+from core.processor import ingest
 from core.agents import Employee, Manager
-from core.export import build_export_package
+from core.convergence import ConvergencePolicy
+from core.cache import shared_cache
+from core.retrieval import build_index, report_key
+from core.export import build_export_package, COMPRESSION, DEFAULT_COMPRESSION
+from core.jobs import shared_jobs, Saturated
+from core.eventlog import shared_log
+from core.memory import SUMMARY_MODEL
+from core.routing import ModelRouter
+from config.predefined_agents import PREDEFINED_AGENTS
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 import uuid
-import time
+import re
+import os
+
+@st.fragment(run_every=0.5)
+def follow_run():
+    # Polls the background run for this session; widget clicks elsewhere no longer interrupt it.
+    job = shared_jobs().get(st.session_state.session_id)
+    if job is None:
+        return
+    finished = not job.active
+    new, st.session_state.run_cursor, live = job.poll(st.session_state.run_cursor)
+    st.session_state.timeline.extend(new)
+    for ev in new:
+        if ev.get("plan"):
+            st.session_state.run_steps = len(ev["plan"]) + 2
+    if finished:
+        st.session_state.export_ready = job.status == "done"
+        st.rerun(scope="app")
+    calls = sum(st.session_state.timeline.counts[t] for t in ("plan", "agent", "final_result"))
+    c1, c2 = st.columns([4, 1])
+    c1.progress(min(calls / max(st.session_state.get("run_steps", 1), 1), 1.0), text="Waiting for a free worker..." if job.status == "queued" else f"Processing: {st.session_state.messages[-1].get('sender', 'System') if st.session_state.messages else 'Manager'}")
+    if c2.button("⏹️ Cancel Run", use_container_width=True):
+        shared_jobs().cancel(st.session_state.session_id)
+    render_messages()
+    if live:
+        with st.chat_message("assistant", avatar=PREDEFINED_AGENTS.get(live[0], {}).get("icon", "🤖")):
+            st.markdown(f"**{live[0]}** ✍️")
+            st.markdown(live[1] + "▌")
+
+def run_config() -> Dict[str, Any]:
+    # Everything needed to rebuild the run later (resume); the API key is deliberately left out.
+    return {
+        "task": st.session_state.current_task,
+        "user_suggestions": st.session_state.user_suggestions,
+        "file_content": st.session_state.file_content,
+        "index_key": st.session_state.get("index_key"),
+        "agents_cfg": st.session_state.agents_cfg,
+        "max_turns": st.session_state.max_turns,
+        "deterministic": st.session_state.deterministic,
+        "use_cache": st.session_state.use_cache,
+        "early_stop": st.session_state.early_stop,
+        "novelty_threshold": st.session_state.novelty_threshold,
+        "stream": st.session_state.stream_responses,
+        "parallel": st.session_state.parallel_rounds,
+        "mode": st.session_state.workflow,
+        "summaries": st.session_state.rolling_summaries,
+        "routes": st.session_state.model_routes if st.session_state.model_routing else None,
+        "layout": "stable" if st.session_state.stable_prompts else "window",
+    }
+
+def start_run(session_id: str, cfg: Dict[str, Any], replay: Optional[List[str]] = None):
+    # A resumed run also reuses the digests its interrupted run logged.
+    digests = shared_log().digests(session_id) if replay is not None else None
+    files_blob = "\n\n".join([f"=== {n} ===\n{c}" for n, c in cfg["file_content"].items()])
+    gen = {"temperature": 0.0 if cfg["deterministic"] else 0.7, "cache": shared_cache() if cfg["use_cache"] else None}
+    employees = [Employee(role=a['role'], goal=a['goal'], expertise=a.get('expertise', ''), api_key=st.session_state.api_key, **gen) for a in cfg["agents_cfg"]]
+    routes = cfg.get("routes")
+    router = ModelRouter.from_config(routes) if routes else None
+    summary_model = ((routes or {}).get("phases", {}).get("summary") or SUMMARY_MODEL) if cfg.get("summaries") else None
+    manager = Manager(employees=employees, api_key=st.session_state.api_key, max_turns=cfg["max_turns"], index=build_index(cfg["file_content"], cfg.get("index_key")), convergence=ConvergencePolicy(enabled=cfg["early_stop"], threshold=cfg["novelty_threshold"]), journal=shared_log().journal(session_id), catalog=PREDEFINED_AGENTS, summary_model=summary_model, router=router, layout=cfg.get("layout", "window"), session_id=session_id, **gen)
+    try:
+        shared_jobs().submit(session_id, lambda: manager.adelegate_task(cfg["task"], files_blob, cfg["user_suggestions"], stream=cfg["stream"], parallel=cfg["parallel"], replay=replay, mode=cfg.get("mode", "rounds"), digests=digests))
+    except Saturated as ex:
+        st.error(f"🚦 {ex}")
+        return
+
+    # Model calls the run will make at most: the fixed rounds, the consensus turns, then synthesis.
+    # In graph mode this is a guess (plan + one node per agent + synthesis) until the plan arrives.
+    rounds = Manager.MIN_ROUNDS * len(employees)
+    st.session_state.run_steps = len(employees) + 2 if cfg.get("mode") == "graph" else rounds + max(cfg["max_turns"] - rounds, 1) + 1
+    st.session_state.run_cursor = 0
+    reset_messages()
+    st.session_state.export_ready = False
+
+# Single-user deployments can list every logged session (including CLI runs) in the history.
+SHARED_HISTORY = os.environ.get("KREW_SHARED_HISTORY", "") == "1"
+
+BUSY = "🚦 The server is at capacity (runs executing and waiting). Try again shortly."
+
+EXPORT_LABELS = {"deflate-fast": "Fast", "deflate": "Balanced", "deflate-max": "Smallest", "zstd": "zstd", "stored": "Uncompressed"}
+# From this version st.download_button accepts a callable and builds the download on click.
+LAZY_DOWNLOAD_SINCE = (1, 50)
+LAZY_DOWNLOAD = tuple(int(x) for x in re.findall(r"\d+", st.__version__)[:2]) >= LAZY_DOWNLOAD_SINCE
+
+def export_panel(session_id: str, tl: Timeline, agents_cfg: List[Dict[str, Any]], max_turns: int):
+    st.divider()
+    if tl.final is None:
+        return
+    st.subheader("📤 Export")
+    c1, c2 = st.columns([1, 2])
+    compression = c1.selectbox("Compression", list(COMPRESSION), index=list(COMPRESSION).index(DEFAULT_COMPRESSION), format_func=EXPORT_LABELS.get, label_visibility="collapsed")
+    # The events are only read when the package is built (a stored replay loads them then).
+    version = len(tl)
+    name = f"krew_session_{session_id[:8]}.zip"
+
+    def make() -> bytes:
+        # The spooled package is read and closed here, so a large one's temp file goes with it.
+        with build_export_package(session_id, tl.events[:version], agents_cfg, max_turns, compression) as fh:
+            return fh.read()
+
+    if LAZY_DOWNLOAD:
+        # Built on click; nothing is kept between reruns.
+        c2.download_button("📦 Download Package", data=make, file_name=name, mime="application/zip", use_container_width=True)
+        return
+    # Eager path: the prepared package is kept in this browser session only, until the run
+    # has new events or another compression is picked.
+    key = (session_id, version, compression)
+    if st.session_state.get("export_key") == key or c2.button("📦 Prepare Package", use_container_width=True):
+        if st.session_state.get("export_key") != key:
+            st.session_state.export_data = make()
+            st.session_state.export_key = key
+        c2.download_button("⬇️ Download Package", data=st.session_state.export_data, file_name=name, mime="application/zip", use_container_width=True)
 
 def main():
     st.set_page_config(page_title="Krew Pro - AI Agent Organization", page_icon="🤖", layout="wide", initial_sidebar_state="expanded")
@@ -24,8 +145,15 @@ def main():
         files = st.file_uploader("Upload documents", accept_multiple_files=True, type=["pdf", "docx", "txt", "csv"])
         if files:
             with st.spinner("Processing files..."):
-                st.session_state.file_content = process_uploaded_files(files)
-            st.success(f"Processed {len(st.session_state.file_content)} file(s)")
+                st.session_state.file_content, report = ingest(files)
+                st.session_state.index_key = report_key(report)
+            fresh = [r for r in report if not r["cached"]]
+            st.success(f"Processed {len(st.session_state.file_content)} file(s)" + (f" · {len(fresh)} extracted in {sum(r['seconds'] for r in fresh):.2f}s" if fresh else " · all cached"))
+            with st.expander("⏱️ Ingestion Report", expanded=False):
+                st.dataframe([{"File": r["name"], "KB": round(r["bytes"] / 1024, 1), "Chars": r["chars"], "Seconds": round(r["seconds"], 3), "Cached": r["cached"]} for r in report], use_container_width=True, hide_index=True)
+            idx = build_index(st.session_state.file_content, st.session_state.index_key)
+            if idx:
+                st.caption(f"🔎 Indexed {idx.n:,} chunks · {len(idx.vocab):,} terms")
             for name, content in st.session_state.file_content.items():
                 with st.expander(f"📄 {name} ({len(content)} chars)"):
                     st.text_area("Preview", content[:500] + ("..." if len(content) > 500 else ""), height=120, disabled=True)
@@ -102,51 +230,55 @@ def main():
         if not st.session_state.api_key.startswith("sk-") or not st.session_state.current_task.strip() or not st.session_state.agents_cfg:
             st.stop()
 
-        st.session_state.messages = []
-        files_blob = ""
-        if st.session_state.file_content:
-            files_blob = "\n\n".join([f"=== {n} ===\n{c}" for n, c in st.session_state.file_content.items()])
-
-        employees = []
-        for a in st.session_state.agents_cfg:
-            employees.append(Employee(role=a['role'], goal=a['goal'], expertise=a.get('expertise', ''), api_key=st.session_state.api_key))
-
-        manager = Manager(employees=employees, api_key=st.session_state.api_key, max_turns=st.session_state.max_turns)
-
-        progress = st.progress(0.0)
-        status = st.empty()
-        steps = len(employees) * st.session_state.max_turns + 6
-        count = 0
-
-        for out in manager.delegate_task(st.session_state.current_task, file_content=files_blob, user_suggestions=st.session_state.user_suggestions):
-            st.session_state.messages.append(out)
-            count += 1
-            progress.progress(min(count / steps, 1.0))
-            if out.get("type") == "final_result":
-                status.text("Completed")
-                progress.progress(1.0)
-                st.session_state.export_ready = True
-                break
-            else:
-                status.text(f"Processing: {out.get('sender', 'System')}")
-            time.sleep(0.2)
-        progress.empty()
-        status.empty()
-        st.rerun()
+        st.session_state.replay_id = None
+        if shared_jobs().admits(st.session_state.session_id):
+            cfg = run_config()
+            shared_log().start(st.session_state.session_id, cfg)
+            if st.session_state.session_id not in st.session_state.own_sessions:
+                st.session_state.own_sessions.append(st.session_state.session_id)
+            start_run(st.session_state.session_id, cfg)
+        else:
+            st.error(BUSY)
+
+    # Only this browser session's runs, unless the deployment opts in to a shared history.
+    action = render_history(shared_log().sessions(ids=None if SHARED_HISTORY else st.session_state.own_sessions), shared_jobs())
+    if action:
+        kind, sid = action
+        if kind == "replay":
+            st.session_state.replay_id = sid
+            st.rerun()
+        elif shared_jobs().admits(sid):
+            st.session_state.replay_id = None
+            st.session_state.session_id = sid
+            start_run(sid, shared_log().session(sid)["config"], replay=shared_log().resume(sid))
+            st.rerun()
+        else:
+            st.error(BUSY)
 
-    if st.session_state.messages:
+    job = shared_jobs().get(st.session_state.session_id)
+    if job is not None and not job.active and st.session_state.run_cursor < len(job.events):
+        # The run ended between fragment ticks (or appended its cancel/fail notice after the last
+        # one): take the remaining events here, since the fragment is no longer rendered.
+        new, st.session_state.run_cursor, _ = job.poll(st.session_state.run_cursor)
+        st.session_state.timeline.extend(new)
+        st.session_state.export_ready = job.status == "done"
+    if job is not None and job.active:
+        follow_run()
+    elif st.session_state.replay_id:
+        # Replayed sessions are read from the event log on each render, not kept in session state.
+        past = shared_log().session(st.session_state.replay_id)
+        st.info(f"Replaying session `{past['session_id'][:8]}` ({past['status']}): {past['task'][:80]}")
+        if st.button("✖️ Close Replay"):
+            st.session_state.replay_id = None
+            st.rerun()
+        tl = StoredTimeline(shared_log(), past["session_id"])
+        render_messages(tl)
+        export_panel(past["session_id"], tl, past["config"]["agents_cfg"], past["config"]["max_turns"])
+    elif st.session_state.messages:
         render_messages()
 
-    st.divider()
-    if st.session_state.messages and any(m.get("type") == "final_result" for m in st.session_state.messages):
-        st.subheader("📤 Export")
-        data = build_export_package(
-            session_id=st.session_state.session_id,
-            messages=st.session_state.messages,
-            agents_cfg=st.session_state.agents_cfg,
-            max_turns=st.session_state.max_turns
-        )
-        st.download_button("📦 Download Package", data=data, file_name=f"krew_session_{st.session_state.session_id[:8]}.zip", mime="application/zip", use_container_width=True)
+    if not st.session_state.replay_id:
+        export_panel(st.session_state.session_id, st.session_state.timeline, st.session_state.agents_cfg, st.session_state.max_turns)
 
     render_footer()
 
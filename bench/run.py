@@ -0,0 +1,143 @@
+from typing import Dict, Any
+import multiprocessing as mp
+import urllib.request
+import tracemalloc
+import argparse
+import resource
+import json
+import time
+import sys
+
+from config.predefined_agents import PREDEFINED_AGENTS, MODEL_ROUTES
+from core.agents import Employee, Manager
+from core.convergence import ConvergencePolicy
+from core.memory import SUMMARY_MODEL
+from core.routing import ModelRouter
+from core.telemetry import summarize
+from core.lookahead import DEFAULT_DEPTH
+from bench.stub_server import StubConfig, serve
+
+TASK = "Create a go-to-market plan for a B2B analytics product, with budget, timeline and risks."
+FILES = "\n".join(f"Row {i}: region={['EU', 'US', 'APAC'][i % 3]} revenue={1000 + 37 * i} churn={(i * 7) % 13}%" for i in range(2000))
+
+def _serve_child(cfg: Dict[str, Any], q):
+    serve(0, StubConfig(**cfg), ready=q).serve_forever()
+
+def start_stub(cfg: Dict[str, Any]):
+    # The stub runs in its own process so its threads and allocations stay out of the measurements.
+    ctx = mp.get_context("spawn")
+    q = ctx.Queue()
+    p = ctx.Process(target=_serve_child, args=(cfg, q), daemon=True)
+    p.start()
+    return p, f"http://127.0.0.1:{q.get(timeout=30)}/v1"
+
+def stub_stats(url: str, reset: bool = False) -> Dict[str, Any]:
+    req = urllib.request.Request(url + ("/stats/reset" if reset else "/stats"), data=b"{}" if reset else None, method="POST" if reset else "GET")
+    with urllib.request.urlopen(req) as r:
+        return json.loads(r.read())
+
+def run_once(url: str, team: int, turns: int, a) -> Dict[str, Any]:
+    roles = list(PREDEFINED_AGENTS)
+    employees = [Employee(role=roles[i % len(roles)], goal=PREDEFINED_AGENTS[roles[i % len(roles)]]["goal"], expertise=PREDEFINED_AGENTS[roles[i % len(roles)]]["expertise"], api_key="sk-bench", base_url=url, agent_id=f"agent-{i}") for i in range(team)]
+    manager = Manager(employees, api_key="sk-bench", max_turns=turns, base_url=url, convergence=ConvergencePolicy(enabled=a.early_stop), catalog=PREDEFINED_AGENTS, summary_model=SUMMARY_MODEL if a.summarize else None, router=ModelRouter.from_config(MODEL_ROUTES) if a.route else None, layout=a.layout)
+    stub_stats(url, reset=True)
+    if a.memory:
+        tracemalloc.start()
+    phases: Dict[str, float] = {}
+    # Phase boundaries use the events' own monotonic times, so consumer delay and lookahead
+    # buffering do not shift them.
+    phase, mark = "brief", time.monotonic_ns() / 1e9
+    t0 = mark
+    events = deltas = 0
+    done = []
+    error = None
+    try:
+        for ev in manager.delegate_task(TASK, file_content=FILES if a.files else "", stream=a.stream, parallel=a.parallel, mode=a.mode, lookahead=a.lookahead):
+            now = ev.t_ns / 1e9
+            if ev.get("phase"):
+                phases[phase] = phases.get(phase, 0.0) + now - mark
+                phase, mark = ev["phase"], now
+            if ev["type"] == "agent_delta":
+                deltas += 1
+            else:
+                events += 1
+                if a.route:
+                    done.append(ev)
+                if a.render_s:
+                    time.sleep(a.render_s)
+    except Exception as ex:
+        error = f"{type(ex).__name__}: {ex}"
+    end = time.monotonic_ns() / 1e9
+    phases[phase] = phases.get(phase, 0.0) + end - mark
+    peak = None
+    if a.memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    wall = end - t0
+    s = stub_stats(url)
+    return {
+        "team": team, "max_turns": turns, "mode": a.mode, "stream": a.stream, "parallel": a.parallel, "early_stop": a.early_stop, "summarize": a.summarize, "route": a.route, "layout": a.layout,
+        "wall_s": round(wall, 4),
+        "phases_s": {k: round(v, 4) for k, v in phases.items()},
+        "events": events, "deltas": deltas, "events_per_s": round((events + deltas) / wall, 1) if wall else None,
+        "requests": s["requests"], "failures": s["failures"],
+        "prompt_tokens_sent": s["prompt_tokens"], "cached_tokens": s["cached_tokens"], "completion_tokens": s["completion_tokens"],
+        "prefix_overlap": manager.prefix_monitor.summary()["overlap"] if manager.prefix_monitor else None,
+        "server_s": round(s["server_seconds"], 4),
+        # Time not spent inside the stub; only meaningful when calls do not overlap (parallel=False).
+        "overhead_s": None if a.parallel else round(wall - s["server_seconds"], 4),
+        "peak_py_mem_bytes": peak,
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "by_route": summarize(done)["by_route"] if a.route else None,
+        "render_s": a.render_s, "lookahead": manager.lookahead.summary() if manager.lookahead else None,
+        "error": error,
+    }
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark Manager.delegate_task against a local chat-completions stub.")
+    ap.add_argument("--teams", default="1,2,4,6,8,10")
+    ap.add_argument("--turns", default="5,12,25")
+    ap.add_argument("--repeat", type=int, default=1)
+    ap.add_argument("--warmup", type=int, default=1, help="Discarded runs first (tokenizer load, event loop, connection setup).")
+    ap.add_argument("--latency", default="const:0.02", help="const:S | uniform:A,B | normal:MU,SD | lognormal:MEDIAN,SIGMA")
+    ap.add_argument("--tps", type=float, default=0.0, help="Stub completion tokens per second (0 = instant).")
+    ap.add_argument("--completion-tokens", type=int, default=120)
+    ap.add_argument("--fail-rate", type=float, default=0.0)
+    ap.add_argument("--fail-status", type=int, default=500)
+    ap.add_argument("--final-rate", type=float, default=0.0, help="Chance a consensus reply contains FINAL_ANSWER (0 = always run every turn).")
+    ap.add_argument("--mode", choices=["rounds", "graph"], default="rounds", help="Manager workflow; the stub never returns a valid plan, so graph runs use the one-node-per-agent fallback.")
+    ap.add_argument("--layout", choices=list(Manager.LAYOUTS), default="window", help="Prompt layout; 'stable' keeps a shared prefix and an append-only log.")
+    ap.add_argument("--prefill-tps", type=float, default=0.0, help="Stub prompt tokens per second outside its prefix cache (0 = free).")
+    ap.add_argument("--prefix-cache", action="store_true", help="Stub emulates provider prefix caching.")
+    ap.add_argument("--lookahead", type=int, default=DEFAULT_DEPTH, help="Events the run may get ahead of the consumer (0 = advance only on demand).")
+    ap.add_argument("--render-s", type=float, default=0.0, help="Consumer time per complete event, standing in for UI rendering.")
+    ap.add_argument("--stream", action="store_true")
+    ap.add_argument("--parallel", action="store_true")
+    ap.add_argument("--early-stop", action="store_true", help="Enable convergence early stop (off by default for comparable runs).")
+    ap.add_argument("--summarize", action="store_true", help="Condense older rounds with the summary model (rolling memory).")
+    ap.add_argument("--route", action="store_true", help="Route models per phase/role with MODEL_ROUTES from config/predefined_agents.py.")
+    ap.add_argument("--files", action="store_true", help="Attach a synthetic 2000-row document.")
+    ap.add_argument("--memory", action="store_true", help="Track peak Python allocations (tracemalloc slows the run).")
+    ap.add_argument("--out", default="-", help="JSON Lines output path, '-' for stdout.")
+    a = ap.parse_args()
+
+    proc, url = start_stub({"latency": a.latency, "tps": a.tps, "completion_tokens": a.completion_tokens, "fail_rate": a.fail_rate, "fail_status": a.fail_status, "final_rate": a.final_rate, "prefill_tps": a.prefill_tps, "prefix_cache": a.prefix_cache})
+    out = sys.stdout if a.out == "-" else open(a.out, "w", encoding="utf-8")
+    try:
+        for _ in range(a.warmup):
+            run_once(url, 1, 5, a)
+        for team in [int(x) for x in a.teams.split(",")]:
+            for turns in [int(x) for x in a.turns.split(",")]:
+                for rep in range(a.repeat):
+                    row = run_once(url, team, turns, a)
+                    row["repeat"] = rep
+                    out.write(json.dumps(row) + "\n")
+                    out.flush()
+                    print(f"team={team:>2} turns={turns:>2} wall={row['wall_s']:.3f}s overhead={row['overhead_s']} req={row['requests']} tok={row['prompt_tokens_sent']} cached={row['cached_tokens']} overlap={row['prefix_overlap']}" + (f" ERROR {row['error']}" if row["error"] else ""), file=sys.stderr)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        proc.terminate()
+
+if __name__ == "__main__":
+    main()
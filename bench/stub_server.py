@@ -0,0 +1,163 @@
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Any, Callable
+from collections import deque
+from core.prefix import common_prefix, cacheable
+import argparse
+import threading
+import random
+import json
+import time
+
+WORDS = "analysis market risk plan data team user growth cost revenue timeline metric launch review quality scope budget customer feature roadmap".split()
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    # "const:0.2", "uniform:0.1,0.5", "normal:0.3,0.05", "lognormal:0.3,0.5" (median, sigma); seconds.
+    kind, _, args = spec.partition(":")
+    a = [float(x) for x in args.split(",")] if args else []
+    if kind == "const":
+        return lambda r: a[0]
+    if kind == "uniform":
+        return lambda r: r.uniform(a[0], a[1])
+    if kind == "normal":
+        return lambda r: max(0.0, r.gauss(a[0], a[1]))
+    if kind == "lognormal":
+        import math
+        return lambda r: r.lognormvariate(math.log(a[0]), a[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+class StubConfig:
+    def __init__(self, latency: str = "const:0.05", tps: float = 0.0, completion_tokens: int = 120, fail_rate: float = 0.0, fail_status: int = 500, final_rate: float = 0.25, seed: int = 0, prefill_tps: float = 0.0, prefix_cache: bool = False):
+        self.latency = parse_latency(latency)
+        self.tps = tps
+        self.completion_tokens = completion_tokens
+        self.fail_rate = fail_rate
+        self.fail_status = fail_status
+        self.final_rate = final_rate
+        # Prompt tokens per second not served from the emulated prefix cache (0 = free).
+        self.prefill_tps = prefill_tps
+        self.prefix_cache = prefix_cache
+        self.recent: deque = deque(maxlen=64)
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "failures": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0, "server_seconds": 0.0}
+
+    def draw(self) -> Dict[str, Any]:
+        with self.lock:
+            r = self.rng
+            return {"latency": self.latency(r), "fail": r.random() < self.fail_rate, "final": r.random() < self.final_rate, "words": [r.choice(WORDS) for _ in range(self.completion_tokens)]}
+
+    def cached(self, messages) -> int:
+        # Provider-style prefix cache: the longest prefix shared with a recent prompt, counted
+        # in 128-token steps from 1024 tokens on.
+        if not self.prefix_cache:
+            return 0
+        text = "".join(f"{m.get('role')}\x00{m.get('content') or ''}\x01" for m in messages)
+        with self.lock:
+            n = max((common_prefix(text, prev) for prev in self.recent), default=0)
+            self.recent.append(text)
+        return cacheable(n // 4)
+
+    def add(self, **kw):
+        with self.lock:
+            for k, v in kw.items():
+                self.stats[k] += v
+
+def make_handler(cfg: StubConfig):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body go out as separate small writes; without this, Nagle + delayed ACK
+        # adds ~40 ms per response and swamps the orchestration overhead being measured.
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def _json(self, code: int, payload: Dict[str, Any], headers: Dict[str, str] = None):
+            body = json.dumps(payload).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/stats"):
+                with cfg.lock:
+                    return self._json(200, dict(cfg.stats))
+            self._json(404, {"error": {"message": "not found"}})
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if self.path.rstrip("/").endswith("/stats/reset"):
+                with cfg.lock:
+                    cfg.stats = {k: 0 for k in cfg.stats}
+                return self._json(200, {"ok": True})
+            t0 = time.perf_counter()
+            req = json.loads(body or b"{}")
+            d = cfg.draw()
+            prompt_tokens = sum(len(m.get("content") or "") for m in req.get("messages", [])) // 4
+            cached = min(cfg.cached(req.get("messages", [])), prompt_tokens)
+            cfg.add(requests=1, prompt_tokens=prompt_tokens, cached_tokens=cached)
+            time.sleep(d["latency"] + ((prompt_tokens - cached) / cfg.prefill_tps if cfg.prefill_tps else 0.0))
+            if d["fail"]:
+                cfg.add(failures=1, server_seconds=time.perf_counter() - t0)
+                headers = {"retry-after": "1", "x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "1s"} if cfg.fail_status == 429 else {}
+                return self._json(cfg.fail_status, {"error": {"message": "injected failure", "type": "stub_error"}}, headers)
+            words = d["words"]
+            last = req.get("messages", [{}])[-1].get("content") or ""
+            if d["final"] and "CONSENSUS" in last:
+                words = words + ["FINAL_ANSWER:"] + words[:20]
+            usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(words), "total_tokens": prompt_tokens + len(words), "prompt_tokens_details": {"cached_tokens": cached}}
+            cfg.add(completion_tokens=len(words))
+            model = req.get("model", "stub")
+            if req.get("stream"):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                def chunk(payload: str):
+                    data = f"data: {payload}\n\n".encode()
+                    self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                    self.wfile.flush()
+                for w in words:
+                    if cfg.tps:
+                        time.sleep(1 / cfg.tps)
+                    chunk(json.dumps({"id": "stub", "object": "chat.completion.chunk", "created": 0, "model": model, "choices": [{"index": 0, "delta": {"content": w + " "}, "finish_reason": None}]}))
+                if (req.get("stream_options") or {}).get("include_usage"):
+                    chunk(json.dumps({"id": "stub", "object": "chat.completion.chunk", "created": 0, "model": model, "choices": [], "usage": usage}))
+                chunk("[DONE]")
+                self.wfile.write(b"0\r\n\r\n")
+            else:
+                if cfg.tps:
+                    time.sleep(len(words) / cfg.tps)
+                self._json(200, {"id": "stub", "object": "chat.completion", "created": 0, "model": model, "choices": [{"index": 0, "message": {"role": "assistant", "content": " ".join(words)}, "finish_reason": "stop"}], "usage": usage})
+            cfg.add(server_seconds=time.perf_counter() - t0)
+    return Handler
+
+def serve(port: int = 0, cfg: StubConfig = None, ready=None) -> ThreadingHTTPServer:
+    srv = ThreadingHTTPServer(("127.0.0.1", port), make_handler(cfg or StubConfig()))
+    srv.daemon_threads = True
+    if ready is not None:
+        ready.put(srv.server_port)
+    return srv
+
+def main():
+    ap = argparse.ArgumentParser(description="Local stub of the OpenAI chat completions endpoint.")
+    ap.add_argument("--port", type=int, default=8089)
+    ap.add_argument("--latency", default="const:0.05")
+    ap.add_argument("--tps", type=float, default=0.0, help="Completion tokens per second (0 = instant).")
+    ap.add_argument("--completion-tokens", type=int, default=120)
+    ap.add_argument("--fail-rate", type=float, default=0.0)
+    ap.add_argument("--fail-status", type=int, default=500)
+    ap.add_argument("--final-rate", type=float, default=0.25)
+    ap.add_argument("--prefill-tps", type=float, default=0.0, help="Uncached prompt tokens per second (0 = free).")
+    ap.add_argument("--prefix-cache", action="store_true", help="Emulate provider prefix caching (reports cached_tokens).")
+    a = ap.parse_args()
+    srv = serve(a.port, StubConfig(a.latency, a.tps, a.completion_tokens, a.fail_rate, a.fail_status, a.final_rate, prefill_tps=a.prefill_tps, prefix_cache=a.prefix_cache))
+    print(f"Stub listening on http://127.0.0.1:{srv.server_port}/v1")
+    srv.serve_forever()
+
+if __name__ == "__main__":
+    main()
@@ -61,3 +61,24 @@ PREDEFINED_AGENTS = {
         "icon": "✅"
     }
 }
+
+# Model tiers used when "Model Routing" is on. Rules are looked up as "role/phase", then role,
+# then phase; anything unmatched uses the agent's default model. Phases: plan, round1, round2,
+# consensus, graph, synthesis, summary. With slo_s set, a model whose recent median time to
+# first token exceeds it is replaced by its fallback for a minute.
+MODEL_ROUTES = {
+    "phases": {
+        "round1": "gpt-4.1-nano",
+        "summary": "gpt-4.1-nano",
+        "synthesis": "gpt-4o",
+    },
+    "roles": {
+        "Legal Consultant/consensus": "gpt-4o",
+    },
+    "fallback": {
+        "gpt-4o": "gpt-4o-mini",
+        "gpt-4.1": "gpt-4.1-mini",
+        "gpt-4o-mini": "gpt-4.1-nano",
+    },
+    "slo_s": 8.0,
+}
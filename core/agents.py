@@ -1,11 +1,39 @@
-from typing import List, Dict, Any, Generator
-from datetime import datetime
-from openai import OpenAI
+from typing import List, Dict, Any, Generator, AsyncGenerator, AsyncIterator, Iterator, Optional, Tuple
+from openai import AsyncOpenAI
+from core.clients import get_async_client, event_loop
+from core.cache import ResponseCache, cache_key
+from core.transcript import Transcript
+from core.tokens import PromptBudget, tokenizer_for
+from core.retrieval import DocumentIndex
+from core.convergence import ConvergencePolicy, ConvergenceMonitor
+from core.telemetry import estimate_cost
+from core.ratelimit import RateScheduler, shared_scheduler, priority_for, DEFAULT_PRIORITY, NO_SESSION
+from core.eventlog import Journal
+from core.memory import RollingMemory, Digest
+from core.routing import ModelRouter
+from core.prefix import PrefixMonitor
+from core.lookahead import Lookahead, DEFAULT_DEPTH
+from core.events import Event, EventType
+from core.taskgraph import Node, plan_prompt, parse_plan, fallback_plan, render_plan, depth
+from collections import deque
+import asyncio
 import uuid
 import time
 
+def iter_sync(agen: AsyncGenerator) -> Iterator:
+    # Drive an async generator from sync code (Streamlit script thread) on the shared loop.
+    loop = event_loop()
+    try:
+        while True:
+            try:
+                yield asyncio.run_coroutine_threadsafe(agen.__anext__(), loop).result()
+            except StopAsyncIteration:
+                break
+    finally:
+        asyncio.run_coroutine_threadsafe(agen.aclose(), loop).result()
+
 class Agent:
-    def __init__(self, role: str, goal: str, model: str = "gpt-4o-mini", api_key: str = None, expertise: str = "", agent_id: str = None):
+    def __init__(self, role: str, goal: str, model: str = "gpt-4o-mini", api_key: str = None, expertise: str = "", agent_id: str = None, base_url: str = None, temperature: float = 0.7, max_tokens: int = None, cache: Optional[ResponseCache] = None, budget: Optional[PromptBudget] = None, scheduler: Optional[RateScheduler] = None):
         if not api_key:
             raise ValueError("OpenAI API key is required.")
         self.role = role
@@ -13,82 +41,475 @@ class Agent:
         self.model = model
         self.expertise = expertise
         self.agent_id = agent_id or str(uuid.uuid4())
-        self.client = OpenAI(api_key=api_key)
+        self.api_key = api_key
+        self.base_url = base_url
+        self.temperature = temperature
+        self.budget = budget or PromptBudget(model)
+        self.tokenizer = tokenizer_for(model)
+        self.max_tokens = max_tokens or self.budget["completion"]
+        self.cache = cache
+        self.scheduler = scheduler or shared_scheduler()
+        # Set by the Manager to measure how much of each prompt repeats a recent one.
+        self.prefix_monitor: Optional[PrefixMonitor] = None
+        # The run this agent's calls are queued under for fair sharing (see RateScheduler).
+        self.session = NO_SESSION
+
+    @property
+    def aclient(self) -> AsyncOpenAI:
+        # Looked up per call, so clients replaced by configure_pool are not used after closing.
+        return get_async_client(self.api_key, self.base_url)
 
-    def generate(self, prompt: str, context: str = "", file_content: str = "") -> str:
+    def _messages(self, prompt: str, context: str, file_content: str, prefix: Optional[str] = None) -> List[Dict[str, str]]:
         sys = f"You are a {self.role} with expertise in {self.expertise}.\nPrimary goal: {self.goal}\n- Stay in character\n- Provide detailed, actionable insights\n- Reference file content when relevant\n- Build on other team members\n- Avoid generic responses\n"
+        tok, b = self.tokenizer, self.budget
+        sys = tok.head(sys, b["system"])
+        if prefix is not None:
+            # Stable layout: the run's shared prefix (brief, files), then this agent's role, then
+            # the append-only discussion log and the instruction. Nothing before the log changes
+            # between calls, so providers can serve it from their prompt cache.
+            return [{"role": "system", "content": prefix}, {"role": "system", "content": sys}, {"role": "user", "content": f"{context}\n\n{prompt}" if context else prompt}]
         if file_content:
-            sys += f"\nFile content:\n{file_content[:3000]}..."
+            sys += f"\nFile content:\n{tok.head(file_content, b['file'])}..."
         if context:
-            sys += f"\nContext:\n{context[-2000:]}"
-        resp = self.client.chat.completions.create(model=self.model, messages=[{"role": "system", "content": sys}, {"role": "user", "content": prompt}], temperature=0.7, max_tokens=1500)
-        return resp.choices[0].message.content.strip()
+            sys += f"\nContext:\n{tok.tail(context, b['transcript'])}"
+        return [{"role": "system", "content": sys}, {"role": "user", "content": prompt}]
+
+    def _params(self) -> Dict[str, Any]:
+        return {"temperature": self.temperature, "max_tokens": self.max_tokens}
+
+    def _lookup(self, model: str, messages: List[Dict[str, str]]) -> Tuple[Optional[str], Optional[str]]:
+        # Returns (cache key, cached answer); the key is None when this call must not be cached.
+        if self.cache is None or not self.cache.enabled_for(self.temperature):
+            return None, None
+        key = cache_key(model, messages, **self._params())
+        return key, self.cache.get(key)
+
+    def _store(self, key: Optional[str], ans: str) -> str:
+        if key and ans:
+            self.cache.put(key, ans)
+        return ans
+
+    def _reserve(self, messages: List[Dict[str, str]]) -> int:
+        # Tokens the provider counts against TPM up front: the prompt plus max_tokens.
+        return sum(self.tokenizer.count(m["content"]) for m in messages) + self.max_tokens
+
+    def _account(self, stats: Optional[Dict[str, Any]], model: str, messages: List[Dict[str, str]], ans: str, t0: float, ttft: Optional[float] = None, usage: Any = None, cached: bool = False):
+        # Fills the caller's stats dict (if any) with timing, token usage and estimated cost.
+        if stats is None:
+            return
+        latency = time.perf_counter() - t0
+        if usage is not None:
+            pt, ct = usage.prompt_tokens, usage.completion_tokens
+            hit = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", None) or 0
+        else:
+            pt, ct, hit = sum(self.tokenizer.count(m["content"]) for m in messages), self.tokenizer.count(ans), 0
+        cost = 0.0 if cached else estimate_cost(model, pt, ct, hit)
+        stats.update(model=model, latency_s=round(latency, 4), ttft_s=round(latency if ttft is None else ttft, 4), prompt_tokens=pt, completion_tokens=ct, cached_tokens=hit,
+                     cost_usd=None if cost is None else round(cost, 8), cached=cached, estimated_tokens=usage is None)
+        if self.prefix_monitor is not None and not cached:
+            stats.update(self.prefix_monitor.observe(messages, self.tokenizer))
+
+    def _prepare(self, model: str, prompt: str, context: str, file_content: str, prefix: Optional[str]) -> Tuple[List[Dict[str, str]], Optional[str], Optional[str], int]:
+        # Prompt assembly, cache lookup and token counting: tiktoken and SQLite work that the
+        # callers run in a worker thread rather than on the shared event loop.
+        messages = self._messages(prompt, context, file_content, prefix)
+        key, hit = self._lookup(model, messages)
+        return messages, key, hit, 0 if hit is not None else self._reserve(messages)
+
+    def _complete(self, stats: Optional[Dict[str, Any]], model: str, messages: List[Dict[str, str]], ans: str, key: Optional[str], t0: float, ttft: Optional[float] = None, usage: Any = None) -> str:
+        self._account(stats, model, messages, ans, t0, ttft, usage)
+        return self._store(key, ans)
+
+    async def agenerate(self, prompt: str, context: str = "", file_content: str = "", stats: Optional[Dict[str, Any]] = None, priority: int = DEFAULT_PRIORITY, model: Optional[str] = None, prefix: Optional[str] = None) -> str:
+        t0 = time.perf_counter()
+        model = model or self.model
+        messages, key, hit, reserve = await asyncio.to_thread(self._prepare, model, prompt, context, file_content, prefix)
+        if hit is not None:
+            await asyncio.to_thread(self._account, stats, model, messages, hit, t0, cached=True)
+            return hit
+        resp = await self.scheduler.acall(model, lambda: self.aclient.chat.completions.create(model=model, messages=messages, **self._params()), reserve, priority, stats, session=self.session)
+        return await asyncio.to_thread(self._complete, stats, model, messages, resp.choices[0].message.content.strip(), key, t0, usage=resp.usage)
+
+    async def agenerate_stream(self, prompt: str, context: str = "", file_content: str = "", stats: Optional[Dict[str, Any]] = None, priority: int = DEFAULT_PRIORITY, model: Optional[str] = None, prefix: Optional[str] = None) -> AsyncIterator[str]:
+        t0 = time.perf_counter()
+        model = model or self.model
+        messages, key, hit, reserve = await asyncio.to_thread(self._prepare, model, prompt, context, file_content, prefix)
+        if hit is not None:
+            await asyncio.to_thread(self._account, stats, model, messages, hit, t0, cached=True)
+            yield hit
+            return
+        parts, ttft, usage = [], None, None
+        stream = await self.scheduler.acall(model, lambda: self.aclient.chat.completions.create(model=model, messages=messages, stream=True, stream_options={"include_usage": True}, **self._params()), reserve, priority, stats, session=self.session, hold=True)
+        try:
+            async for chunk in stream:
+                usage = getattr(chunk, "usage", None) or usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    if ttft is None:
+                        ttft = time.perf_counter() - t0
+                    parts.append(chunk.choices[0].delta.content)
+                    yield parts[-1]
+        finally:
+            self.scheduler.release(self.session)
+        await asyncio.to_thread(self._complete, stats, model, messages, "".join(parts).strip(), key, t0, ttft, usage)
 
 class Employee(Agent):
-    def __init__(self, role: str, goal: str, api_key: str, expertise: str = "", agent_id: str = None):
-        super().__init__(role, goal, api_key=api_key, expertise=expertise, agent_id=agent_id)
+    def __init__(self, role: str, goal: str, api_key: str, expertise: str = "", agent_id: str = None, **kw):
+        super().__init__(role, goal, api_key=api_key, expertise=expertise, agent_id=agent_id, **kw)
 
 class Manager(Agent):
-    def __init__(self, employees: List[Employee], api_key: str, max_turns: int = 12):
-        super().__init__(role="AI Organization Manager", goal="Orchestrate team collaboration and synthesize final results", api_key=api_key, expertise="Management, Planning, QA")
+    MIN_ROUNDS = 2
+    # Transcript windows per prompt slot, as shares of the transcript budget; windows always hold whole turns.
+    WINDOWS = {"round": 0.35, "consensus": 0.42, "synthesis": 0.49, "context": 0.28, "preview": 0.07, "log": 0.7}
+    LAYOUTS = ("window", "stable")
+
+    def __init__(self, employees: List[Employee], api_key: str, max_turns: int = 12, index: Optional[DocumentIndex] = None, convergence: Optional[ConvergencePolicy] = None, journal: Optional[Journal] = None, catalog: Optional[Dict[str, Dict[str, str]]] = None, summary_model: Optional[str] = None, router: Optional[ModelRouter] = None, layout: str = "window", session_id: Optional[str] = None, weight: float = 1.0, **kw):
+        super().__init__(role="AI Organization Manager", goal="Orchestrate team collaboration and synthesize final results", api_key=api_key, expertise="Management, Planning, QA", **kw)
         self.employees = employees
         self.max_turns = max_turns
+        self.index = index
+        self.convergence = convergence or ConvergencePolicy()
+        self.journal = journal
+        # Roles (name -> {goal, expertise}) the graph planner may use beyond the team itself.
+        self.catalog = catalog or {}
+        self._adhoc: Dict[str, Employee] = {}
+        # With a summary model, older rounds reach prompts as digests instead of being cut off.
+        self.summarizer = Agent("Transcript Summarizer", "Condense team discussion into faithful, dense digests", model=summary_model, api_key=api_key, expertise="Summarization", base_url=self.base_url, temperature=0.0, cache=self.cache, scheduler=self.scheduler) if summary_model else None
+        # Without a router every agent calls its own model.
+        self.router = router
+        # "window": each prompt embeds sliding transcript windows. "stable": every call starts
+        # with the same run-wide prefix and ends with an append-only log (see Agent._messages).
+        self.layout = layout
+        self._prefix: Optional[str] = None
+        # Only the stable layout repeats a prefix worth measuring.
+        self.prefix_monitor = PrefixMonitor() if layout == "stable" else None
+        self.lookahead: Optional[Lookahead] = None
+        # All calls of the run share one fair-queuing session; `weight` is its relative share.
+        self.session = session_id or NO_SESSION
+        if session_id:
+            self.scheduler.weight(session_id, weight)
+        for a in [self, *employees] + ([self.summarizer] if self.summarizer else []):
+            a.prefix_monitor, a.session = self.prefix_monitor, self.session
+        self._replay: deque = deque()
+        self._digests: List[Digest] = []
+
+    def delegate_task(self, task: str, file_content: str = "", user_suggestions: str = "", lookahead: int = DEFAULT_DEPTH, **kw) -> Generator[Dict[str, Any], None, None]:
+        # Sync wrapper over adelegate_task; the other options (stream, parallel, replay, mode)
+        # and their defaults are adelegate_task's. With lookahead > 0 the run keeps going (up to
+        # that many events ahead) while the caller handles earlier events; 0 advances it only
+        # when the caller asks for the next event.
+        agen = self.adelegate_task(task, file_content, user_suggestions, **kw)
+        self.lookahead = Lookahead(agen, lookahead) if lookahead > 0 else None
+        yield from iter_sync(self.lookahead or agen)
+
+    async def adelegate_task(self, task: str, file_content: str = "", user_suggestions: str = "", stream: bool = False, parallel: bool = False, replay: Optional[List[str]] = None, mode: str = "rounds", digests: Optional[List[Dict[str, Any]]] = None) -> AsyncGenerator[Dict[str, Any], None]:
+        # mode="rounds" is the fixed round-robin collaboration; mode="graph" plans a DAG of
+        # subtasks first (see _arun_graph).
+        # `replay` holds the answers of turns completed by an earlier, interrupted run (see
+        # EventLog.resume): those turns are re-yielded without model calls, and events up to
+        # the last of them are not journaled again. `digests` (see EventLog.digests) are the
+        # summary events it logged; their segments are not summarized again.
+        self._replay = deque(replay or [])
+        self._digests = [Digest.restore(ev) for ev in digests or ()]
+        j = self.journal
+        try:
+            flow = self._arun_graph(task, file_content, user_suggestions, stream) if mode == "graph" else self._arun(task, file_content, user_suggestions, stream, parallel)
+            async for ev in flow:
+                if j is not None and ev["type"] != "agent_delta" and not (self._replay or ev.get("replayed")):
+                    j.append(ev)
+                yield ev
+        except (asyncio.CancelledError, GeneratorExit):
+            if j is not None:
+                j.finish("cancelled")
+            raise
+        except Exception as ex:
+            if j is not None:
+                j.finish("failed", f"{type(ex).__name__}: {ex}")
+            raise
+        if j is not None:
+            j.finish("done")
 
-    def delegate_task(self, task: str, file_content: str = "", user_suggestions: str = "") -> Generator[Dict[str, Any], None, None]:
-        yield {"sender": "Manager", "message": f"🎯 **New Mission**\n\nTask: *{task}*", "type": "manager", "timestamp": datetime.now().strftime("%H:%M:%S")}
-        initial = self._build_brief(task, file_content, user_suggestions)
-        yield {"sender": "Manager", "message": "📋 **Team Brief Issued**", "type": "manager", "timestamp": datetime.now().strftime("%H:%M:%S")}
+    async def _arun(self, task: str, file_content: str, user_suggestions: str, stream: bool, parallel: bool) -> AsyncGenerator[Dict[str, Any], None]:
+        # With parallel=True the independent INITIAL ANALYSIS round fans out to every employee
+        # at once; results are still yielded (and appended) in team order.
+        yield Event("Manager", f"🎯 **New Mission**\n\nTask: *{task}*", "manager", phase="brief")
+        initial, shared = await asyncio.to_thread(self._begin, task, file_content, user_suggestions)
+        yield Event("Manager", "📋 **Team Brief Issued**", "manager")
 
-        shared = initial
-        min_rounds = 2
+        if self.summarizer is not None:
+            shared = RollingMemory(shared, self.summarizer, known=self._digests)
+        try:
+            async for ev in self._arounds(task, file_content, initial, shared, stream, parallel):
+                yield ev
+        finally:
+            if isinstance(shared, RollingMemory):
+                await shared.aclose()
+
+    async def _arounds(self, task: str, file_content: str, initial: str, shared: Transcript, stream: bool, parallel: bool) -> AsyncGenerator[Dict[str, Any], None]:
+        min_rounds = self.MIN_ROUNDS
         total_agents = len(self.employees)
+        turns_left = max(self.max_turns - min_rounds * total_agents, 1)
+        mon = ConvergenceMonitor(self.convergence, min_rounds * total_agents + turns_left)
+        mon.seed(initial)
 
-        yield {"sender": "Manager", "message": f"🔄 **Round-Robin Collaboration** with {total_agents} agents", "type": "manager", "timestamp": datetime.now().strftime("%H:%M:%S")}
+        yield Event("Manager", f"🔄 **{'Parallel' if parallel else 'Round-Robin'} Collaboration** with {total_agents} agents", "manager")
 
         for r in range(min_rounds):
-            yield {"sender": "Manager", "message": f"📋 **Round {r+1}/{min_rounds}**", "type": "manager", "timestamp": datetime.now().strftime("%H:%M:%S")}
+            yield Event("Manager", f"📋 **Round {r+1}/{min_rounds}**", "manager", phase=f"round{r+1}")
+            async for ev in self._settle(shared):
+                yield ev
+            if r == 0 and parallel:
+                async for ev in self._fan_out(shared, file_content, mon):
+                    yield ev
+                self._close(shared, "Round 1")
+                continue
+            if r == 1:
+                mon.arm()
+            for e in self.employees:
+                yield Event("System", f"🤔 {e.role} is preparing response...", "thinking")
+                p = await asyncio.to_thread(self._round_prompt, r, shared, e)
+                async for ev in self._aturn(e, p, shared, file_content, stream, phase=f"round{r+1}"):
+                    yield ev
+                await asyncio.to_thread(self._record, shared, mon, e, f"R{r+1}", ev["message"], p)
+                if r > 0 and mon.stop():
+                    break
+            self._close(shared, f"Round {r+1}")
+            if mon.stopped_early:
+                break
+
+        final_answer = None
+        if not mon.stopped_early:
+            yield Event("Manager", "🎯 **Consensus Phase**", "manager", phase="consensus")
+            for i in range(turns_left):
+                if i and i % total_agents == 0:
+                    self._close(shared, f"Consensus {i // total_agents}")
+                    async for ev in self._settle(shared):
+                        yield ev
+                e = self.employees[i % total_agents]
+                yield Event("System", f"🤔 {e.role} working on consensus...", "thinking")
+                p = await asyncio.to_thread(self._consensus_prompt, shared)
+                async for ev in self._aturn(e, p, shared, file_content, stream, phase="consensus"):
+                    yield ev
+                ans = ev["message"]
+                await asyncio.to_thread(self._record, shared, mon, e, "Consensus", ans, p)
+                if "FINAL_ANSWER:" in ans:
+                    final_answer = ans.split("FINAL_ANSWER:", 1)[1].strip()
+                    yield Event(e.role, "✅ **Final solution synthesized**", "completion", final_answer=final_answer)
+                    break
+                if mon.stop():
+                    break
+        if mon.stopped_early:
+            yield Event("Manager", f"⏩ **Converged** — answers stopped adding new content, skipping {mon.summary()['turns_saved']} remaining turn(s)", "manager")
+
+        if final_answer and self.convergence.skip_synthesis:
+            mon.synthesis_skipped = True
+            yield Event("Manager", final_answer, "final_result", task_complete=True, convergence=mon.summary())
+            return
+        yield Event("Manager", "🔍 **Final Review & Synthesis**", "manager", phase="synthesis")
+        async for ev in self._settle(shared, final=True):
+            yield ev
+        async for ev in self._aturn(self, await asyncio.to_thread(self._synthesis_prompt, task, shared), shared, file_content, stream, sender="Manager", type="final_result", phase="synthesis"):
+            yield ev if ev.type is EventType.AGENT_DELTA else ev.with_(task_complete=True, convergence=mon.summary())
+
+    def _close(self, shared: Transcript, label: str):
+        if isinstance(shared, RollingMemory):
+            shared.close_segment(label)
+
+    async def _settle(self, shared: Transcript, final: bool = False) -> AsyncGenerator[Dict[str, Any], None]:
+        if not isinstance(shared, RollingMemory):
+            return
+        for d in await shared.settle(final):
+            extra_fields = {"replayed": True} if d.replayed else {"telemetry": d.stats}
+            yield Event("Summarizer", f"🗜️ **{d.label}** condensed from {d.source_tokens:,} to {d.tokens:,} tokens" + (f" (level {d.level})" if d.level > 1 else ""), "summary", digest=d.text, segment=d.segment(), **extra_fields)
+
+    async def _arun_graph(self, task: str, file_content: str, user_suggestions: str, stream: bool) -> AsyncGenerator[Dict[str, Any], None]:
+        # The Manager plans subtasks with dependencies; each node starts as soon as its upstream
+        # nodes finish and sees only their outputs, not the whole transcript. Nodes run
+        # concurrently, so their replies are not streamed and are yielded in topological order.
+        yield Event("Manager", f"🎯 **New Mission**\n\nTask: *{task}*", "manager", phase="brief")
+        brief, shared = await asyncio.to_thread(self._begin, task, file_content, user_suggestions)
+        roles = [e.role for e in self.employees]
+        extra = [r for r in self.catalog if r not in roles]
+
+        yield Event("Manager", "🗺️ **Planning Subtasks**", "manager", phase="plan")
+        async for ev in self._aturn(self, plan_prompt(brief, roles, extra), shared, file_content, False, sender="Manager", type="plan", phase="plan"):
+            pass
+        nodes = parse_plan(ev["message"], roles + extra) or fallback_plan(task, roles)
+        yield ev.with_(message=f"🗺️ **Plan** — {len(nodes)} subtasks, critical path of {depth(nodes)}\n\n{render_plan(nodes)}", answer=ev.message, plan=[n.to_dict() for n in nodes])
+
+        yield Event("Manager", "⚡ **Executing Task Graph** — independent subtasks run in parallel", "manager", phase="graph")
+        by_id = {n.id: n for n in nodes}
+        stats = {n.id: {"phase": "graph", "node": n.id} for n in nodes}
+        futures: Dict[str, asyncio.Future] = {}
+
+        async def run(n: Node) -> str:
+            upstream = [await futures[d] for d in n.deps]
+            ctx = "\n\n".join(f"**{by_id[d].role} ({d}):** {out}" for d, out in zip(n.deps, upstream))
+            a = self._agent_for(n.role)
+            prompt = f"SUBTASK {n.id}: {n.task}\nOverall objective: {task}\nYour role: {a.role}. Build on the upstream results in your context where relevant and deliver only this subtask."
+            ans = await a.agenerate(prompt, context=ctx, file_content=await self._file_excerpt(a, prompt, file_content), stats=stats[n.id], priority=priority_for("graph"), model=self._route(a, stats[n.id]), prefix=self._prefix)
+            self._observe(stats[n.id])
+            return ans
+
+        replayed = set()
+        for n in nodes:
+            if self._replay:
+                futures[n.id] = asyncio.get_running_loop().create_future()
+                futures[n.id].set_result(self._replay.popleft())
+                replayed.add(n.id)
+            else:
+                futures[n.id] = asyncio.create_task(run(n))
+        try:
+            for n in nodes:
+                if not futures[n.id].done():
+                    yield Event("System", f"🤔 {n.role} is working on {n.id}...", "thinking")
+                ans = await futures[n.id]
+                await asyncio.to_thread(shared.append, n.role, n.id, ans)
+                extra_fields = {"replayed": True} if n.id in replayed else {"telemetry": stats[n.id]}
+                yield Event(n.role, ans, "agent", agent_id=self._agent_for(n.role).agent_id, node=n.id, **extra_fields)
+        finally:
+            for f in futures.values():
+                f.cancel()
+
+        summary = {"nodes": len(nodes), "depth": depth(nodes), "transcript_tokens": shared.tokens}
+        yield Event("Manager", "🔍 **Final Review & Synthesis**", "manager", phase="synthesis")
+        async for ev in self._aturn(self, await asyncio.to_thread(self._synthesis_prompt, task, shared), shared, file_content, stream, sender="Manager", type="final_result", phase="synthesis"):
+            yield ev if ev.type is EventType.AGENT_DELTA else ev.with_(task_complete=True, graph=summary)
+
+    def _agent_for(self, role: str) -> Agent:
+        for e in self.employees:
+            if e.role == role:
+                return e
+        if role not in self._adhoc:
+            spec = self.catalog[role]
+            self._adhoc[role] = Employee(role, spec["goal"], self.api_key, expertise=spec.get("expertise", ""), model=self.model, base_url=self.base_url, temperature=self.temperature, cache=self.cache, scheduler=self.scheduler)
+            self._adhoc[role].prefix_monitor, self._adhoc[role].session = self.prefix_monitor, self.session
+        return self._adhoc[role]
+
+    async def _fan_out(self, shared: Transcript, file_content: str, mon: ConvergenceMonitor) -> AsyncGenerator[Dict[str, Any], None]:
+        ctx, prompts = await asyncio.to_thread(lambda: (self._context(shared), [self._round_prompt(0, shared, e) for e in self.employees]))
+        stats = [{"phase": "round1"} for _ in self.employees]
+        # Replayed answers stay queued until they are yielded, so the "thinking" notices (already
+        # logged by the interrupted run) are not journaled a second time.
+        done = [self._replay[i] if i < len(self._replay) else None for i in range(len(self.employees))]
+
+        async def call(e: Agent, p: str, st: Dict[str, Any]) -> str:
+            return await e.agenerate(p, context=ctx, file_content=await self._file_excerpt(e, p, file_content), stats=st, priority=priority_for("round1"), model=self._route(e, st), prefix=self._prefix)
+
+        tasks = [None if d is not None else asyncio.create_task(call(e, p, st)) for e, p, st, d in zip(self.employees, prompts, stats, done)]
+        try:
             for e in self.employees:
-                yield {"sender": "System", "message": f"🤔 {e.role} is preparing response...", "type": "thinking", "timestamp": datetime.now().strftime("%H:%M:%S")}
-                if r == 0:
-                    p = f"INITIAL ANALYSIS\n{shared[-2500:]}\nYour role: {e.role} ({e.expertise}). Provide first assessment, questions, and initial recommendations. Do not finalize."
+                yield Event("System", f"🤔 {e.role} is preparing response...", "thinking")
+            answers = []
+            for e, t, st, d in zip(self.employees, tasks, stats, done):
+                if t is None:
+                    answers.append(self._replay.popleft())
+                    yield Event(e.role, d, "agent", agent_id=e.agent_id, replayed=True)
                 else:
-                    p = f"BUILDING PHASE (Round {r+1})\n{shared[-2500:]}\nYour role: {e.role}. Build on others, refine or challenge, add concrete next steps. Do not conclude yet."
-                ans = e.generate(p, context=shared, file_content=file_content)
-                yield {"sender": e.role, "message": ans, "type": "agent", "timestamp": datetime.now().strftime("%H:%M:%S"), "agent_id": e.agent_id}
-                shared += f"\n\n**{e.role} (R{r+1}):** {ans}"
-                time.sleep(0.1)
+                    answers.append(await t)
+                    self._observe(st)
+                    yield Event(e.role, answers[-1], "agent", agent_id=e.agent_id, telemetry=st)
+        finally:
+            for t in tasks:
+                if t is not None:
+                    t.cancel()
+        for e, p, ans in zip(self.employees, prompts, answers):
+            await asyncio.to_thread(self._record, shared, mon, e, "R1", ans, p)
 
-        yield {"sender": "Manager", "message": "🎯 **Consensus Phase**", "type": "manager", "timestamp": datetime.now().strftime("%H:%M:%S")}
-        turns_left = max(self.max_turns - min_rounds * total_agents, 1)
-        idx = 0
-        for _ in range(turns_left):
-            e = self.employees[idx % total_agents]
-            idx += 1
-            yield {"sender": "System", "message": f"🤔 {e.role} working on consensus...", "type": "thinking", "timestamp": datetime.now().strftime("%H:%M:%S")}
-            p = f"CONSENSUS BUILDING\n{shared[-3000:]}\nSynthesize all inputs. If ready, conclude with 'FINAL_ANSWER: ...' that addresses the original task comprehensively with actionable steps."
-            ans = e.generate(p, context=shared, file_content=file_content)
-            yield {"sender": e.role, "message": ans, "type": "agent", "timestamp": datetime.now().strftime("%H:%M:%S"), "agent_id": e.agent_id}
-            shared += f"\n\n**{e.role} (Consensus):** {ans}"
-            if "FINAL_ANSWER:" in ans:
-                final_answer = ans.split("FINAL_ANSWER:", 1)[1].strip()
-                yield {"sender": e.role, "message": "✅ **Final solution synthesized**", "type": "completion", "timestamp": datetime.now().strftime("%H:%M:%S"), "final_answer": final_answer}
-                break
-            time.sleep(0.1)
+    def _record(self, shared: Transcript, mon: ConvergenceMonitor, e: Agent, tag: str, ans: str, prompt: str):
+        # Token counting and shingling; run in a worker thread like the other tokenizer work.
+        turn = shared.append(e.role, tag, ans)
+        mon.observe(ans, tokens=e.tokenizer.count(prompt) + turn.tokens)
+
+    async def _aturn(self, a: Agent, prompt: str, shared: Transcript, file_content: str, stream: bool, sender: str = None, type: str = "agent", phase: str = "") -> AsyncGenerator[Dict[str, Any], None]:
+        # Yields any "agent_delta" events (stream=True) as tokens arrive, then the complete event
+        # with the call's telemetry (latency, TTFT, tokens, cost).
+        sender = sender or a.role
+        if self._replay:
+            yield Event(sender, self._replay.popleft(), type, agent_id=a.agent_id, replayed=True)
+            return
+        ctx = await asyncio.to_thread(self._context, shared)
+        file_content = await self._file_excerpt(a, prompt, file_content)
+        stats = {"phase": phase}
+        model = self._route(a, stats)
+        if not stream:
+            ans = await a.agenerate(prompt, context=ctx, file_content=file_content, stats=stats, priority=priority_for(phase), model=model, prefix=self._prefix)
+        else:
+            parts = []
+            async for d in a.agenerate_stream(prompt, context=ctx, file_content=file_content, stats=stats, priority=priority_for(phase), model=model, prefix=self._prefix):
+                parts.append(d)
+                yield Event(sender, d, "agent_delta", agent_id=a.agent_id)
+            ans = "".join(parts).strip()
+        self._observe(stats)
+        yield Event(sender, ans, type, agent_id=a.agent_id, telemetry=stats)
+
+    def _route(self, a: Agent, stats: Dict[str, Any]) -> Optional[str]:
+        # Model for this call; the route taken is kept in the call's telemetry.
+        if self.router is None:
+            return None
+        stats["route"], model, fallback = self.router.route(a.role, stats["phase"], a.model)
+        if fallback:
+            stats["fallback"] = True
+        return model
+
+    def _observe(self, stats: Dict[str, Any]):
+        if self.router is not None and not stats.get("cached") and "ttft_s" in stats:
+            self.router.observe(stats["model"], stats["ttft_s"])
+
+    async def _file_excerpt(self, a: Agent, prompt: str, file_content: str) -> str:
+        # With an index, each call sees the chunks most relevant to its role and prompt
+        # instead of the head of the concatenated uploads. The stable layout ships one shared
+        # excerpt in the prefix instead.
+        if self.index is None or self._prefix is not None:
+            return file_content
+        # BM25 scoring and tokenizing run in a worker thread, off the shared event loop.
+        return await asyncio.to_thread(self.index.excerpt, f"{a.role} {a.expertise} {prompt}", a.budget["file"], a.tokenizer) or file_content
+
+    def _begin(self, task: str, file_content: str, user_suggestions: str) -> Tuple[str, Transcript]:
+        # Brief, shared prefix and transcript header: tokenizer and BM25 work, so the async
+        # flows run this in a worker thread rather than on the shared event loop.
+        brief = self._build_brief(task, file_content, user_suggestions)
+        self._prefix = self._shared_prefix(brief, file_content)
+        return brief, Transcript(brief, self.tokenizer)
+
+    def _shared_prefix(self, brief: str, file_content: str) -> Optional[str]:
+        # Identical for every call of the run: team rules, the brief and one file excerpt chosen
+        # for the objective rather than per agent and prompt.
+        if self.layout != "stable":
+            return None
+        prefix = f"You are part of a team of specialists working on one objective. Stay in your role, build on the discussion and be specific and actionable.\n\n{brief}"
+        if file_content:
+            excerpt = self.index.excerpt(brief, self.budget["file"], self.tokenizer) if self.index is not None else None
+            prefix += f"\nFile content:\n{excerpt or self.tokenizer.head(file_content, self.budget['file'])}"
+        return prefix
+
+    def _context(self, shared: Transcript) -> str:
+        return shared.log(self._window("log")) if self._prefix is not None else shared.window(self._window("context"), header=False)
+
+    def _view(self, shared: Transcript, slot: str) -> str:
+        # Transcript window embedded in a prompt; in the stable layout the log already carries it.
+        return "" if self._prefix is not None else shared.window(self._window(slot))
+
+    def _window(self, slot: str) -> int:
+        return int(self.budget["transcript"] * self.WINDOWS[slot])
+
+    def _round_prompt(self, r: int, shared: Transcript, e: Agent) -> str:
+        if r == 0:
+            return f"INITIAL ANALYSIS\n{self._view(shared, 'round')}\nYour role: {e.role} ({e.expertise}). Provide first assessment, questions, and initial recommendations. Do not finalize."
+        return f"BUILDING PHASE (Round {r+1})\n{self._view(shared, 'round')}\nYour role: {e.role}. Build on others, refine or challenge, add concrete next steps. Do not conclude yet."
 
-        final = self._synthesize(task, shared, file_content)
-        yield {"sender": "Manager", "message": "🔍 **Final Review & Synthesis**", "type": "manager", "timestamp": datetime.now().strftime("%H:%M:%S")}
-        yield {"sender": "Manager", "message": final, "type": "final_result", "timestamp": datetime.now().strftime("%H:%M:%S"), "task_complete": True}
+    def _consensus_prompt(self, shared: Transcript) -> str:
+        return f"CONSENSUS BUILDING\n{self._view(shared, 'consensus')}\nSynthesize all inputs. If ready, conclude with 'FINAL_ANSWER: ...' that addresses the original task comprehensively with actionable steps."
 
     def _build_brief(self, task: str, file_content: str, usr: str) -> str:
         team = "\n".join([f"- {e.role}: {e.expertise}" for e in self.employees])
         brief = f"TEAM BRIEF\nOBJECTIVE: {task}\nTEAM:\n{team}\n"
         if file_content:
-            brief += f"\nFILES PREVIEW:\n{file_content[:500]}...\n"
+            brief += f"\nFILES PREVIEW:\n{self.tokenizer.head(file_content, self._window('preview'))}...\n"
         if usr:
             brief += f"\nUSER NOTES:\n{usr}\n"
         brief += "\nSTANDARDS: specific, actionable, collaborative, comprehensive.\n"
         return brief
 
-    def _synthesize(self, task: str, team_output: str, file_content: str) -> str:
-        p = f"EXECUTIVE SYNTHESIS\nOriginal Task: {task}\nTeam Output:\n{team_output[-3500:]}"
-        return self.generate(p, context=team_output, file_content=file_content)
+    def _synthesis_prompt(self, task: str, team_output: Transcript) -> str:
+        view = self._view(team_output, "synthesis")
+        return f"EXECUTIVE SYNTHESIS\nOriginal Task: {task}\n" + (f"Team Output:\n{view}" if view else "Synthesize the team discussion above into the final deliverable.")
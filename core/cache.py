@@ -0,0 +1,130 @@
+from typing import Dict, Any, List, Optional, Tuple
+from collections import OrderedDict
+import threading
+import hashlib
+import sqlite3
+import json
+import time
+import os
+
+CACHE_DIR = os.environ.get("KREW_CACHE_DIR", ".krew_cache")
+
+def cache_key(model: str, messages: List[Dict[str, str]], **params) -> str:
+    # Content address of a request: model + full system/user messages + sampling params.
+    blob = json.dumps({"model": model, "messages": messages, "params": params}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    def __init__(self, path: Optional[str] = None, max_items: int = 512, ttl: float = 7 * 24 * 3600, max_bytes: int = 256 * 1024 * 1024, sampled: bool = False):
+        # sampled=False only caches temperature-0 calls, where a hit is equivalent to a fresh call.
+        self.max_items = max_items
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sampled = sampled
+        # key -> (value, created); entries past the TTL are dropped on access.
+        self._mem: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        # Running totals of the disk table, so writes and the sidebar do not scan it.
+        self._items = 0
+        self._bytes = 0
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL, size INTEGER NOT NULL)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_created ON responses (created)")
+            self._db.commit()
+            self._items, self._bytes = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+
+    def enabled_for(self, temperature: float) -> bool:
+        return self.sampled or temperature == 0
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            hit = self._mem.get(key)
+            if hit is not None:
+                if hit[1] > now - self.ttl:
+                    self._mem.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return hit[0]
+                del self._mem[key]
+            if self._db is not None:
+                row = self._db.execute("SELECT value, created FROM responses WHERE key = ? AND created > ?", (key, now - self.ttl)).fetchone()
+                if row:
+                    self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+                    self._db.commit()
+                    self.stats["disk_hits"] += 1
+                    self._remember(key, row[0], row[1])
+                    return row[0]
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            self.stats["stores"] += 1
+            if self._db is not None:
+                size = len(value.encode("utf-8"))
+                old = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+                self._db.execute("INSERT OR REPLACE INTO responses (key, value, created, accessed, size) VALUES (?, ?, ?, ?, ?)", (key, value, now, now, size))
+                self._items += 0 if old else 1
+                self._bytes += size - (old[0] if old else 0)
+                self._evict(now)
+                self._db.commit()
+
+    def _remember(self, key: str, value: str, created: float):
+        self._mem[key] = (value, created)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_items:
+            self._mem.popitem(last=False)
+
+    def _evict(self, now: float):
+        cutoff = now - self.ttl
+        n, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses WHERE created <= ?", (cutoff,)).fetchone()
+        if n:
+            self._db.execute("DELETE FROM responses WHERE created <= ?", (cutoff,))
+            self.stats["evictions"] += n
+            self._items -= n
+            self._bytes -= size
+        if self._bytes <= self.max_bytes:
+            return
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY accessed ASC").fetchall():
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._mem.pop(key, None)
+            self.stats["evictions"] += 1
+            self._items -= 1
+            self._bytes -= size
+            if self._bytes <= self.max_bytes:
+                break
+
+    def clear(self):
+        with self._lock:
+            self._mem.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+                self._items = self._bytes = 0
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+            lookups = hits + self.stats["misses"]
+            out = {**self.stats, "hit_ratio": round(hits / lookups, 3) if lookups else 0.0, "memory_items": len(self._mem)}
+            if self._db is not None:
+                out.update(disk_items=self._items, disk_bytes=self._bytes)
+            return out
+
+_shared = None
+_shared_lock = threading.Lock()
+
+def shared_cache() -> ResponseCache:
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = ResponseCache(path=os.path.join(CACHE_DIR, "responses.sqlite"))
+        return _shared
@@ -0,0 +1,152 @@
+from typing import Dict, Any, Tuple, Optional
+from openai import OpenAI, AsyncOpenAI
+from core.ratelimit import shared_scheduler
+import importlib.util
+import threading
+import weakref
+import asyncio
+import time
+import json
+import httpx
+
+POOL = {
+    "max_connections": 64,
+    "max_keepalive_connections": 32,
+    "keepalive_expiry": 60.0,
+    "connect_timeout": 10.0,
+    "http2": importlib.util.find_spec("h2") is not None,
+}
+
+class PoolStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.responses = 0
+        self.errors = 0
+        self.connections_opened = 0
+        self.tls_handshakes = 0
+        self.latency_total = 0.0
+
+    def on_request(self, request: httpx.Request, async_: bool = False):
+        request.extensions["trace"] = self.atrace if async_ else self.trace
+        request.extensions["krew_t0"] = time.perf_counter()
+        with self._lock:
+            self.requests += 1
+
+    def on_response(self, response: httpx.Response):
+        t0 = response.request.extensions.get("krew_t0")
+        with self._lock:
+            self.responses += 1
+            if response.status_code >= 400:
+                self.errors += 1
+            if t0:
+                self.latency_total += time.perf_counter() - t0
+
+    def trace(self, name: str, info: Dict[str, Any]):
+        if name == "connection.connect_tcp.complete":
+            with self._lock:
+                self.connections_opened += 1
+        elif name == "connection.start_tls.complete":
+            with self._lock:
+                self.tls_handshakes += 1
+
+    async def atrace(self, name: str, info: Dict[str, Any]):
+        self.trace(name, info)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            reused = max(self.requests - self.connections_opened, 0)
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "connections_opened": self.connections_opened,
+                "tls_handshakes": self.tls_handshakes,
+                "reuse_ratio": round(reused / self.requests, 3) if self.requests else 0.0,
+                "avg_latency_ms": round(1000 * self.latency_total / self.responses, 1) if self.responses else 0.0,
+            }
+
+def _observe_limits(response: httpx.Response):
+    # Feed x-ratelimit-* headers to the scheduler so its buckets track the org's real limits.
+    if "x-ratelimit-remaining-requests" not in response.headers and "x-ratelimit-remaining-tokens" not in response.headers:
+        return
+    try:
+        model = json.loads(response.request.content).get("model")
+    except ValueError:
+        return
+    if model:
+        shared_scheduler().observe(model, response.headers)
+
+_lock = threading.Lock()
+_stats = PoolStats()
+_clients: Dict[Tuple[str, Optional[str]], OpenAI] = {}
+_aclients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[str, Optional[str]], AsyncOpenAI]]" = weakref.WeakKeyDictionary()
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(max_connections=POOL["max_connections"], max_keepalive_connections=POOL["max_keepalive_connections"], keepalive_expiry=POOL["keepalive_expiry"])
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(600.0, connect=POOL["connect_timeout"])
+
+def configure_pool(**kw):
+    # New settings apply to clients created afterwards; the old clients' pools are closed.
+    unknown = set(kw) - set(POOL)
+    if unknown:
+        raise ValueError(f"Unknown pool settings: {', '.join(sorted(unknown))}")
+    with _lock:
+        POOL.update(kw)
+        old, aold = list(_clients.values()), [(loop, c) for loop, per in _aclients.items() for c in per.values()]
+        _clients.clear()
+        _aclients.clear()
+    for c in old:
+        c.close()
+    for loop, c in aold:
+        # Async pools must be closed on the loop that owns them.
+        if loop.is_running():
+            asyncio.run_coroutine_threadsafe(c.close(), loop)
+        elif not loop.is_closed():
+            loop.run_until_complete(c.close())
+
+def get_client(api_key: str, base_url: str = None) -> OpenAI:
+    key = (api_key, base_url)
+    with _lock:
+        c = _clients.get(key)
+        if c is None:
+            http = httpx.Client(limits=_limits(), timeout=_timeout(), http2=POOL["http2"], event_hooks={"request": [_stats.on_request], "response": [_stats.on_response, _observe_limits]})
+            # Retries belong to the rate scheduler, which sees every caller; SDK retries would not.
+            c = _clients[key] = OpenAI(api_key=api_key, base_url=base_url, http_client=http, max_retries=0)
+        return c
+
+def get_async_client(api_key: str, base_url: str = None) -> AsyncOpenAI:
+    # httpx.AsyncClient pools are bound to the loop they were created on, so async clients are per loop.
+    loop = asyncio.get_running_loop()
+    key = (api_key, base_url)
+    with _lock:
+        per_loop = _aclients.setdefault(loop, {})
+        c = per_loop.get(key)
+        if c is None:
+            async def on_request(request: httpx.Request):
+                _stats.on_request(request, async_=True)
+            async def on_response(response: httpx.Response):
+                _stats.on_response(response)
+                _observe_limits(response)
+            http = httpx.AsyncClient(limits=_limits(), timeout=_timeout(), http2=POOL["http2"], event_hooks={"request": [on_request], "response": [on_response]})
+            c = per_loop[key] = AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=http, max_retries=0)
+        return c
+
+def pool_stats() -> Dict[str, Any]:
+    with _lock:
+        sync_clients = len(_clients)
+        async_clients = sum(len(v) for v in _aclients.values())
+    return {**_stats.snapshot(), "clients": sync_clients, "async_clients": async_clients, "http2": POOL["http2"], "max_connections": POOL["max_connections"]}
+
+_loop = None
+
+def event_loop() -> asyncio.AbstractEventLoop:
+    # One long-lived loop on a daemon thread, so async clients (and their keep-alive
+    # connections) survive across Streamlit reruns instead of dying with a per-run loop.
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="krew-loop", daemon=True).start()
+        return _loop
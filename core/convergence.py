@@ -0,0 +1,73 @@
+from typing import Dict, Any, List, Set
+import re
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+def shingles(text: str, n: int = 3) -> Set[int]:
+    words = _WORD.findall(text.lower())
+    if len(words) < n:
+        return {hash(tuple(words))} if words else set()
+    return {hash(tuple(words[i:i + n])) for i in range(len(words) - n + 1)}
+
+class ConvergencePolicy:
+    # A turn whose word 3-grams are mostly already in the transcript adds little. After
+    # `patience` such turns in a row, the remaining collaboration turns are skipped.
+    def __init__(self, enabled: bool = True, threshold: float = 0.3, patience: int = 2, skip_synthesis: bool = False):
+        self.enabled = enabled
+        self.threshold = threshold
+        self.patience = patience
+        # Use a FINAL_ANSWER directly as the result instead of paying for one more synthesis call.
+        self.skip_synthesis = skip_synthesis
+
+class ConvergenceMonitor:
+    def __init__(self, policy: ConvergencePolicy, planned_turns: int):
+        self.policy = policy
+        self.planned = planned_turns
+        self.seen: Set[int] = set()
+        self.novelty: List[float] = []
+        self.tokens: List[int] = []
+        self.stopped_early = False
+        self.synthesis_skipped = False
+        # Index of the first turn that counts towards patience (see arm()).
+        self._armed = 0
+
+    def arm(self):
+        # Stop checks start here: earlier turns (e.g. round 1) still seed the seen set but do
+        # not count towards patience.
+        self._armed = len(self.novelty)
+
+    def seed(self, text: str):
+        self.seen |= shingles(text)
+
+    def observe(self, text: str, tokens: int = 0) -> float:
+        sh = shingles(text)
+        score = len(sh - self.seen) / len(sh) if sh else 0.0
+        self.seen |= sh
+        self.novelty.append(score)
+        self.tokens.append(tokens)
+        return score
+
+    @property
+    def converged(self) -> bool:
+        p = self.policy
+        tail = self.novelty[max(len(self.novelty) - p.patience, self._armed):]
+        return p.enabled and len(tail) == p.patience and all(s < p.threshold for s in tail)
+
+    def stop(self) -> bool:
+        if self.converged:
+            self.stopped_early = True
+        return self.stopped_early
+
+    def summary(self) -> Dict[str, Any]:
+        run = len(self.novelty)
+        saved = max(self.planned - run, 0)
+        per_turn = sum(self.tokens) / run if run else 0
+        return {
+            "turns_planned": self.planned,
+            "turns_run": run,
+            "turns_saved": saved,
+            "tokens_saved_est": int(saved * per_turn) + (int(per_turn) if self.synthesis_skipped else 0),
+            "stopped_early": self.stopped_early,
+            "synthesis_skipped": self.synthesis_skipped,
+            "novelty": [round(s, 3) for s in self.novelty],
+        }
@@ -0,0 +1,201 @@
+from typing import Dict, Any, List, Optional
+from core.cache import CACHE_DIR
+from core.events import jsonable
+import threading
+import atexit
+import sqlite3
+import queue
+import json
+import zlib
+import uuid
+import time
+import os
+
+# Events that complete a model turn; "plan" keeps the raw planner reply under "answer".
+TURN_TYPES = ("plan", "agent", "final_result")
+# Most queued writes committed in one transaction by the writer thread.
+WRITE_BATCH = 256
+
+def _dump(obj: Any) -> str:
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False, default=jsonable)
+
+class EventLog:
+    # Append-only per-session event log in SQLite (WAL). Events are stored as compact JSON
+    # rows keyed by (session_id, seq); the run config sits alongside so an interrupted run can
+    # be resumed (its completed turns are replayed, which rebuilds the transcript) and a
+    # finished one replayed from disk.
+    # Each start or resume of a session begins a new run; journals are bound to the run they were
+    # opened for, so a replaced run's late events and final status never reach its successor.
+    # Writes from runs (append, finish) are queued to one writer thread that commits
+    # them in batches, so the event loop never waits on SQLite; reads flush the queue first.
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, task TEXT NOT NULL, status TEXT NOT NULL, error TEXT, config BLOB NOT NULL, created REAL NOT NULL, updated REAL NOT NULL, events INTEGER NOT NULL DEFAULT 0, run TEXT)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS events (session_id TEXT NOT NULL, seq INTEGER NOT NULL, type TEXT NOT NULL, data TEXT NOT NULL, phase TEXT, ts_ns INTEGER, PRIMARY KEY (session_id, seq)) WITHOUT ROWID")
+        if "phase" not in {r[1] for r in self._db.execute("PRAGMA table_info(events)")}:
+            self._db.execute("ALTER TABLE events ADD COLUMN phase TEXT")
+            self._db.execute("ALTER TABLE events ADD COLUMN ts_ns INTEGER")
+            self._db.execute("UPDATE events SET phase = json_extract(data, '$.phase'), ts_ns = json_extract(data, '$.ts_ns')")
+        if "run" not in {r[1] for r in self._db.execute("PRAGMA table_info(sessions)")}:
+            self._db.execute("ALTER TABLE sessions ADD COLUMN run TEXT")
+        # Transcript snapshots were never read back: resume rebuilds the transcript by replay.
+        self._db.execute("DROP TABLE IF EXISTS snapshots")
+        self._db.commit()
+        self._queue: "queue.Queue" = queue.Queue()
+        self.dropped = 0
+        self._writer = threading.Thread(target=self._drain, name="krew-eventlog", daemon=True)
+        self._writer.start()
+        atexit.register(self.flush)
+
+    def _drain(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < WRITE_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with self._lock:
+                    for fn, args in batch:
+                        try:
+                            fn(*args)
+                        except sqlite3.Error:
+                            # A failed write must not take the writer (and every later write) down.
+                            self.dropped += 1
+                    self._db.commit()
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def flush(self):
+        # Waits until every queued write is committed.
+        self._queue.join()
+
+    def start(self, session_id: str, config: Dict[str, Any]):
+        # A new run for a session replaces whatever was logged for it before.
+        now = time.time()
+        self.flush()
+        with self._lock:
+            self._db.execute("DELETE FROM events WHERE session_id = ?", (session_id,))
+            self._db.execute("INSERT OR REPLACE INTO sessions (session_id, task, status, error, config, created, updated, events, run) VALUES (?, ?, 'running', NULL, ?, ?, ?, 0, ?)",
+                             (session_id, config.get("task", ""), zlib.compress(_dump(config).encode("utf-8")), now, now, uuid.uuid4().hex))
+            self._db.commit()
+
+    # Run-side writes; `run` is the journal's run, and writes for a run that is no longer the
+    # session's current one are dropped.
+    def append(self, session_id: str, ev: Dict[str, Any], run: Optional[str] = None):
+        self._queue.put((self._append, (session_id, run, str(ev.get("type", "")), _dump(ev), ev.get("phase") or None, ev.get("ts_ns"), time.time())))
+
+    def finish(self, session_id: str, status: str, error: Optional[str] = None, run: Optional[str] = None):
+        self._queue.put((self._finish, (session_id, run, status, error, time.time())))
+
+    def _append(self, session_id: str, run: Optional[str], type: str, data: str, phase: Optional[str], ts_ns: Optional[int], now: float):
+        row = self._db.execute("SELECT events FROM sessions WHERE session_id = ? AND run IS ?", (session_id, run)).fetchone()
+        if row is not None:
+            self._db.execute("INSERT INTO events (session_id, seq, type, data, phase, ts_ns) VALUES (?, ?, ?, ?, ?, ?)", (session_id, row[0] + 1, type, data, phase, ts_ns))
+            self._db.execute("UPDATE sessions SET events = ?, updated = ? WHERE session_id = ?", (row[0] + 1, now, session_id))
+
+    def _finish(self, session_id: str, run: Optional[str], status: str, error: Optional[str], now: float):
+        self._db.execute("UPDATE sessions SET status = ?, error = ?, updated = ? WHERE session_id = ? AND run IS ?", (status, error, now, session_id, run))
+
+    def events(self, session_id: str, offset: int = 0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        self.flush()
+        with self._lock:
+            rows = self._db.execute("SELECT data FROM events WHERE session_id = ? AND seq > ? ORDER BY seq LIMIT ?", (session_id, offset, -1 if limit is None else limit)).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def outline(self, session_id: str) -> Dict[str, Any]:
+        # What a paged view needs without reading event bodies into Python: the event count,
+        # counts per type, section starts (a phase change, or the first event) and their times,
+        # the last event's time, per-call telemetry and the index of the last final result.
+        self.flush()
+        with self._lock:
+            counts = dict(self._db.execute("SELECT type, COUNT(*) FROM events WHERE session_id = ? GROUP BY type", (session_id,)).fetchall())
+            starts = self._db.execute("SELECT seq, phase, ts_ns FROM events WHERE session_id = ? AND (phase IS NOT NULL OR seq = 1) ORDER BY seq", (session_id,)).fetchall()
+            last = self._db.execute("SELECT seq, ts_ns FROM events WHERE session_id = ? ORDER BY seq DESC LIMIT 1", (session_id,)).fetchone()
+            tel = self._db.execute("SELECT json_extract(data, '$.sender'), json_extract(data, '$.telemetry') FROM events WHERE session_id = ? AND type IN (?, ?, ?) AND json_extract(data, '$.telemetry') IS NOT NULL ORDER BY seq", (session_id, *TURN_TYPES)).fetchall()
+            final = self._db.execute("SELECT MAX(seq) FROM events WHERE session_id = ? AND type = 'final_result'", (session_id,)).fetchone()[0]
+        times = {seq - 1: ts for seq, _, ts in starts}
+        if last:
+            times[last[0] - 1] = last[1]
+        return {"events": last[0] if last else 0, "counts": counts, "sections": [(phase or "", seq - 1) for seq, phase, _ in starts], "times": times,
+                "telemetry": [{"sender": sender, "telemetry": json.loads(t)} for sender, t in tel], "final": None if final is None else final - 1}
+
+    def session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        self.flush()
+        with self._lock:
+            row = self._db.execute("SELECT session_id, task, status, error, config, created, updated, events FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        if row is None:
+            return None
+        return {"session_id": row[0], "task": row[1], "status": row[2], "error": row[3], "config": json.loads(zlib.decompress(row[4])), "created": row[5], "updated": row[6], "events": row[7]}
+
+    def sessions(self, limit: int = 20, ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        # With `ids`, only those sessions (e.g. the ones a browser session started).
+        if ids is not None and not ids:
+            return []
+        self.flush()
+        where = f"WHERE session_id IN ({','.join('?' * len(ids))}) " if ids is not None else ""
+        with self._lock:
+            rows = self._db.execute(f"SELECT session_id, task, status, error, created, updated, events FROM sessions {where}ORDER BY updated DESC LIMIT ?", (*(ids or ()), limit)).fetchall()
+        return [dict(zip(("session_id", "task", "status", "error", "created", "updated", "events"), r)) for r in rows]
+
+    def resume(self, session_id: str) -> List[str]:
+        # Drops anything logged after the last completed turn and returns the answers of all
+        # completed turns, in order, for Manager.adelegate_task(replay=...).
+        self.flush()
+        with self._lock:
+            rows = self._db.execute("SELECT seq, data FROM events WHERE session_id = ? AND type IN (?, ?, ?) ORDER BY seq", (session_id, *TURN_TYPES)).fetchall()
+            last = rows[-1][0] if rows else 0
+            self._db.execute("DELETE FROM events WHERE session_id = ? AND seq > ?", (session_id, last))
+            self._db.execute("UPDATE sessions SET events = ?, status = 'running', error = NULL, updated = ?, run = ? WHERE session_id = ?", (last, time.time(), uuid.uuid4().hex, session_id))
+            self._db.commit()
+        return [ev.get("answer", ev["message"]) for ev in (json.loads(d) for _, d in rows)]
+
+    def digests(self, session_id: str) -> List[Dict[str, Any]]:
+        # Summary events still in the log (call after resume()), for adelegate_task(digests=...).
+        self.flush()
+        with self._lock:
+            rows = self._db.execute("SELECT data FROM events WHERE session_id = ? AND type = 'summary' ORDER BY seq", (session_id,)).fetchall()
+        return [ev for ev in (json.loads(r[0]) for r in rows) if "segment" in ev]
+
+    def delete(self, session_id: str):
+        self.flush()
+        with self._lock:
+            for table in ("events", "sessions"):
+                self._db.execute(f"DELETE FROM {table} WHERE session_id = ?", (session_id,))
+            self._db.commit()
+
+    def journal(self, session_id: str) -> "Journal":
+        # Bound to the session's current run: open it after start() or resume().
+        self.flush()
+        with self._lock:
+            row = self._db.execute("SELECT run FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return Journal(self, session_id, row[0] if row else None)
+
+class Journal:
+    # An EventLog bound to one run of a session; this is what Manager writes to.
+    def __init__(self, log: EventLog, session_id: str, run: Optional[str] = None):
+        self.log = log
+        self.session_id = session_id
+        self.run = run
+
+    def append(self, ev: Dict[str, Any]):
+        self.log.append(self.session_id, ev, self.run)
+
+    def finish(self, status: str, error: Optional[str] = None):
+        self.log.finish(self.session_id, status, error, self.run)
+
+_shared = None
+_shared_lock = threading.Lock()
+
+def shared_log() -> EventLog:
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = EventLog(os.path.join(CACHE_DIR, "sessions.sqlite"))
+        return _shared
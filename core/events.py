@@ -0,0 +1,117 @@
+from typing import Dict, Any, Iterator, Optional
+from collections.abc import Mapping
+from types import MappingProxyType
+from enum import Enum
+import time
+import sys
+
+class EventType(str, Enum):
+    # str-valued, so `ev["type"] == "agent"` and JSON output are unchanged.
+    MANAGER = "manager"
+    AGENT = "agent"
+    AGENT_DELTA = "agent_delta"
+    THINKING = "thinking"
+    COMPLETION = "completion"
+    FINAL_RESULT = "final_result"
+    SUMMARY = "summary"
+    PLAN = "plan"
+    TIMEOUT = "timeout"
+    ERROR = "error"
+
+    __str__ = str.__str__
+    __format__ = str.__format__
+
+# Wall-clock time of the monotonic clock's zero, taken once: event times are read from the
+# monotonic clock (exact differences, no per-event datetime) and shown as wall-clock time.
+_WALL0_NS = time.time_ns() - time.monotonic_ns()
+
+_FIELDS = ("sender", "message", "type", "timestamp", "ts_ns")
+# Optional fields common enough to get a slot; absent (None) ones are not keys.
+_OPTIONAL = ("agent_id", "phase", "telemetry")
+
+class Event(Mapping):
+    __slots__ = ("sender", "message", "type", "t_ns", "agent_id", "phase", "telemetry", "extra")
+
+    # One orchestration event. Reads like the dict it replaces (ev["type"], ev.get("telemetry"),
+    # {**ev}), but keeps its fields in slots, senders and agent ids interned and the type as an
+    # EventType; only rarer fields (node, plan, convergence, ...) live in `extra`. Events are
+    # immutable, telemetry included (a read-only copy): with_() makes a changed copy.
+    def __init__(self, sender: str, message: str, type: EventType, t_ns: Optional[int] = None, agent_id: Optional[str] = None, phase: Optional[str] = None, telemetry: Optional[Dict[str, Any]] = None, **extra):
+        _set = object.__setattr__
+        _set(self, "sender", sys.intern(sender))
+        _set(self, "message", message)
+        _set(self, "type", EventType(type))
+        _set(self, "t_ns", time.monotonic_ns() if t_ns is None else t_ns)
+        _set(self, "agent_id", agent_id and sys.intern(agent_id))
+        _set(self, "phase", phase)
+        _set(self, "telemetry", None if telemetry is None else MappingProxyType(dict(telemetry)))
+        _set(self, "extra", extra or None)
+
+    def __setattr__(self, name: str, value: Any):
+        raise AttributeError(f"Event is immutable; use with_({name}=...)")
+
+    def __delattr__(self, name: str):
+        raise AttributeError("Event is immutable")
+
+    @property
+    def ts_ns(self) -> int:
+        # Nanoseconds since the epoch.
+        return _WALL0_NS + self.t_ns
+
+    @property
+    def timestamp(self) -> str:
+        return time.strftime("%H:%M:%S", time.localtime(self.ts_ns / 1e9))
+
+    def __getitem__(self, key: str) -> Any:
+        if key in _FIELDS:
+            return getattr(self, key)
+        if key in _OPTIONAL:
+            v = getattr(self, key)
+            if v is not None:
+                return v
+        elif self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in _FIELDS:
+            return getattr(self, key)
+        if key in _OPTIONAL:
+            v = getattr(self, key)
+            return default if v is None else v
+        return self.extra.get(key, default) if self.extra else default
+
+    def __iter__(self) -> Iterator[str]:
+        yield from _FIELDS
+        for k in _OPTIONAL:
+            if getattr(self, k) is not None:
+                yield k
+        if self.extra:
+            yield from self.extra
+
+    def __len__(self) -> int:
+        return len(_FIELDS) + sum(getattr(self, k) is not None for k in _OPTIONAL) + len(self.extra or ())
+
+    def __repr__(self) -> str:
+        return f"Event({self.sender!r}, {self.type.value}, {self.message[:40]!r})"
+
+    def with_(self, **changes) -> "Event":
+        # A copy with fields replaced or added; the time is kept.
+        fields = {"sender": self.sender, "message": self.message, "type": self.type, "agent_id": self.agent_id, "phase": self.phase, "telemetry": self.telemetry, **(self.extra or {}), **changes}
+        return Event(fields.pop("sender"), fields.pop("message"), fields.pop("type"), self.t_ns, **fields)
+
+    def to_dict(self) -> Dict[str, Any]:
+        d = {"sender": self.sender, "message": self.message, "type": self.type.value, "timestamp": self.timestamp, "ts_ns": self.ts_ns}
+        for k in _OPTIONAL:
+            v = getattr(self, k)
+            if v is not None:
+                d[k] = dict(v) if k == "telemetry" else v
+        if self.extra:
+            d.update(self.extra)
+        return d
+
+def jsonable(obj: Any) -> Any:
+    # `default=` hook for json.dumps over structures holding events.
+    if isinstance(obj, Event):
+        return obj.to_dict()
+    return dict(obj) if isinstance(obj, MappingProxyType) else str(obj)
@@ -0,0 +1,108 @@
+from typing import Dict, Any, List, Iterable, IO
+from datetime import datetime
+from core.telemetry import summarize
+from core.events import jsonable
+import tempfile
+import zipfile
+import shutil
+import json
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# name -> (zip method, zip level, parquet codec, parquet level). zstd zip entries need Python
+# 3.14+; before that "zstd" entries are deflated and only the Parquet file uses zstd.
+ZIP_ZSTD = getattr(zipfile, "ZIP_ZSTANDARD", None)
+COMPRESSION = {
+    "deflate-fast": (zipfile.ZIP_DEFLATED, 1, "zstd", 1),
+    "deflate": (zipfile.ZIP_DEFLATED, 6, "zstd", 3),
+    "deflate-max": (zipfile.ZIP_DEFLATED, 9, "zstd", 9),
+    "zstd": (ZIP_ZSTD or zipfile.ZIP_DEFLATED, 3 if ZIP_ZSTD else 6, "zstd", 3),
+    "stored": (zipfile.ZIP_STORED, None, "none", None),
+}
+DEFAULT_COMPRESSION = "deflate"
+# Packages up to this size stay in memory; larger ones spill to a temp file.
+SPOOL_BYTES = 8 * 1024 * 1024
+CHUNK = 256 * 1024
+
+TELEMETRY_COLUMNS = ("phase", "model", "route", "latency_s", "ttft_s", "queued_s", "prompt_tokens", "completion_tokens", "cost_usd", "cached")
+
+def _complete(messages: Iterable[Dict[str, Any]]) -> Iterable[Dict[str, Any]]:
+    return (m for m in messages if m.get("type") != "agent_delta")
+
+def _dump(obj: Any, **kw) -> str:
+    return json.dumps(obj, ensure_ascii=False, default=jsonable, **kw)
+
+def _lines(fh: IO[bytes], parts: Iterable[str]):
+    # Buffers small writes so each compressor call gets a reasonable chunk.
+    buf, size = [], 0
+    for p in parts:
+        buf.append(p)
+        size += len(p)
+        if size >= CHUNK:
+            fh.write("".join(buf).encode("utf-8"))
+            buf, size = [], 0
+    if buf:
+        fh.write("".join(buf).encode("utf-8"))
+
+def _transcript(messages: List[Dict[str, Any]]) -> Iterable[str]:
+    for i, m in enumerate(_complete(messages)):
+        yield ("\n\n" if i else "") + f"[{m.get('timestamp', '')}] {m.get('sender', '')} ({m.get('type', '')}):\n{m.get('message', '')}"
+
+def _json_array(messages: List[Dict[str, Any]]) -> Iterable[str]:
+    yield "["
+    for i, m in enumerate(messages):
+        yield ("," if i else "") + "\n  " + _dump(m, indent=2).replace("\n", "\n  ")
+    yield "\n]"
+
+def _table(messages: List[Dict[str, Any]]):
+    # One row per complete event, telemetry flattened into typed columns.
+    rows = list(_complete(messages))
+    tel = [m.get("telemetry") or {} for m in rows]
+    cols = {
+        "seq": pa.array(range(len(rows)), pa.int32()),
+        "timestamp": pa.array([m.get("timestamp", "") for m in rows], pa.string()),
+        "ts_ns": pa.array([m.get("ts_ns") for m in rows], pa.int64()),
+        "sender": pa.array([m.get("sender", "") for m in rows], pa.string()).dictionary_encode(),
+        "type": pa.array([m.get("type", "") for m in rows], pa.string()).dictionary_encode(),
+        "node": pa.array([m.get("node") for m in rows], pa.string()),
+        "message": pa.array([m.get("message", "") for m in rows], pa.string()),
+    }
+    types = {"latency_s": pa.float64(), "ttft_s": pa.float64(), "queued_s": pa.float64(), "cost_usd": pa.float64(), "prompt_tokens": pa.int64(), "completion_tokens": pa.int64(), "cached": pa.bool_()}
+    for c in TELEMETRY_COLUMNS:
+        cols[c] = pa.array([t.get(c) for t in tel], types.get(c, pa.string()))
+    return pa.table(cols)
+
+def write_export_package(fh: IO[bytes], session_id: str, messages: List[Dict[str, Any]], agents_cfg: List[Dict[str, Any]], max_turns: int, compression: str = DEFAULT_COMPRESSION):
+    method, level, codec, codec_level = COMPRESSION[compression]
+    final = next((m for m in reversed(messages) if m.get("type") == "final_result"), None)
+    config = {"session_id": session_id, "exported_at": datetime.now().isoformat(timespec="seconds"), "max_turns": max_turns, "agents": agents_cfg, "compression": compression}
+    with zipfile.ZipFile(fh, "w", method, compresslevel=level) as z:
+        # Entries are streamed, so no serialized copy of the whole transcript is held at once.
+        with z.open("transcript.txt", "w") as e:
+            _lines(e, _transcript(messages))
+        with z.open("messages.json", "w") as e:
+            _lines(e, _json_array(messages))
+        with z.open("messages.jsonl", "w") as e:
+            _lines(e, (_dump(m) + "\n" for m in _complete(messages)))
+        if pq is not None:
+            with tempfile.SpooledTemporaryFile(SPOOL_BYTES) as tmp:
+                pq.write_table(_table(messages), tmp, compression=codec, compression_level=codec_level)
+                tmp.seek(0)
+                # Parquet is compressed already; deflating it again gains little.
+                with z.open(zipfile.ZipInfo("messages.parquet", date_time=datetime.now().timetuple()[:6]), "w") as e:
+                    shutil.copyfileobj(tmp, e, CHUNK)
+        z.writestr("config.json", _dump(config, indent=2))
+        z.writestr("telemetry.json", json.dumps(summarize(messages), indent=2))
+        if final is not None:
+            z.writestr("final_result.md", final.get("message", ""))
+
+def build_export_package(session_id: str, messages: List[Dict[str, Any]], agents_cfg: List[Dict[str, Any]], max_turns: int, compression: str = DEFAULT_COMPRESSION) -> IO[bytes]:
+    # Returns the package as a spooled temp file positioned at 0; the caller closes it.
+    fh = tempfile.SpooledTemporaryFile(SPOOL_BYTES)
+    write_export_package(fh, session_id, messages, agents_cfg, max_turns, compression)
+    fh.seek(0)
+    return fh
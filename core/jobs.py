@@ -0,0 +1,181 @@
+from typing import Dict, Any, List, Optional, Callable, AsyncGenerator, Tuple
+from core.clients import event_loop
+from core.events import Event, EventType
+import concurrent.futures
+import threading
+import asyncio
+import uuid
+import time
+import os
+
+ACTIVE = ("queued", "running")
+
+class Saturated(RuntimeError):
+    pass
+
+class Job:
+    # One orchestration run. Complete events are buffered for pollers; streamed deltas only
+    # keep the reply currently being written, so the buffer grows by one entry per message.
+    def __init__(self, session_id: str):
+        self.id = str(uuid.uuid4())
+        self.session_id = session_id
+        self.status = "queued"
+        self.error: Optional[str] = None
+        self.events: List[Dict[str, Any]] = []
+        self.live: Optional[Tuple[str, str]] = None
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self._lock = threading.Lock()
+        self._future: Optional[concurrent.futures.Future] = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in ACTIVE
+
+    def _push(self, ev: Dict[str, Any]):
+        with self._lock:
+            if ev.get("type") == EventType.AGENT_DELTA:
+                sender, text = self.live if self.live and self.live[0] == ev["sender"] else (ev["sender"], "")
+                self.live = (sender, text + ev["message"])
+            else:
+                self.live = None
+                self.events.append(ev)
+
+    def poll(self, cursor: int = 0) -> Tuple[List[Dict[str, Any]], int, Optional[Tuple[str, str]]]:
+        # Events after `cursor`, the new cursor, and the (sender, text) of any reply in progress.
+        with self._lock:
+            return self.events[cursor:], len(self.events), self.live
+
+    def cancel(self):
+        if self._future is not None:
+            self._future.cancel()
+
+    def _cancelled_early(self):
+        # Cancelled before the loop ever started the run.
+        self.status, self.finished = "cancelled", time.time()
+
+    def summary(self) -> Dict[str, Any]:
+        end = self.finished or time.time()
+        return {"id": self.id, "session_id": self.session_id, "status": self.status, "events": len(self.events), "error": self.error,
+                "wait_s": round((self.started or end) - self.created, 2), "run_s": round(end - self.started, 2) if self.started else 0.0}
+
+class JobQueue:
+    # Runs live on the shared event loop, not in the Streamlit script thread, so they survive
+    # reruns and widget clicks. At most `max_concurrent` runs execute; the rest wait in order,
+    # and with `max_queued` set a new run is refused (Saturated) once that many are waiting.
+    def __init__(self, max_concurrent: int = 4, ttl: float = 3600.0, max_queued: Optional[int] = None):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.ttl = ttl
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._running = 0
+        self._rejected = 0
+        self._cond: Optional[asyncio.Condition] = None
+
+    def configure(self, max_concurrent: int):
+        self.max_concurrent = max(1, max_concurrent)
+        loop = event_loop()
+        loop.call_soon_threadsafe(lambda: loop.create_task(self._wake()))
+
+    async def _wake(self):
+        async with self._condition():
+            self._cond.notify_all()
+
+    def _condition(self) -> asyncio.Condition:
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    def _full(self, session_id: str) -> bool:
+        # A run replacing the session's own queued run does not add to the queue.
+        if self.max_queued is None:
+            return False
+        queued = sum(j.status == "queued" and sid != session_id for sid, j in self._jobs.items())
+        running = sum(j.status == "running" and sid != session_id for sid, j in self._jobs.items())
+        return running >= self.max_concurrent and queued >= self.max_queued
+
+    def admits(self, session_id: str) -> bool:
+        with self._lock:
+            return not self._full(session_id)
+
+    def submit(self, session_id: str, make: Callable[[], AsyncGenerator[Dict[str, Any], None]]) -> Job:
+        # A new run for a session replaces (and cancels) the one it already has.
+        job = Job(session_id)
+        with self._lock:
+            self._prune()
+            if self._full(session_id):
+                self._rejected += 1
+                raise Saturated(f"Server busy: {self.max_concurrent} runs executing and {self.max_queued} waiting. Try again shortly.")
+            old = self._jobs.get(session_id)
+            self._jobs[session_id] = job
+        if old is not None:
+            old.cancel()
+        job._future = asyncio.run_coroutine_threadsafe(self._run(job, make), event_loop())
+        job._future.add_done_callback(lambda f: f.cancelled() and job.active and job._cancelled_early())
+        return job
+
+    def get(self, session_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(session_id)
+
+    def cancel(self, session_id: str) -> bool:
+        job = self.get(session_id)
+        if job is None or not job.active:
+            return False
+        job.cancel()
+        return True
+
+    def _prune(self):
+        cutoff = time.time() - self.ttl
+        for sid in [s for s, j in self._jobs.items() if not j.active and (j.finished or 0) < cutoff]:
+            del self._jobs[sid]
+
+    async def _run(self, job: Job, make: Callable[[], AsyncGenerator[Dict[str, Any], None]]):
+        cond = self._condition()
+        try:
+            async with cond:
+                await cond.wait_for(lambda: self._running < self.max_concurrent)
+                self._running += 1
+        except asyncio.CancelledError:
+            job.status, job.finished = "cancelled", time.time()
+            raise
+        job.status, job.started = "running", time.time()
+        agen = make()
+        try:
+            async for ev in agen:
+                job._push(ev)
+            job.status = "done"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+            job._push(Event("System", "⏹️ Run cancelled", EventType.TIMEOUT))
+            raise
+        except Exception as ex:
+            job.status, job.error = "failed", f"{type(ex).__name__}: {ex}"
+            job._push(Event("System", f"❌ Run failed: {job.error}", EventType.ERROR))
+        finally:
+            job.finished = time.time()
+            await agen.aclose()
+            async with cond:
+                self._running -= 1
+                cond.notify_all()
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        now = time.time()
+        waits = [now - j.created for j in jobs if j.status == "queued"]
+        started = [j.started - j.created for j in jobs if j.started]
+        return {"max_concurrent": self.max_concurrent, "max_queued": self.max_queued, "running": sum(j.status == "running" for j in jobs), "queued": len(waits), "finished": sum(not j.active for j in jobs), "rejected": self._rejected,
+                "oldest_wait_s": round(max(waits, default=0.0), 2), "avg_wait_s": round(sum(started) / len(started), 2) if started else 0.0}
+
+_shared = None
+_shared_lock = threading.Lock()
+
+def shared_jobs() -> JobQueue:
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = JobQueue(max_concurrent=int(os.environ.get("KREW_MAX_RUNS", "4")), max_queued=int(os.environ.get("KREW_MAX_QUEUED", "8")))
+        return _shared
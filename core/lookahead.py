@@ -0,0 +1,76 @@
+from typing import Dict, Any, AsyncGenerator, Optional
+from collections import deque
+import asyncio
+
+DEFAULT_DEPTH = 8
+
+class Lookahead:
+    # Runs an event generator in its own task up to `depth` complete events ahead of the
+    # consumer, so the next model call is already in flight while earlier events are still being
+    # handled or rendered. Streamed deltas do not count against the depth (holding them back would
+    # stall the HTTP stream itself). Closing it cancels the task, which closes the generator and
+    # any request in flight; an error from the generator is raised after the buffered events.
+    def __init__(self, agen: AsyncGenerator[Dict[str, Any], None], depth: int = DEFAULT_DEPTH):
+        self.depth = max(1, depth)
+        self._agen = agen
+        self._buf: deque = deque()
+        self._held = 0
+        self._cond = asyncio.Condition()
+        self._task: Optional[asyncio.Task] = None
+        self._done = False
+        self._error: Optional[BaseException] = None
+        self.max_held = 0
+        self.stalls = 0
+        self.waits = 0
+
+    def __aiter__(self):
+        return self
+
+    async def _pump(self):
+        try:
+            async for ev in self._agen:
+                async with self._cond:
+                    if ev.get("type") != "agent_delta":
+                        if self._held >= self.depth:
+                            self.stalls += 1
+                            await self._cond.wait_for(lambda: self._held < self.depth)
+                        self._held += 1
+                        self.max_held = max(self.max_held, self._held)
+                    self._buf.append(ev)
+                    self._cond.notify_all()
+        except Exception as ex:
+            self._error = ex
+        finally:
+            await self._agen.aclose()
+            async with self._cond:
+                self._done = True
+                self._cond.notify_all()
+
+    async def __anext__(self) -> Dict[str, Any]:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._pump())
+        async with self._cond:
+            if not self._buf and not self._done:
+                self.waits += 1
+                await self._cond.wait_for(lambda: self._buf or self._done)
+            if not self._buf:
+                if self._error is not None:
+                    err, self._error = self._error, None
+                    raise err
+                raise StopAsyncIteration
+            ev = self._buf.popleft()
+            if ev.get("type") != "agent_delta":
+                self._held -= 1
+                self._cond.notify_all()
+            return ev
+
+    async def aclose(self):
+        if self._task is None:
+            await self._agen.aclose()
+            return
+        self._task.cancel()
+        await asyncio.wait([self._task])
+
+    def summary(self) -> Dict[str, Any]:
+        # stalls: times the run waited on the consumer; waits: times the consumer waited on the run.
+        return {"depth": self.depth, "max_buffered": self.max_held, "stalls": self.stalls, "waits": self.waits}
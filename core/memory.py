@@ -0,0 +1,171 @@
+from typing import Dict, Any, List, Optional, Tuple
+from core.transcript import Transcript, Turn
+from core.ratelimit import priority_for
+import asyncio
+
+SUMMARY_MODEL = "gpt-4.1-nano"
+
+class Digest:
+    __slots__ = ("label", "text", "tokens", "source_tokens", "start", "end", "level", "stats", "replayed")
+
+    def __init__(self, label: str, text: str, tokens: int, source_tokens: int, start: int, end: int, level: int = 1, stats: Optional[Dict[str, Any]] = None, replayed: bool = False):
+        self.label = label
+        self.text = text
+        self.tokens = tokens
+        self.source_tokens = source_tokens
+        self.start = start
+        self.end = end
+        self.level = level
+        self.stats = stats or {}
+        # Restored from an earlier run's log rather than written by the summarizer.
+        self.replayed = replayed
+
+    @property
+    def key(self) -> Tuple[int, int, int]:
+        return self.start, self.end, self.level
+
+    def segment(self) -> Dict[str, Any]:
+        # Everything but the text, which summary events carry as "digest".
+        return {"label": self.label, "tokens": self.tokens, "source_tokens": self.source_tokens, "start": self.start, "end": self.end, "level": self.level}
+
+    @classmethod
+    def restore(cls, ev: Dict[str, Any]) -> "Digest":
+        return cls(text=ev["digest"], replayed=True, **ev["segment"])
+
+class RollingMemory:
+    # Multi-level view of a Transcript for prompts. Turns since the last usable digest stay
+    # verbatim; each closed segment (a round, or a block of consensus turns) is condensed by a
+    # cheaper summarizer in the background; once digests outgrow their share of a window the
+    # two oldest are merged into a higher-level digest. A segment's digest is only used from
+    # the segment after next, and is awaited then, so the summarizer stays off the critical
+    # path and prompts do not depend on how fast it answers.
+    # `known` holds digests an interrupted run already logged (see EventLog.digests); a resumed
+    # run reuses them for the same segments instead of asking the summarizer again.
+    def __init__(self, transcript: Transcript, summarizer, digest_tokens: int = 150, share: float = 0.4, known: Optional[List[Digest]] = None):
+        self.t = transcript
+        self.summarizer = summarizer
+        self.digest_tokens = digest_tokens
+        self.share = share
+        self.digests: List[Digest] = []
+        self._pending: List[asyncio.Task] = []
+        self._merge: Optional[asyncio.Task] = None
+        self._seg_start = 0
+        self._windows: Dict[Any, str] = {}
+        self._known: Dict[Tuple[int, int, int], Digest] = {d.key: d for d in known or ()}
+
+    def __len__(self) -> int:
+        return len(self.t)
+
+    @property
+    def tokens(self) -> int:
+        return self.t.tokens
+
+    @property
+    def header(self) -> str:
+        return self.t.header
+
+    @property
+    def turns(self) -> List[Turn]:
+        return self.t.turns
+
+    def append(self, sender: str, tag: str, text: str) -> Turn:
+        self._windows.clear()
+        return self.t.append(sender, tag, text)
+
+    def text(self) -> str:
+        return self.t.text()
+
+    def close_segment(self, label: str):
+        start, end = self._seg_start, len(self.t)
+        if end <= start:
+            return
+        self._seg_start = end
+        self._pending.append(asyncio.ensure_future(self._summarize(label, self.t.turns[start:end], start, end)))
+
+    async def settle(self, final: bool = False) -> List[Digest]:
+        # Called as a new segment starts; returns the digests that just became part of the view.
+        # final=True (before synthesis) also takes the most recently closed segment's digest.
+        ready = []
+        if self._merge is not None:
+            merged = await self._merge
+            self._merge = None
+            self.digests[:2] = [merged]
+            ready.append(merged)
+        while len(self._pending) > (0 if final else 1):
+            d = await self._pending.pop(0)
+            self.digests.append(d)
+            ready.append(d)
+        if not final and len(self.digests) > 1 and sum(d.tokens for d in self.digests) > 2 * self.digest_tokens:
+            self._merge = asyncio.ensure_future(self._combine(self.digests[0], self.digests[1]))
+        if ready:
+            self._windows.clear()
+        return ready
+
+    async def aclose(self):
+        for t in self._pending + ([self._merge] if self._merge else []):
+            t.cancel()
+
+    async def _condense(self, instruction: str, text: str, stats: Dict[str, Any]) -> str:
+        prompt = f"{instruction} Use at most {int(self.digest_tokens * 0.7)} words of dense bullet points: decisions, key facts and numbers, disagreements, open questions, and who proposed what. No preamble.\n\n{text}"
+        try:
+            return (await self.summarizer.agenerate(prompt, stats=stats, priority=priority_for("summary"))).strip()
+        except Exception as ex:
+            # The run must not fail because a digest could not be written; keep the head instead.
+            stats["error"] = f"{type(ex).__name__}: {ex}"
+            return await asyncio.to_thread(self.t.tok.head, text, self.digest_tokens)
+
+    async def _summarize(self, label: str, turns: List[Turn], start: int, end: int) -> Digest:
+        if (start, end, 1) in self._known:
+            return self._known[start, end, 1]
+        source = "\n\n".join(t.rendered for t in turns)
+        stats = {"phase": "summary"}
+        text = await self._condense(f"Summarize this discussion segment ({label}).", source, stats)
+        return Digest(label, text, await asyncio.to_thread(self.t.tok.count, text), sum(t.tokens for t in turns), start, end, 1, stats)
+
+    async def _combine(self, a: Digest, b: Digest) -> Digest:
+        level = max(a.level, b.level) + 1
+        if (a.start, b.end, level) in self._known:
+            return self._known[a.start, b.end, level]
+        stats = {"phase": "summary"}
+        label = f"{a.label.split(' – ')[0]} – {b.label.split(' – ')[-1]}"
+        text = await self._condense("Merge these two consecutive discussion digests into one, keeping every decision and number.", f"{a.label}:\n{a.text}\n\n{b.label}:\n{b.text}", stats)
+        return Digest(label, text, await asyncio.to_thread(self.t.tok.count, text), a.source_tokens + b.source_tokens, a.start, b.end, level, stats)
+
+    def window(self, budget: int, header: bool = True) -> str:
+        key = (budget, header)
+        if key not in self._windows:
+            self._windows[key] = self._render(budget, header)
+        return self._windows[key]
+
+    def log(self, budget: int) -> str:
+        # Stable-layout counterpart of window(): digests change only when settled, and the
+        # verbatim part is the transcript's append-only log of the turns they do not cover.
+        picked = self._pick(int(budget * self.share))
+        parts = ["EARLIER DISCUSSION (summarized):\n" + "\n".join(f"[{d.label}] {d.text}" for d in picked)] if picked else []
+        recent = self.t.log(budget - sum(d.tokens for d in picked), since=self.digests[-1].end if self.digests else 0)
+        return "\n\n".join(parts + ([recent] if recent else []))
+
+    def _pick(self, room: int) -> List[Digest]:
+        # Newest digests first, within `room`; returned oldest first.
+        picked = []
+        for d in reversed(self.digests):
+            if d.tokens > room:
+                break
+            picked.append(d)
+            room -= d.tokens
+        return picked[::-1]
+
+    def _render(self, budget: int, header: bool) -> str:
+        parts = []
+        if header and self.t.header and self.t.header_tokens <= budget:
+            parts.append(self.t.header)
+            budget -= self.t.header_tokens
+        # Digests within their share; anything they cover is not repeated verbatim.
+        picked = self._pick(int(budget * self.share))
+        if picked:
+            parts.append("EARLIER DISCUSSION (summarized):\n" + "\n".join(f"[{d.label}] {d.text}" for d in picked))
+            budget -= sum(d.tokens for d in picked)
+        recent = self.t.window(budget, header=False, since=self.digests[-1].end if self.digests else 0)
+        if recent:
+            parts.append(recent)
+        return "\n\n".join(parts)
@@ -0,0 +1,50 @@
+from typing import Dict, List, Any
+from collections import deque
+from core.tokens import Tokenizer
+import threading
+
+# OpenAI caches prompt prefixes of at least this many tokens, in steps of CACHE_STEP.
+CACHE_MIN = 1024
+CACHE_STEP = 128
+
+def common_prefix(a: str, b: str) -> int:
+    # Length of the common prefix; binary search on slice equality keeps the compares in C.
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[:mid] == b[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+def cacheable(tokens: int) -> int:
+    return 0 if tokens < CACHE_MIN else tokens - (tokens - CACHE_MIN) % CACHE_STEP
+
+class PrefixMonitor:
+    # Local check of how much of each prompt repeats the start of a recent one, i.e. what a
+    # provider-side prefix cache (or a local KV cache) could reuse. Shared by all agents of a run.
+    def __init__(self, keep: int = 16):
+        self._recent: deque = deque(maxlen=keep)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.prefix_tokens = 0
+
+    def observe(self, messages: List[Dict[str, str]], tok: Tokenizer) -> Dict[str, Any]:
+        text = "".join(f"{m['role']}\x00{m['content']}\x01" for m in messages)
+        with self._lock:
+            n = max((common_prefix(text, prev) for prev in self._recent), default=0)
+            self._recent.append(text)
+        # Token counts are taken on the rendered contents, so role markers do not count.
+        total = sum(tok.count(m["content"]) for m in messages)
+        shared = min(tok.count(text[:n].replace("\x00", "").replace("\x01", "")), total) if n else 0
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += total
+            self.prefix_tokens += shared
+        return {"prefix_tokens": shared, "prefix_cacheable": cacheable(shared)}
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"calls": self.calls, "prompt_tokens": self.prompt_tokens, "prefix_tokens": self.prefix_tokens, "overlap": round(self.prefix_tokens / self.prompt_tokens, 3) if self.prompt_tokens else 0.0}
@@ -0,0 +1,165 @@
+from typing import Dict, List, Any, Iterator, Tuple, Optional
+from concurrent.futures import ProcessPoolExecutor, Future
+from collections import OrderedDict
+from core.cache import CACHE_DIR
+import multiprocessing
+import threading
+import hashlib
+import csv
+import io
+import os
+import time
+
+EXTRACT_DIR = os.path.join(CACHE_DIR, "extract")
+TABLE_DIR = os.path.join(CACHE_DIR, "tables")
+# CSVs up to this size keep their rows verbatim after the summary; larger ones keep only the summary.
+RAW_CSV_BYTES = 256 * 1024
+MAX_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+
+def iter_pdf_pages(data: bytes) -> Iterator[str]:
+    from PyPDF2 import PdfReader
+    for page in PdfReader(io.BytesIO(data)).pages:
+        yield page.extract_text() or ""
+
+def iter_docx_paragraphs(data: bytes) -> Iterator[str]:
+    from docx import Document
+    for p in Document(io.BytesIO(data)).paragraphs:
+        if p.text:
+            yield p.text
+
+def iter_csv_rows(data: bytes) -> Iterator[str]:
+    for row in csv.reader(io.StringIO(data.decode("utf-8", errors="replace"))):
+        yield ", ".join(row)
+
+def iter_text_lines(data: bytes) -> Iterator[str]:
+    for line in io.StringIO(data.decode("utf-8", errors="replace")):
+        yield line.rstrip("\n")
+
+def extract_csv(name: str, data: bytes) -> str:
+    from core.tabular import summarize_csv, render_summary
+    s = summarize_csv(data, name, spill_dir=TABLE_DIR)
+    if len(data) > RAW_CSV_BYTES:
+        return render_summary(s)
+    s["sample_rows"] = []
+    return render_summary(s) + "\n\nROWS:\n" + "\n".join(iter_csv_rows(data))
+
+READERS = {"pdf": iter_pdf_pages, "docx": iter_docx_paragraphs, "csv": iter_csv_rows, "txt": iter_text_lines}
+# Extensions worth shipping to a worker process; the rest are cheaper to decode in place.
+CPU_BOUND = {"pdf", "docx", "csv"}
+
+def _ext(name: str) -> str:
+    return name.rsplit(".", 1)[-1].lower() if "." in name else "txt"
+
+def extract_text(name: str, data: bytes) -> str:
+    sep = "\n\n" if _ext(name) in ("pdf", "docx") else "\n"
+    try:
+        if _ext(name) == "csv":
+            return extract_csv(name, data)
+        return sep.join(READERS.get(_ext(name), iter_text_lines)(data))
+    except Exception as ex:
+        return f"[Could not extract {name}: {ex}]"
+
+def _timed_extract(name: str, data: bytes) -> Tuple[str, float]:
+    t0 = time.perf_counter()
+    text = extract_text(name, data)
+    return text, time.perf_counter() - t0
+
+_lock = threading.Lock()
+_pool: Optional[ProcessPoolExecutor] = None
+_texts: "OrderedDict[str, str]" = OrderedDict()
+_upload_hashes: "OrderedDict[Any, str]" = OrderedDict()
+MAX_MEMORY_TEXTS = 64
+MAX_UPLOAD_HASHES = 1024
+
+def _executor() -> ProcessPoolExecutor:
+    global _pool
+    with _lock:
+        if _pool is None:
+            # Spawned, not forked: the server process holds threads (event loop, HTTP pools, SQLite)
+            # whose locks a forked child would inherit mid-use.
+            _pool = ProcessPoolExecutor(max_workers=MAX_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+def _digest(f, data: bytes) -> str:
+    # Streamlit gives every upload a stable file_id, so reruns skip rehashing the bytes.
+    fid = (getattr(f, "file_id", None), f.name, len(data))
+    if fid[0] is not None:
+        with _lock:
+            if fid in _upload_hashes:
+                _upload_hashes.move_to_end(fid)
+                return _upload_hashes[fid]
+    h = hashlib.sha256(data).hexdigest()
+    if fid[0] is not None:
+        with _lock:
+            _upload_hashes[fid] = h
+            while len(_upload_hashes) > MAX_UPLOAD_HASHES:
+                _upload_hashes.popitem(last=False)
+    return h
+
+def _cached(h: str) -> Optional[str]:
+    with _lock:
+        if h in _texts:
+            _texts.move_to_end(h)
+            return _texts[h]
+    path = os.path.join(EXTRACT_DIR, f"{h}.txt")
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as fh:
+            text = fh.read()
+        _remember(h, text)
+        return text
+    return None
+
+def _remember(h: str, text: str, persist: bool = False):
+    with _lock:
+        _texts[h] = text
+        while len(_texts) > MAX_MEMORY_TEXTS:
+            _texts.popitem(last=False)
+    if persist:
+        os.makedirs(EXTRACT_DIR, exist_ok=True)
+        tmp = os.path.join(EXTRACT_DIR, f"{h}.tmp")
+        with open(tmp, "w", encoding="utf-8") as fh:
+            fh.write(text)
+        os.replace(tmp, os.path.join(EXTRACT_DIR, f"{h}.txt"))
+
+def ingest(files) -> Tuple[Dict[str, str], List[Dict[str, Any]]]:
+    # Extracts all uploads, CPU-bound formats in a process pool, and memoizes text by content
+    # hash (memory + disk). Returns the texts and a per-file report of bytes, chars and time.
+    out: Dict[str, str] = {}
+    report: List[Dict[str, Any]] = []
+    pending: List[Tuple[int, str, str, Future]] = []
+    for f in files:
+        t0 = time.perf_counter()
+        data = f.getvalue()
+        h = _digest(f, data)
+        text = _cached(h)
+        row = {"name": f.name, "bytes": len(data), "chars": 0, "seconds": 0.0, "cached": text is not None, "sha256": h}
+        report.append(row)
+        out[f.name] = ""
+        if text is not None:
+            out[f.name] = text
+            row.update(chars=len(text), seconds=time.perf_counter() - t0)
+        elif _ext(f.name) in CPU_BOUND:
+            try:
+                pending.append((len(report) - 1, f.name, h, _executor().submit(_timed_extract, f.name, data)))
+            except RuntimeError:
+                text, secs = _timed_extract(f.name, data)
+                _finish(out, row, f.name, h, text, secs)
+        else:
+            text, secs = _timed_extract(f.name, data)
+            _finish(out, row, f.name, h, text, secs)
+    for i, name, h, fut in pending:
+        try:
+            text, secs = fut.result()
+        except Exception as ex:
+            text, secs = f"[Could not extract {name}: {ex}]", 0.0
+        _finish(out, report[i], name, h, text, secs)
+    return out, report
+
+def _finish(out: Dict[str, str], row: Dict[str, Any], name: str, h: str, text: str, secs: float):
+    out[name] = text
+    row.update(chars=len(text), seconds=secs)
+    # Failures are remembered for this process only, so a later fix to a reader can retry them.
+    _remember(h, text, persist=not text.startswith("[Could not extract"))
+
+def process_uploaded_files(files) -> Dict[str, str]:
+    return ingest(files)[0]
@@ -0,0 +1,356 @@
+from typing import Dict, Any, Optional, Callable, Awaitable, List, Tuple
+import itertools
+import threading
+import asyncio
+import random
+import heapq
+import time
+import re
+import os
+import openai
+
+# Lower runs first: a waiting synthesis call is granted before more brainstorming.
+PRIORITY = {"plan": 0, "synthesis": 0, "consensus": 1, "graph": 2, "round2": 2, "round1": 3, "summary": 4}
+DEFAULT_PRIORITY = 2
+
+RETRYABLE = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+
+# Calls without a session (scripts, the bench) share one.
+NO_SESSION = "-"
+# Idle sessions are forgotten after this long.
+SESSION_TTL = 600.0
+
+# (priority, virtual finish, seq, session, virtual start)
+Ticket = Tuple[int, float, int, str, float]
+
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_UNIT = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+def priority_for(phase: str) -> int:
+    return PRIORITY.get(phase, DEFAULT_PRIORITY)
+
+def parse_duration(v: Optional[str]) -> Optional[float]:
+    # "1s", "6m0s", "20ms", "1h2m3.5s" as sent in x-ratelimit-reset-*, or plain seconds (retry-after).
+    if not v:
+        return None
+    try:
+        return float(v)
+    except ValueError:
+        parts = _DURATION.findall(v)
+        return sum(float(n) * _UNIT[u] for n, u in parts) if parts else None
+
+def _int(v: Optional[str]) -> Optional[int]:
+    try:
+        return int(v) if v is not None else None
+    except ValueError:
+        return None
+
+class TokenBucket:
+    __slots__ = ("capacity", "rate", "level", "stamp")
+
+    # capacity=None means no limit is known yet; the bucket never blocks until one is learned.
+    def __init__(self, per_minute: Optional[float] = None):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0 if per_minute else 0.0
+        self.level = float(per_minute or 0)
+        self.stamp = time.monotonic()
+
+    def _refill(self, now: float):
+        if self.capacity:
+            self.level = min(self.capacity, self.level + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def wait(self, n: float, now: float) -> float:
+        if not self.capacity:
+            return 0.0
+        self._refill(now)
+        n = min(n, self.capacity)
+        return 0.0 if self.level >= n else (n - self.level) / self.rate
+
+    def take(self, n: float, now: float):
+        if self.capacity:
+            self._refill(now)
+            self.level -= min(n, self.capacity)
+
+    def learn(self, limit: Optional[int], remaining: Optional[int], now: float):
+        if limit and limit != self.capacity:
+            self._refill(now)
+            self.level = min(self.level, limit) if self.capacity else float(limit)
+            self.capacity, self.rate = float(limit), limit / 60.0
+        if remaining is not None and self.capacity:
+            # Never raise the level from a header: replies arrive out of order and
+            # local reservations for in-flight calls are not in the server's count yet.
+            self._refill(now)
+            self.level = min(self.level, float(remaining))
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"limit": self.capacity, "available": round(max(self.level, 0.0), 1) if self.capacity else None}
+
+class RetryPolicy:
+    def __init__(self, max_attempts: int = 6, base: float = 0.5, cap: float = 30.0, deadline: float = 120.0):
+        self.max_attempts = max_attempts
+        self.base = base
+        self.cap = cap
+        self.deadline = deadline
+
+    def delay(self, attempt: int, hint: Optional[float] = None) -> float:
+        # Full jitter, but never sooner than the server asked for.
+        return max(random.uniform(0, min(self.cap, self.base * 2 ** attempt)), hint or 0.0)
+
+class _Model:
+    __slots__ = ("requests", "tokens", "blocked_until", "queue", "stats")
+
+    def __init__(self, rpm: Optional[int], tpm: Optional[int]):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.blocked_until = 0.0
+        self.queue: List[Ticket] = []
+        self.stats = {"calls": 0, "queued_s": 0.0, "throttled": 0, "retries": 0, "gave_up": 0}
+
+class _Session:
+    __slots__ = ("weight", "finish", "inflight", "waiting", "seen", "stats")
+
+    def __init__(self, weight: float):
+        self.weight = weight
+        self.finish = 0.0
+        self.inflight = 0
+        self.waiting = 0
+        self.seen = time.monotonic()
+        self.stats = {"calls": 0, "queued_s": 0.0, "max_queued_s": 0.0}
+
+class RateScheduler:
+    # Process-wide gate for model calls: per-model request and token buckets (seeded from
+    # `limits` or learned from x-ratelimit-* headers), a priority queue per model, and
+    # jittered exponential backoff with a deadline for 429s, 5xx and connection errors.
+    # Across sessions, calls of the same priority are granted by weighted fair queuing on their
+    # reserved tokens, so a session with a large team gets its weight's share of the quota rather
+    # than a share proportional to its agents. `max_inflight` caps calls in flight server-wide
+    # and `session_inflight` per session; a session at its cap does not block the others.
+    POLL = 0.05
+
+    def __init__(self, limits: Optional[Dict[str, Tuple[Optional[int], Optional[int]]]] = None, retry: Optional[RetryPolicy] = None, max_inflight: Optional[int] = None, session_inflight: Optional[int] = None):
+        self.limits = dict(limits or {})
+        self.retry = retry or RetryPolicy()
+        self.max_inflight = max_inflight
+        self.session_inflight = session_inflight
+        self._lock = threading.Lock()
+        self._models: Dict[str, _Model] = {}
+        self._sessions: Dict[str, _Session] = {}
+        self._inflight = 0
+        self._vclock = 0.0
+        self._seq = itertools.count()
+
+    def configure(self, model: str, rpm: Optional[int] = None, tpm: Optional[int] = None):
+        with self._lock:
+            self.limits[model] = (rpm, tpm)
+            m = self._models.get(model)
+            if m is not None:
+                m.requests, m.tokens = TokenBucket(rpm), TokenBucket(tpm)
+
+    def _model(self, model: str) -> _Model:
+        m = self._models.get(model)
+        if m is None:
+            m = self._models[model] = _Model(*self.limits.get(model, (None, None)))
+        return m
+
+    def weight(self, session: str, weight: float):
+        # Relative share of the quota for `session` while it has calls waiting (default 1).
+        with self._lock:
+            self._session(session).weight = max(weight, 0.01)
+
+    def _session(self, session: str) -> _Session:
+        s = self._sessions.get(session)
+        if s is None:
+            s = self._sessions[session] = _Session(1.0)
+        s.seen = time.monotonic()
+        return s
+
+    def _prune(self, now: float):
+        for sid in [k for k, s in self._sessions.items() if not s.inflight and not s.waiting and now - s.seen > SESSION_TTL]:
+            del self._sessions[sid]
+
+    def _enqueue(self, model: str, priority: int, tokens: int, session: str) -> Ticket:
+        with self._lock:
+            self._prune(time.monotonic())
+            s = self._session(session)
+            # Virtual start/finish tags: a session that was idle restarts at the current clock, so
+            # it neither banks credit nor pays for others' backlog.
+            start = max(self._vclock, s.finish)
+            s.finish = start + max(tokens, 1) / s.weight
+            s.waiting += 1
+            ticket = (priority, s.finish, next(self._seq), session, start)
+            heapq.heappush(self._model(model).queue, ticket)
+            return ticket
+
+    def _drop(self, model: str, ticket: Ticket):
+        with self._lock:
+            q = self._model(model).queue
+            if ticket in q:
+                q.remove(ticket)
+                heapq.heapify(q)
+                self._sessions[ticket[3]].waiting -= 1
+
+    def _room(self, session: str) -> bool:
+        return self.session_inflight is None or self._sessions[session].inflight < self.session_inflight
+
+    def _try(self, model: str, ticket: Ticket, tokens: int) -> float:
+        # 0.0 when the ticket is granted, otherwise how long to sleep before asking again.
+        with self._lock:
+            m = self._model(model)
+            if self.max_inflight is not None and self._inflight >= self.max_inflight:
+                return self.POLL
+            head = m.queue[0] if self._room(m.queue[0][3]) else min((t for t in m.queue if self._room(t[3])), default=None)
+            if head != ticket:
+                return self.POLL
+            now = time.monotonic()
+            wait = max(m.blocked_until - now, m.requests.wait(1, now), m.tokens.wait(tokens, now))
+            if wait > 0:
+                return wait
+            if m.queue[0] == ticket:
+                heapq.heappop(m.queue)
+            else:
+                m.queue.remove(ticket)
+                heapq.heapify(m.queue)
+            s = self._sessions[ticket[3]]
+            s.waiting -= 1
+            s.inflight += 1
+            self._inflight += 1
+            self._vclock = max(self._vclock, ticket[4])
+            m.requests.take(1, now)
+            m.tokens.take(tokens, now)
+            m.stats["calls"] += 1
+            return 0.0
+
+    def release(self, session: str = NO_SESSION):
+        # Ends a call granted by acquire/aacquire (call/acall do this unless `hold` is set).
+        with self._lock:
+            self._inflight -= 1
+            self._session(session).inflight -= 1
+
+    def _granted(self, model: str, session: str, queued: float, attempt: int, stats: Optional[Dict[str, Any]]):
+        with self._lock:
+            self._model(model).stats["queued_s"] += queued
+            s = self._session(session).stats
+            s["calls"] += 1
+            s["queued_s"] += queued
+            s["max_queued_s"] = max(s["max_queued_s"], queued)
+        if stats is not None:
+            stats["queued_s"] = round(stats.get("queued_s", 0.0) + queued, 4)
+            stats["retries"] = attempt
+
+    def acquire(self, model: str, tokens: int = 0, priority: int = DEFAULT_PRIORITY, session: str = NO_SESSION) -> float:
+        t0 = time.monotonic()
+        ticket = self._enqueue(model, priority, tokens, session)
+        granted = False
+        try:
+            while True:
+                wait = self._try(model, ticket, tokens)
+                if wait == 0.0:
+                    granted = True
+                    return time.monotonic() - t0
+                time.sleep(wait)
+        finally:
+            if not granted:
+                self._drop(model, ticket)
+
+    async def aacquire(self, model: str, tokens: int = 0, priority: int = DEFAULT_PRIORITY, session: str = NO_SESSION) -> float:
+        t0 = time.monotonic()
+        ticket = self._enqueue(model, priority, tokens, session)
+        granted = False
+        try:
+            while True:
+                wait = self._try(model, ticket, tokens)
+                if wait == 0.0:
+                    granted = True
+                    return time.monotonic() - t0
+                await asyncio.sleep(wait)
+        finally:
+            if not granted:
+                self._drop(model, ticket)
+
+    def _backoff(self, model: str, ex: Exception, attempt: int, start: float) -> Optional[float]:
+        # Seconds to wait before the next attempt, or None to give up and re-raise.
+        headers = getattr(getattr(ex, "response", None), "headers", None) or {}
+        hint = parse_duration(headers.get("retry-after-ms"))
+        hint = hint / 1000 if hint is not None else parse_duration(headers.get("retry-after"))
+        throttled = isinstance(ex, openai.RateLimitError)
+        with self._lock:
+            m = self._model(model)
+            if throttled:
+                m.stats["throttled"] += 1
+                # Everyone queued on this model waits out the server's window, not just this caller.
+                if hint:
+                    m.blocked_until = max(m.blocked_until, time.monotonic() + hint)
+            delay = self.retry.delay(attempt, hint)
+            fatal = throttled and getattr(ex, "code", None) == "insufficient_quota"
+            if fatal or attempt + 1 >= self.retry.max_attempts or time.monotonic() - start + delay > self.retry.deadline:
+                m.stats["gave_up"] += 1
+                return None
+            m.stats["retries"] += 1
+            return delay
+
+    def call(self, model: str, fn: Callable[[], Any], tokens: int = 0, priority: int = DEFAULT_PRIORITY, stats: Optional[Dict[str, Any]] = None, session: str = NO_SESSION, hold: bool = False) -> Any:
+        # With hold=True a successful call keeps its in-flight slot (e.g. while a stream is
+        # read) until the caller calls release(session).
+        start = time.monotonic()
+        for attempt in itertools.count():
+            self._granted(model, session, self.acquire(model, tokens, priority, session), attempt, stats)
+            done = False
+            try:
+                res = fn()
+                done = True
+                return res
+            except RETRYABLE as ex:
+                delay = self._backoff(model, ex, attempt, start)
+                if delay is None:
+                    raise
+            finally:
+                if not (done and hold):
+                    self.release(session)
+            time.sleep(delay)
+
+    async def acall(self, model: str, fn: Callable[[], Awaitable[Any]], tokens: int = 0, priority: int = DEFAULT_PRIORITY, stats: Optional[Dict[str, Any]] = None, session: str = NO_SESSION, hold: bool = False) -> Any:
+        start = time.monotonic()
+        for attempt in itertools.count():
+            self._granted(model, session, await self.aacquire(model, tokens, priority, session), attempt, stats)
+            done = False
+            try:
+                res = await fn()
+                done = True
+                return res
+            except RETRYABLE as ex:
+                delay = self._backoff(model, ex, attempt, start)
+                if delay is None:
+                    raise
+            finally:
+                if not (done and hold):
+                    self.release(session)
+            await asyncio.sleep(delay)
+
+    def observe(self, model: str, headers: Any):
+        now = time.monotonic()
+        with self._lock:
+            m = self._model(model)
+            m.requests.learn(_int(headers.get("x-ratelimit-limit-requests")), _int(headers.get("x-ratelimit-remaining-requests")), now)
+            m.tokens.learn(_int(headers.get("x-ratelimit-limit-tokens")), _int(headers.get("x-ratelimit-remaining-tokens")), now)
+
+    def summary(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            return {name: {**m.stats, "queued_s": round(m.stats["queued_s"], 3), "waiting": len(m.queue), "blocked_s": round(max(m.blocked_until - now, 0.0), 2), "requests": m.requests.snapshot(), "tokens": m.tokens.snapshot()} for name, m in self._models.items()}
+
+    def load(self) -> Dict[str, Any]:
+        # Server-wide queue depth and in-flight calls, and per-session wait times.
+        with self._lock:
+            sessions = {sid: {"weight": s.weight, "inflight": s.inflight, "waiting": s.waiting, "calls": s.stats["calls"], "avg_queued_s": round(s.stats["queued_s"] / s.stats["calls"], 3) if s.stats["calls"] else 0.0, "max_queued_s": round(s.stats["max_queued_s"], 3)} for sid, s in self._sessions.items()}
+            return {"inflight": self._inflight, "max_inflight": self.max_inflight, "session_inflight": self.session_inflight, "waiting": sum(len(m.queue) for m in self._models.values()), "sessions": sessions}
+
+_shared = None
+_shared_lock = threading.Lock()
+
+def shared_scheduler() -> RateScheduler:
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = RateScheduler(max_inflight=_int(os.environ.get("KREW_MAX_CALLS", "32")) or None, session_inflight=_int(os.environ.get("KREW_SESSION_CALLS", "8")) or None)
+        return _shared
@@ -0,0 +1,129 @@
+from typing import Dict, List, Tuple, Optional, Any
+from collections import OrderedDict
+import numpy as np
+import threading
+import hashlib
+import re
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+def _words(text: str) -> List[str]:
+    return _WORD.findall(text.lower())
+
+def chunk_text(text: str, size: int = 1500, overlap: int = 200) -> List[Tuple[int, str]]:
+    # Fixed-size character windows snapped back to the last newline/space, with a small overlap.
+    out, i, n = [], 0, len(text)
+    while i < n:
+        j = min(i + size, n)
+        if j < n:
+            cut = max(text.rfind("\n", i + size // 2, j), text.rfind(" ", i + size // 2, j))
+            if cut > i:
+                j = cut
+        piece = text[i:j].strip()
+        if piece:
+            out.append((i, piece))
+        if j >= n:
+            break
+        i = max(j - overlap, i + 1)
+    return out
+
+class DocumentIndex:
+    # BM25 over an exact vocabulary, stored as a term-major posting list in NumPy arrays.
+    # Per-posting BM25 weights are precomputed, so a query is a few slice-adds plus a partial sort.
+    def __init__(self, files: Dict[str, str], size: int = 1500, overlap: int = 200, k1: float = 1.5, b: float = 0.75):
+        self.chunks: List[Tuple[str, int, str]] = []
+        self.vocab: Dict[str, int] = {}
+        doc_ids, term_ids, tfs, lengths = [], [], [], []
+        for name, text in files.items():
+            for off, piece in chunk_text(text, size, overlap):
+                d = len(self.chunks)
+                self.chunks.append((name, off, piece))
+                ids = np.fromiter((self.vocab.setdefault(w, len(self.vocab)) for w in _words(piece)), dtype=np.int64)
+                lengths.append(len(ids))
+                if not len(ids):
+                    continue
+                u, c = np.unique(ids, return_counts=True)
+                term_ids.append(u)
+                tfs.append(c)
+                doc_ids.append(np.full(len(u), d, dtype=np.int32))
+        self.n = len(self.chunks)
+        V = len(self.vocab)
+        if not term_ids:
+            self.ptr = np.zeros(V + 1, dtype=np.int64)
+            self.docs = np.zeros(0, dtype=np.int32)
+            self.weights = np.zeros(0, dtype=np.float32)
+            self.idf = np.zeros(V, dtype=np.float32)
+            return
+        terms = np.concatenate(term_ids)
+        docs = np.concatenate(doc_ids)
+        tf = np.concatenate(tfs).astype(np.float32)
+        dl = np.asarray(lengths, dtype=np.float32)
+        order = np.argsort(terms, kind="stable")
+        terms, docs, tf = terms[order], docs[order], tf[order]
+        df = np.bincount(terms, minlength=V)
+        self.ptr = np.concatenate(([0], np.cumsum(df)))
+        self.idf = np.log1p((self.n - df + 0.5) / (df + 0.5)).astype(np.float32)
+        norm = k1 * (1 - b + b * dl[docs] / max(float(dl.mean()), 1.0))
+        self.docs = docs
+        self.weights = (self.idf[terms] * tf * (k1 + 1) / (tf + norm)).astype(np.float32)
+
+    def search(self, query: str, k: int = 8, max_terms: int = 64) -> List[Tuple[float, int]]:
+        ids = {self.vocab[w] for w in _words(query) if w in self.vocab}
+        if not ids or not self.n:
+            return []
+        q = np.fromiter(ids, dtype=np.int64)
+        if len(q) > max_terms:
+            q = q[np.argsort(-self.idf[q])[:max_terms]]
+        scores = np.zeros(self.n, dtype=np.float32)
+        for t in q:
+            s, e = self.ptr[t], self.ptr[t + 1]
+            scores[self.docs[s:e]] += self.weights[s:e]
+        k = min(k, self.n)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), int(i)) for i in top if scores[i] > 0]
+
+    def excerpt(self, query: str, budget: int, tokenizer, k: int = 8) -> str:
+        # Top-k chunks, best first, packed until the token budget is used up.
+        parts, used = [], 0
+        for _, i in self.search(query, k):
+            name, off, piece = self.chunks[i]
+            block = f"[{name} @{off}]\n{piece}"
+            n = tokenizer.count(block)
+            if used + n > budget:
+                if not parts:
+                    parts.append(tokenizer.head(block, budget))
+                break
+            parts.append(block)
+            used += n
+        return "\n\n".join(parts)
+
+def files_hash(files: Dict[str, str]) -> str:
+    h = hashlib.sha256()
+    for name in sorted(files):
+        h.update(name.encode("utf-8", "replace") + b"\0")
+        h.update(files[name].encode("utf-8", "replace") + b"\0")
+    return h.hexdigest()
+
+def report_key(report: List[Dict[str, Any]]) -> str:
+    # Index key from an ingest report: the per-file hashes are already computed, so no content is re-read.
+    return hashlib.sha256("\0".join(f"{r['name']}:{r['sha256']}" for r in report).encode("utf-8", "replace")).hexdigest()
+
+_indexes: "OrderedDict[str, DocumentIndex]" = OrderedDict()
+_lock = threading.Lock()
+
+def build_index(files: Dict[str, str], key: Optional[str] = None, keep: int = 8) -> Optional[DocumentIndex]:
+    # Indexes are memoized per content hash, so Streamlit reruns on the same uploads are free.
+    if not files:
+        return None
+    key = key or files_hash(files)
+    with _lock:
+        if key in _indexes:
+            _indexes.move_to_end(key)
+            return _indexes[key]
+    idx = DocumentIndex(files)
+    with _lock:
+        _indexes[key] = idx
+        while len(_indexes) > keep:
+            _indexes.popitem(last=False)
+    return idx
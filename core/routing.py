@@ -0,0 +1,58 @@
+from typing import Dict, Any, Optional, Tuple
+from collections import deque
+import threading
+import statistics
+import time
+
+class ModelRouter:
+    # Picks the model for each call from (role, phase): a "role/phase" rule first, then the
+    # role's rule, then the phase's, then the agent's own model. When the recent median time
+    # to first token (the whole reply when not streaming) of a model exceeds the SLO, calls
+    # routed to it go to its fallback for `cooldown` seconds; then it is tried again.
+    def __init__(self, phases: Optional[Dict[str, str]] = None, roles: Optional[Dict[str, str]] = None, fallback: Optional[Dict[str, str]] = None, slo_s: Optional[float] = None, window: int = 5, cooldown: float = 60.0):
+        self.phases = {k: v for k, v in (phases or {}).items() if v}
+        self.roles = {k: v for k, v in (roles or {}).items() if v}
+        self.fallback = dict(fallback or {})
+        self.slo_s = slo_s
+        self.window = window
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._samples: Dict[str, deque] = {}
+        self._degraded: Dict[str, float] = {}
+
+    @classmethod
+    def from_config(cls, cfg: Dict[str, Any], **kw) -> "ModelRouter":
+        return cls(cfg.get("phases"), cfg.get("roles"), cfg.get("fallback"), cfg.get("slo_s"), **kw)
+
+    def rule(self, role: str, phase: str) -> Tuple[str, Optional[str]]:
+        for key, table in ((f"{role}/{phase}", self.roles), (role, self.roles), (phase, self.phases)):
+            if key in table:
+                return key, table[key]
+        return "default", None
+
+    def route(self, role: str, phase: str, default: str) -> Tuple[str, str, bool]:
+        # (route name, model, whether the SLO fallback was taken)
+        name, model = self.rule(role, phase)
+        model = model or default
+        now, seen = time.monotonic(), {model}
+        with self._lock:
+            while self._degraded.get(model, 0.0) > now and self.fallback.get(model) not in seen | {None}:
+                model = self.fallback[model]
+                seen.add(model)
+        return name, model, len(seen) > 1
+
+    def observe(self, model: str, ttft_s: float):
+        if self.slo_s is None:
+            return
+        with self._lock:
+            s = self._samples.setdefault(model, deque(maxlen=self.window))
+            s.append(ttft_s)
+            if len(s) >= min(3, self.window) and statistics.median(s) > self.slo_s and model in self.fallback:
+                self._degraded[model] = time.monotonic() + self.cooldown
+                s.clear()
+
+    def degraded(self) -> Dict[str, float]:
+        now = time.monotonic()
+        with self._lock:
+            return {m: round(t - now, 1) for m, t in self._degraded.items() if t > now}
+
@@ -1,6 +1,8 @@
 import streamlit as st
 import uuid
-from config.predefined_agents import PREDEFINED_AGENTS
+import copy
+from config.predefined_agents import PREDEFINED_AGENTS, MODEL_ROUTES
+from core.timeline import Timeline
 
 def init_state():
     if "initialized" in st.session_state:
@@ -12,13 +14,34 @@ def init_state():
         {"role": "Quality Assurance", "goal": PREDEFINED_AGENTS["Quality Assurance"]["goal"], "expertise": PREDEFINED_AGENTS["Quality Assurance"]["expertise"]},
     ]
     st.session_state.agents_cfg = default_agents
-    st.session_state.messages = []
+    reset_messages()
     st.session_state.api_key = ""
     st.session_state.max_turns = 12
+    st.session_state.workflow = "rounds"
+    st.session_state.parallel_rounds = True
+    st.session_state.stream_responses = True
+    st.session_state.deterministic = False
+    st.session_state.use_cache = True
+    st.session_state.early_stop = True
+    st.session_state.novelty_threshold = 0.3
+    st.session_state.rolling_summaries = False
+    st.session_state.stable_prompts = False
+    st.session_state.model_routing = False
+    st.session_state.model_routes = copy.deepcopy(MODEL_ROUTES)
     st.session_state.current_task = ""
     st.session_state.file_content = {}
+    st.session_state.index_key = None
     st.session_state.session_id = str(uuid.uuid4())
     st.session_state.user_suggestions = ""
     st.session_state.export_ready = False
+    st.session_state.run_cursor = 0
+    st.session_state.run_steps = 1
+    st.session_state.replay_id = None
+    st.session_state.own_sessions = []
     st.session_state.saved_tasks = []
     st.session_state.initialized = True
+
+def reset_messages():
+    # st.session_state.messages is the timeline's own event list, so both stay in step.
+    st.session_state.timeline = Timeline()
+    st.session_state.messages = st.session_state.timeline.events
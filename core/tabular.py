@@ -0,0 +1,148 @@
+from typing import Dict, Any, List, Optional
+from collections import Counter
+import pandas as pd
+import numpy as np
+import hashlib
+import io
+import os
+
+CHUNK_ROWS = 100_000
+SAMPLE_VALUES = 20_000
+SAMPLE_ROWS = 12
+TOP_VALUES = 5
+MAX_DISTINCT = 50_000
+
+def _reservoir(seen: int, n: int, size: int, rng: np.random.Generator) -> np.ndarray:
+    # Vectorized algorithm R: slot for each of the next n items, or -1 if the item is skipped.
+    pos = seen + 1 + np.arange(n)
+    slot = np.where(pos <= size, pos - 1, (rng.random(n) * pos).astype(np.int64))
+    return np.where(slot < size, slot, -1)
+
+class _Column:
+    # Values that parse as numbers feed min/max/mean and the quantile sample; the rest are counted
+    # as categories. A column with both kinds is reported as mixed, so a late text value does not
+    # discard the numeric stats gathered from earlier chunks.
+    __slots__ = ("name", "dtype", "count", "nulls", "numbers", "min", "max", "total", "sample", "seen", "others", "counts")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.dtype = None
+        self.count = 0
+        self.nulls = 0
+        self.numbers = 0
+        self.min = None
+        self.max = None
+        self.total = 0.0
+        self.sample: List[float] = []
+        self.seen = 0
+        self.others = 0
+        self.counts: Counter = Counter()
+
+    def update(self, s: pd.Series, rng: np.random.Generator):
+        self.count += len(s)
+        self.nulls += int(s.isna().sum())
+        dt = str(s.dtype)
+        self.dtype = dt if self.dtype in (None, dt) else "object"
+        vals = s.dropna()
+        if pd.api.types.is_bool_dtype(vals):
+            num, rest = vals.iloc[:0], vals
+        elif pd.api.types.is_numeric_dtype(vals):
+            num, rest = vals, vals.iloc[:0]
+        else:
+            parsed = pd.to_numeric(vals, errors="coerce")
+            hit = parsed.notna()
+            num, rest = parsed[hit], vals[~hit]
+        if len(num):
+            arr = num.to_numpy(dtype=np.float64)
+            lo, hi = float(arr.min()), float(arr.max())
+            self.min = lo if self.min is None else min(self.min, lo)
+            self.max = hi if self.max is None else max(self.max, hi)
+            self.total += float(arr.sum())
+            self.numbers += len(arr)
+            for k, v in zip(*self._slots(arr, rng)):
+                if k < len(self.sample):
+                    self.sample[k] = v
+                else:
+                    self.sample.append(v)
+        if len(rest):
+            self.others += len(rest)
+            self.counts.update(rest.astype(str).value_counts().to_dict())
+            if len(self.counts) > MAX_DISTINCT:
+                # Keep the heavy hitters only; top values stay approximate for very high cardinality.
+                self.counts = Counter(dict(self.counts.most_common(MAX_DISTINCT // 2)))
+
+    def _slots(self, arr: np.ndarray, rng: np.random.Generator):
+        slot = _reservoir(self.seen, len(arr), SAMPLE_VALUES, rng)
+        self.seen += len(arr)
+        hit = slot >= 0
+        return slot[hit].tolist(), arr[hit].tolist()
+
+    def summary(self) -> Dict[str, Any]:
+        out = {"name": self.name, "dtype": self.dtype, "count": self.count, "nulls": self.nulls}
+        if self.numbers:
+            q = np.quantile(np.asarray(self.sample), [0.05, 0.25, 0.5, 0.75, 0.95])
+            out.update(min=self.min, max=self.max, mean=self.total / self.numbers, quantiles={k: float(v) for k, v in zip(("p05", "p25", "p50", "p75", "p95"), q)})
+        if self.others:
+            out.update(distinct=len(self.counts), top=self.counts.most_common(TOP_VALUES))
+            if self.numbers:
+                out.update(mixed=True, numbers=self.numbers, others=self.others)
+        return out
+
+def summarize_csv(data: bytes, name: str = "data.csv", spill_dir: Optional[str] = None, chunksize: int = CHUNK_ROWS) -> Dict[str, Any]:
+    # One streaming pass over the CSV: per-column stats, reservoir-sampled quantiles and rows,
+    # and (when pyarrow is available and spill_dir is set) a Parquet copy for later analysis.
+    rng = np.random.default_rng(0)
+    cols: Dict[str, _Column] = {}
+    rows: List[Dict[str, Any]] = []
+    seen_rows = 0
+    writer = spill = None
+    if spill_dir:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            spill = os.path.join(spill_dir, f"{hashlib.sha256(data).hexdigest()}.parquet")
+        except ImportError:
+            spill_dir = None
+    write = bool(spill) and not os.path.exists(spill)
+    for chunk in pd.read_csv(io.BytesIO(data), chunksize=chunksize, encoding_errors="replace"):
+        for c in chunk.columns:
+            cols.setdefault(str(c), _Column(str(c))).update(chunk[c], rng)
+        slot = _reservoir(seen_rows, len(chunk), SAMPLE_ROWS, rng)
+        seen_rows += len(chunk)
+        hit = slot >= 0
+        for k, rec in zip(slot[hit].tolist(), chunk[hit].to_dict("records")):
+            if k < len(rows):
+                rows[k] = rec
+            else:
+                rows.append(rec)
+        if write:
+            # Spilled as nullable strings so per-chunk dtype drift cannot break the file schema.
+            table = pa.Table.from_pandas(chunk.astype("string"), preserve_index=False)
+            if writer is None:
+                os.makedirs(spill_dir, exist_ok=True)
+                writer = pq.ParquetWriter(spill + ".tmp", table.schema)
+            writer.write_table(table)
+    if writer is not None:
+        writer.close()
+        os.replace(spill + ".tmp", spill)
+    return {"name": name, "rows": seen_rows, "columns": [c.summary() for c in cols.values()], "sample_rows": rows, "spill": spill if spill and os.path.exists(spill) else None}
+
+def _fmt(v: Any) -> str:
+    return f"{v:,.4g}" if isinstance(v, float) else str(v)
+
+def render_summary(s: Dict[str, Any]) -> str:
+    lines = [f"CSV SUMMARY: {s['name']} — {s['rows']:,} rows × {len(s['columns'])} columns"]
+    for c in s["columns"]:
+        line = f"- {c['name']} [{'mixed' if c.get('mixed') else c['dtype']}] nulls={c['nulls']:,}"
+        if c.get("mixed"):
+            line += f" numeric={c['numbers']:,} text={c['others']:,}"
+        if "quantiles" in c:
+            q = c["quantiles"]
+            line += f" min={_fmt(c['min'])} p25={_fmt(q['p25'])} median={_fmt(q['p50'])} p75={_fmt(q['p75'])} max={_fmt(c['max'])} mean={_fmt(c['mean'])}"
+        if "top" in c:
+            line += f" distinct≈{c['distinct']:,} top=" + "; ".join(f"{v} ({n:,})" for v, n in c["top"])
+        lines.append(line)
+    if s["sample_rows"]:
+        lines.append("SAMPLE ROWS:")
+        lines.extend(", ".join(f"{k}={v}" for k, v in r.items()) for r in s["sample_rows"])
+    return "\n".join(lines)
@@ -0,0 +1,92 @@
+from typing import Dict, Any, List, Iterable, Optional
+import json
+import re
+
+MAX_NODES = 8
+
+class Node:
+    __slots__ = ("id", "role", "task", "deps")
+
+    def __init__(self, id: str, role: str, task: str, deps: List[str]):
+        self.id = id
+        self.role = role
+        self.task = task
+        self.deps = deps
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"id": self.id, "role": self.role, "task": self.task, "depends_on": list(self.deps)}
+
+def plan_prompt(brief: str, team: List[str], others: Iterable[str] = (), max_nodes: int = MAX_NODES) -> str:
+    roles = "\n".join(f"- {r}" for r in team)
+    extra = [r for r in others if r not in team]
+    if extra:
+        roles += "\nAlso available if clearly needed:\n" + "\n".join(f"- {r}" for r in extra)
+    return (
+        f"TASK PLANNING\n{brief}\nROLES:\n{roles}\n"
+        f"Break the objective into 2-{max_nodes} subtasks that form a dependency graph. A subtask depends only on the "
+        "subtasks whose results it actually needs; independent subtasks must not depend on each other so they can run in parallel. "
+        "Assign each subtask to exactly one role from the list. Respond with JSON only, no prose:\n"
+        '{"nodes": [{"id": "n1", "role": "<role>", "task": "<what to produce>", "depends_on": []}]}'
+    )
+
+def parse_plan(text: str, roles: List[str], max_nodes: int = MAX_NODES) -> Optional[List[Node]]:
+    # Tolerates code fences and surrounding prose. Unknown roles are reassigned round-robin,
+    # unknown or self dependencies are dropped, and a cyclic plan is rejected (None).
+    m = re.search(r"[\[{].*[\]}]", text, re.S)
+    if not m or not roles:
+        return None
+    try:
+        data = json.loads(m.group(0))
+    except ValueError:
+        return None
+    items = data.get("nodes") if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        return None
+    nodes: List[Node] = []
+    seen = set()
+    for i, it in enumerate(items[:max_nodes]):
+        if not isinstance(it, dict) or not str(it.get("task", "")).strip():
+            continue
+        nid = str(it.get("id") or f"n{i + 1}")
+        if nid in seen:
+            nid = f"{nid}_{i + 1}"
+        seen.add(nid)
+        role = it.get("role") if it.get("role") in roles else roles[len(nodes) % len(roles)]
+        deps = it.get("depends_on") or []
+        nodes.append(Node(nid, role, str(it["task"]).strip(), [str(d) for d in deps] if isinstance(deps, list) else []))
+    for n in nodes:
+        n.deps = [d for d in dict.fromkeys(n.deps) if d in seen and d != n.id]
+    return topo_order(nodes) if nodes else None
+
+def topo_order(nodes: List[Node]) -> Optional[List[Node]]:
+    # Kahn's algorithm, stable in plan order; None if the graph has a cycle.
+    indeg = {n.id: len(n.deps) for n in nodes}
+    children: Dict[str, List[str]] = {n.id: [] for n in nodes}
+    for n in nodes:
+        for d in n.deps:
+            children[d].append(n.id)
+    by_id = {n.id: n for n in nodes}
+    ready = [n.id for n in nodes if indeg[n.id] == 0]
+    out: List[Node] = []
+    while ready:
+        nid = ready.pop(0)
+        out.append(by_id[nid])
+        for c in children[nid]:
+            indeg[c] -= 1
+            if indeg[c] == 0:
+                ready.append(c)
+    return out if len(out) == len(nodes) else None
+
+def fallback_plan(objective: str, roles: List[str]) -> List[Node]:
+    # One independent subtask per team member; used when the planner reply is unusable.
+    return [Node(f"n{i + 1}", r, f"Address the objective from the perspective of a {r}: {objective}", []) for i, r in enumerate(roles)]
+
+def depth(nodes: List[Node]) -> int:
+    # Length of the longest dependency chain: the number of sequential model calls on the critical path.
+    level: Dict[str, int] = {}
+    for n in nodes:
+        level[n.id] = 1 + max((level[d] for d in n.deps), default=0)
+    return max(level.values(), default=0)
+
+def render_plan(nodes: List[Node]) -> str:
+    return "\n".join(f"- **{n.id}** · {n.role}: {n.task}" + (f"  ← {', '.join(n.deps)}" if n.deps else "") for n in nodes)
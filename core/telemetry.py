@@ -0,0 +1,73 @@
+from typing import Dict, Any, List, Iterable, Optional
+
+# USD per 1M tokens (input, output). Longest prefix wins, so "gpt-4o-mini" is not priced as "gpt-4o".
+PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4-turbo": (10.00, 30.00),
+    "gpt-3.5-turbo": (0.50, 1.50),
+    "o4-mini": (1.10, 4.40),
+    "o3-mini": (1.10, 4.40),
+}
+
+# Share of the input price charged for prompt tokens served from the provider's prefix cache.
+CACHED_INPUT = {"gpt-4o": 0.5, "gpt-4.1": 0.25, "o4-mini": 0.25, "o3-mini": 0.5}
+
+def _longest(table: Dict[str, Any], model: str) -> Optional[str]:
+    return max((k for k in table if model.startswith(k)), key=len, default=None)
+
+def price_for(model: str) -> Optional[tuple]:
+    best = _longest(PRICES, model)
+    return PRICES[best] if best else None
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> Optional[float]:
+    p = price_for(model)
+    if p is None:
+        return None
+    best = _longest(CACHED_INPUT, model)
+    share = CACHED_INPUT[best] if best else 1.0
+    return ((prompt_tokens - cached_tokens + cached_tokens * share) * p[0] + completion_tokens * p[1]) / 1_000_000
+
+def _pct(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    v = sorted(values)
+    return v[min(len(v) - 1, int(round(q * (len(v) - 1))))]
+
+def _group(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    lat = [r.get("latency_s", 0.0) for r in rows]
+    ttft = [r.get("ttft_s", 0.0) for r in rows if r.get("ttft_s") is not None]
+    return {
+        "calls": len(rows),
+        "cached": sum(1 for r in rows if r.get("cached")),
+        "latency_s": round(sum(lat), 3),
+        "avg_latency_s": round(sum(lat) / len(lat), 3) if lat else 0.0,
+        "p95_latency_s": round(_pct(lat, 0.95), 3),
+        "avg_ttft_s": round(sum(ttft) / len(ttft), 3) if ttft else 0.0,
+        "prompt_tokens": sum(r.get("prompt_tokens", 0) for r in rows),
+        "completion_tokens": sum(r.get("completion_tokens", 0) for r in rows),
+        "cached_tokens": sum(r.get("cached_tokens", 0) for r in rows),
+        "prefix_tokens": sum(r.get("prefix_tokens", 0) for r in rows),
+        "cost_usd": round(sum(r.get("cost_usd") or 0.0 for r in rows), 6),
+        "queued_s": round(sum(r.get("queued_s", 0.0) for r in rows), 3),
+        "retries": sum(r.get("retries", 0) for r in rows),
+        "fallbacks": sum(1 for r in rows if r.get("fallback")),
+    }
+
+def summarize(messages: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    # Run-level aggregate of the per-call telemetry attached to agent and final_result events.
+    rows = []
+    for m in messages:
+        t = m.get("telemetry")
+        if t:
+            rows.append({**t, "sender": m.get("sender", "")})
+    out = {"total": _group(rows), "by_agent": {}, "by_phase": {}, "by_model": {}, "by_route": {}}
+    for key, field in (("by_agent", "sender"), ("by_phase", "phase"), ("by_model", "model"), ("by_route", "route")):
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        for r in rows:
+            groups.setdefault(r.get(field) or "—", []).append(r)
+        out[key] = {k: _group(v) for k, v in groups.items()}
+    return out
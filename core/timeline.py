@@ -0,0 +1,96 @@
+from typing import Dict, Any, List, Iterable, Tuple, Optional
+from collections import Counter
+from core.telemetry import summarize
+
+PHASE_LABELS = {"brief": "Brief", "plan": "Plan", "graph": "Task Graph", "round1": "Round 1", "round2": "Round 2", "consensus": "Consensus", "synthesis": "Synthesis"}
+
+class Timeline:
+    # A run's events plus indexes kept up to date as events arrive: counts per type and the
+    # start of each phase section. Views read slices of one section, so a render costs the
+    # same however long the run gets.
+    def __init__(self, events: Iterable[Dict[str, Any]] = ()):
+        self.events: List[Dict[str, Any]] = []
+        self.counts: Counter = Counter()
+        self.sections: List[Tuple[str, int]] = []
+        self._telemetry = (-1, None)
+        self.extend(events)
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    def extend(self, events: Iterable[Dict[str, Any]]):
+        for ev in events:
+            if ev.get("phase") or not self.sections:
+                self.sections.append((ev.get("phase") or "", len(self.events)))
+            self.events.append(ev)
+            self.counts[ev.get("type", "message")] += 1
+
+    def section(self, i: int) -> List[Dict[str, Any]]:
+        start = self.sections[i][1]
+        end = self.sections[i + 1][1] if i + 1 < len(self.sections) else len(self.events)
+        return self.events[start:end]
+
+    def size(self, i: int) -> int:
+        end = self.sections[i + 1][1] if i + 1 < len(self.sections) else len(self)
+        return end - self.sections[i][1]
+
+    def seconds(self, i: int) -> Optional[float]:
+        # From the section's first event to the next section's (or the latest event); None for
+        # events logged without ts_ns.
+        s = self.sections[i][1]
+        e = self.sections[i + 1][1] if i + 1 < len(self.sections) else len(self.events) - 1
+        a, b = self.events[s].get("ts_ns"), self.events[e].get("ts_ns")
+        return (b - a) / 1e9 if a is not None and b is not None else None
+
+    def label(self, i: int) -> str:
+        phase = self.sections[i][0]
+        return PHASE_LABELS.get(phase, phase.title() or "Start")
+
+    @property
+    def final(self) -> Dict[str, Any]:
+        return next((m for m in reversed(self.events) if m.get("type") == "final_result"), None) if self.counts["final_result"] else None
+
+    def telemetry(self) -> Dict[str, Any]:
+        # Recomputed only when events were added since the last call.
+        n, tel = self._telemetry
+        if n != len(self.events):
+            self._telemetry = (len(self.events), summarize(self.events))
+        return self._telemetry[1]
+
+class StoredTimeline(Timeline):
+    # A logged run read through the event log: counts, sections, times and telemetry come from
+    # its outline, and only the section being shown is loaded, so a replay render does not
+    # read the whole log. `events` (the full list, for export) is loaded on access.
+    def __init__(self, log, session_id: str):
+        self.log = log
+        self.session_id = session_id
+        o = log.outline(session_id)
+        self.n = o["events"]
+        self.counts = Counter(o["counts"])
+        self.sections = o["sections"]
+        self._times = o["times"]
+        self._final = o["final"]
+        self._telemetry = (self.n, summarize(o["telemetry"]))
+
+    def __len__(self) -> int:
+        return self.n
+
+    @property
+    def events(self) -> List[Dict[str, Any]]:
+        return self.log.events(self.session_id)
+
+    def section(self, i: int) -> List[Dict[str, Any]]:
+        return self.log.events(self.session_id, offset=self.sections[i][1], limit=self.size(i))
+
+    def seconds(self, i: int) -> Optional[float]:
+        s = self.sections[i][1]
+        e = self.sections[i + 1][1] if i + 1 < len(self.sections) else self.n - 1
+        a, b = self._times.get(s), self._times.get(e)
+        return (b - a) / 1e9 if a is not None and b is not None else None
+
+    @property
+    def final(self) -> Optional[Dict[str, Any]]:
+        return None if self._final is None else self.log.events(self.session_id, offset=self._final, limit=1)[0]
+
+    def telemetry(self) -> Dict[str, Any]:
+        return self._telemetry[1]
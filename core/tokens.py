@@ -0,0 +1,121 @@
+from typing import Dict, Optional, Any
+from collections import OrderedDict
+import threading
+import os
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+MODEL_CONTEXT = {
+    "gpt-4.1": 1_047_576,
+    "gpt-4o": 128_000,
+    "gpt-4-turbo": 128_000,
+    "gpt-4": 8_192,
+    "gpt-3.5-turbo": 16_385,
+    "o1": 200_000,
+    "o3": 200_000,
+    "o4": 200_000,
+}
+DEFAULT_CONTEXT = 8_192
+
+def context_window(model: str) -> int:
+    # Longest matching prefix, so "gpt-4o-mini" resolves to "gpt-4o" and not "gpt-4".
+    best = max((k for k in MODEL_CONTEXT if model.startswith(k)), key=len, default=None)
+    return MODEL_CONTEXT[best] if best else DEFAULT_CONTEXT
+
+def approx_tokens(text: str) -> int:
+    # Fallback without tiktoken: ~4 ASCII chars per token, ~1 token per non-ASCII char.
+    extra = len(text.encode("utf-8")) - len(text)
+    wide = extra // 2
+    return max(1, (len(text) - wide + 3) // 4 + wide) if text else 0
+
+class Tokenizer:
+    # Counts and cuts text in tokens of a given model's encoding. Results are memoized per
+    # segment, so the same file excerpt or turn is not re-tokenized on every call. The memo is
+    # shared by all sessions, so it is keyed on the text's length and hash, not the text itself.
+    MAX_CACHE = 4096
+
+    def __init__(self, model: str):
+        self.model = model
+        self.enc = None
+        if tiktoken is not None:
+            try:
+                try:
+                    self.enc = tiktoken.encoding_for_model(model)
+                except KeyError:
+                    self.enc = tiktoken.get_encoding("o200k_base")
+            except Exception:
+                # tiktoken fetches BPE files on first use; offline hosts fall back to the estimate.
+                self.enc = None
+        self.name = self.enc.name if self.enc else "approx"
+        self._cache: "OrderedDict[Any, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _memo(self, key, fn):
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        val = fn()
+        with self._lock:
+            self._cache[key] = val
+            if len(self._cache) > self.MAX_CACHE:
+                self._cache.popitem(last=False)
+        return val
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self.enc is None:
+            return approx_tokens(text)
+        return self._memo(("n", len(text), hash(text)), lambda: len(self.enc.encode(text, disallowed_special=())))
+
+    def head(self, text: str, n: int) -> str:
+        return self._memo(("h", n, len(text), hash(text)), lambda: self._cut(text, n, tail=False)) if text else text
+
+    def tail(self, text: str, n: int) -> str:
+        return self._memo(("t", n, len(text), hash(text)), lambda: self._cut(text, n, tail=True)) if text else text
+
+    def _cut(self, text: str, n: int, tail: bool) -> str:
+        if n <= 0:
+            return ""
+        # Only look at a generous slice; no encoding packs more than ~16 chars per token in practice.
+        span = text[-n * 16:] if tail else text[:n * 16]
+        if self.enc is not None:
+            ids = self.enc.encode(span, disallowed_special=())
+            if len(ids) <= n and len(span) == len(text):
+                return text
+            return self.enc.decode(ids[-n:] if tail else ids[:n])
+        while approx_tokens(span) > n:
+            keep = max(int(len(span) * n / approx_tokens(span)) - 1, 0)
+            span = span[-keep:] if tail and keep else span[:keep]
+        return span
+
+_tokenizers: Dict[str, Tokenizer] = {}
+_lock = threading.Lock()
+
+def tokenizer_for(model: str) -> Tokenizer:
+    with _lock:
+        if model not in _tokenizers:
+            _tokenizers[model] = Tokenizer(model)
+        return _tokenizers[model]
+
+class PromptBudget:
+    # Splits a per-call token budget between prompt slots. By default the budget is half the
+    # model's context window, capped at MAX_TOTAL (KREW_PROMPT_TOKENS): every call of a run pays
+    # for its prompt, so long-context models do not get 64k-token prompts unless asked for.
+    SHARES = {"system": 0.1, "file": 0.35, "transcript": 0.3, "completion": 0.25}
+    CONTEXT_SHARE = 0.5
+    MAX_TOTAL = int(os.environ.get("KREW_PROMPT_TOKENS", "6000"))
+
+    def __init__(self, model: str, total: Optional[int] = None, shares: Optional[Dict[str, float]] = None):
+        window = context_window(model)
+        self.total = min(total, window) if total else min(int(window * self.CONTEXT_SHARE), self.MAX_TOTAL)
+        self.shares = {**self.SHARES, **(shares or {})}
+        if sum(self.shares.values()) > 1.0 + 1e-9:
+            raise ValueError("Prompt budget shares must not add up to more than 1.0.")
+
+    def __getitem__(self, slot: str) -> int:
+        return int(self.total * self.shares[slot])
@@ -0,0 +1,94 @@
+from typing import List, Dict, Tuple, Optional
+from bisect import bisect_left
+from core.tokens import Tokenizer, tokenizer_for
+
+class Turn:
+    __slots__ = ("sender", "tag", "text", "rendered", "tokens")
+
+    def __init__(self, sender: str, tag: str, text: str, rendered: str, tokens: int):
+        self.sender = sender
+        self.tag = tag
+        self.text = text
+        self.rendered = rendered
+        self.tokens = tokens
+
+class Transcript:
+    # Append-only record of the collaboration. Windows are cut on whole-turn boundaries
+    # within a token budget, in O(window) via prefix sums. A rendered window is kept per
+    # budget and extended by the turns appended since, dropping the ones that no longer fit.
+    def __init__(self, header: str = "", tokenizer: Optional[Tokenizer] = None):
+        self.tok = tokenizer or tokenizer_for("gpt-4o-mini")
+        self.header = header
+        self.header_tokens = self.tok.count(header)
+        self.turns: List[Turn] = []
+        self._cum: List[int] = [0]
+        # (budget, header, since) -> (turns rendered, first turn shown, text)
+        self._windows: Dict[Tuple[int, bool, int], Tuple[int, int, str]] = {}
+        self._anchors: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.turns)
+
+    @property
+    def tokens(self) -> int:
+        return self.header_tokens + self._cum[-1]
+
+    def append(self, sender: str, tag: str, text: str) -> Turn:
+        rendered = f"**{sender} ({tag}):** {text}"
+        t = Turn(sender, tag, text, rendered, self.tok.count(rendered))
+        self.turns.append(t)
+        self._cum.append(self._cum[-1] + t.tokens)
+        return t
+
+    def window(self, budget: int, header: bool = True, since: int = 0) -> str:
+        # `since` excludes earlier turns (already represented elsewhere, e.g. by a digest).
+        key = (budget, header, since)
+        hit = self._windows.get(key)
+        if hit is None or hit[0] != len(self.turns):
+            hit = self._windows[key] = self._render(budget, header, since, hit)
+        return hit[2]
+
+    def _render(self, budget: int, header: bool, since: int = 0, prev: Optional[Tuple[int, int, str]] = None) -> Tuple[int, int, str]:
+        head = bool(header and self.header and self.header_tokens <= budget)
+        if head:
+            budget -= self.header_tokens
+        n = len(self.turns)
+        if n <= since:
+            return n, n, self.header if head else ""
+        # First turn index whose suffix fits: cum[n] - cum[i] <= budget.
+        i = max(bisect_left(self._cum, self._cum[n] - budget, 0, n + 1), since)
+        if i == n:
+            body = self._clip(self.turns[-1].rendered, budget)
+        elif prev is not None and prev[1] <= i < prev[0]:
+            # Still overlaps the previous window: cut the turns that fell out, add the new ones.
+            n0, i0, text = prev
+            skip = (len(self.header) + 2 if head else 0) + sum(len(t.rendered) + 2 for t in self.turns[i0:i])
+            body = "\n\n".join([text[skip:]] + [t.rendered for t in self.turns[n0:]])
+        else:
+            body = "\n\n".join(t.rendered for t in self.turns[i:])
+        return n, i, f"{self.header}\n\n{body}" if head else body
+
+    def log(self, budget: int, since: int = 0) -> str:
+        # Turns from an anchor that only moves forward, and then far enough to halve the log,
+        # so consecutive prompts repeat everything up to the newest turns (a stable prefix).
+        n = len(self.turns)
+        a = max(self._anchors.get(budget, 0), since)
+        if n > a and self._cum[n] - self._cum[a] > budget:
+            a = min(max(bisect_left(self._cum, self._cum[n] - budget // 2, 0, n + 1), since), n - 1)
+        self._anchors[budget] = a
+        if n == a:
+            return ""
+        if self.turns[a].tokens > budget:
+            return self._clip(self.turns[a].rendered, budget)
+        return "\n\n".join(t.rendered for t in self.turns[a:])
+
+    def _clip(self, text: str, budget: int) -> str:
+        # A single turn larger than the whole budget: keep its tail, starting at a word boundary.
+        clipped = self.tok.tail(text, budget)
+        if len(clipped) == len(text):
+            return text
+        sp = clipped.find(" ")
+        return "…" + (clipped[sp + 1:] if sp != -1 else clipped)
+
+    def text(self) -> str:
+        return "\n\n".join(([self.header] if self.header else []) + [t.rendered for t in self.turns])
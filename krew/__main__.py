@@ -0,0 +1,168 @@
+from typing import Dict, Any, List, Optional
+import argparse
+import asyncio
+import json
+import math
+import time
+import uuid
+import sys
+import os
+
+from config.predefined_agents import PREDEFINED_AGENTS, MODEL_ROUTES
+from core.agents import Employee, Manager
+from core.convergence import ConvergencePolicy
+from core.cache import shared_cache
+from core.processor import ingest
+from core.retrieval import build_index
+from core.jobs import JobQueue
+from core.eventlog import shared_log
+from core.memory import SUMMARY_MODEL
+from core.routing import ModelRouter
+from core.telemetry import summarize
+from core.events import jsonable
+
+# Headless batch runner: no Streamlit import, so startup is only the core modules.
+#   python -m krew run tasks.jsonl --workers 8 --out results.jsonl
+# Each input line is a JSON object with "task" and optionally "id", "team" (role names or
+# {role, goal, expertise} objects), "files" (paths), "user_suggestions", "max_turns", "mode" and
+# "weight" (the task's share of model calls while runs compete, default 1).
+
+DEFAULT_TEAM = ["Research Specialist", "Technical Expert", "Creative Writer"]
+POLL = 0.05
+
+class LocalFile:
+    __slots__ = ("name", "path")
+
+    # Stands in for a Streamlit upload in core.processor.ingest.
+    def __init__(self, path: str):
+        self.path = path
+        self.name = os.path.basename(path)
+
+    def getvalue(self) -> bytes:
+        with open(self.path, "rb") as fh:
+            return fh.read()
+
+def _member(m) -> Dict[str, str]:
+    if isinstance(m, dict):
+        spec = PREDEFINED_AGENTS.get(m["role"], {})
+        return {"role": m["role"], "goal": m.get("goal") or spec.get("goal", ""), "expertise": m.get("expertise") or spec.get("expertise", "")}
+    if m not in PREDEFINED_AGENTS:
+        raise ValueError(f"unknown role {m!r}; pass an object with role, goal and expertise")
+    return {"role": m, "goal": PREDEFINED_AGENTS[m]["goal"], "expertise": PREDEFINED_AGENTS[m]["expertise"]}
+
+def load_tasks(path: str) -> List[Dict[str, Any]]:
+    fh = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        rows = [json.loads(line) for line in fh if line.strip()]
+    finally:
+        if fh is not sys.stdin:
+            fh.close()
+    for i, r in enumerate(rows):
+        if not str(r.get("task", "")).strip():
+            raise ValueError(f"line {i + 1}: missing task")
+        r.setdefault("id", f"task-{i + 1}")
+    return rows
+
+def build_manager(row: Dict[str, Any], team: List[Dict[str, str]], files: Dict[str, str], a, session_id: str) -> Manager:
+    gen = {"temperature": 0.0 if a.deterministic else 0.7, "cache": None if a.no_cache else shared_cache(), "base_url": a.base_url}
+    members = [_member(m) for m in row["team"]] if row.get("team") else team
+    employees = [Employee(role=m["role"], goal=m["goal"], expertise=m["expertise"], api_key=a.api_key, **gen) for m in members]
+    return Manager(employees=employees, api_key=a.api_key, max_turns=int(row.get("max_turns", a.max_turns)), index=build_index(files),
+                   convergence=ConvergencePolicy(enabled=not a.no_early_stop), journal=shared_log().journal(session_id) if a.journal else None,
+                   catalog=PREDEFINED_AGENTS, summary_model=((a.route and MODEL_ROUTES["phases"].get("summary")) or SUMMARY_MODEL) if a.summarize else None,
+                   router=ModelRouter.from_config(MODEL_ROUTES) if a.route else None, layout=a.layout,
+                   session_id=session_id, weight=float(row.get("weight", 1.0)), **gen)
+
+async def run_row(row: Dict[str, Any], team: List[Dict[str, str]], a, session_id: str):
+    # Setup (reading and extracting files, resolving the team) happens when the run gets a worker
+    # slot, in a thread off the event loop: only running tasks hold their files, and a bad row
+    # (missing file, unknown role) fails its own run instead of the whole batch.
+    def setup():
+        files = ingest([LocalFile(p) for p in row.get("files", [])])[0]
+        if a.journal:
+            shared_log().start(session_id, {**row, "file_content": files, "agents_cfg": team, "mode": row.get("mode", a.mode)})
+        try:
+            return files, build_manager(row, team, files, a, session_id)
+        except Exception as ex:
+            if a.journal:
+                shared_log().journal(session_id).finish("failed", f"{type(ex).__name__}: {ex}")
+            raise
+    files, m = await asyncio.to_thread(setup)
+    blob = "\n\n".join(f"=== {n} ===\n{c}" for n, c in files.items())
+    async for ev in m.adelegate_task(row["task"], blob, row.get("user_suggestions", ""), stream=False, parallel=a.parallel, mode=row.get("mode", a.mode)):
+        yield ev
+
+def result_row(row: Dict[str, Any], job, session_id: str) -> Dict[str, Any]:
+    final = next((e for e in reversed(job.events) if e.get("type") == "final_result"), None)
+    s = job.summary()
+    return {"id": row["id"], "session_id": session_id, "task": row["task"], "status": job.status, "error": job.error,
+            "final_result": final["message"] if final else None, "wait_s": s["wait_s"], "run_s": s["run_s"], "events": s["events"],
+            "telemetry": summarize(job.events)["total"]}
+
+def cmd_run(a) -> int:
+    if not a.api_key:
+        print("error: no API key (--api-key or OPENAI_API_KEY)", file=sys.stderr)
+        return 2
+    rows = load_tasks(a.tasks)
+    team = [_member(m) for m in (json.load(open(a.team, encoding="utf-8")) if a.team else DEFAULT_TEAM)]
+    queue = JobQueue(max_concurrent=a.workers, ttl=math.inf)
+    out = sys.stdout if a.out == "-" else open(a.out, "w", encoding="utf-8")
+    t0 = time.perf_counter()
+    pending = []
+    for row in rows:
+        sid = str(uuid.uuid4())
+        pending.append((row, sid, queue.submit(sid, lambda row=row, sid=sid: run_row(row, team, a, sid)), [0]))
+    counts = {"done": 0, "failed": 0, "cancelled": 0}
+    try:
+        while pending:
+            time.sleep(POLL)
+            for item in list(pending):
+                row, sid, job, cursor = item
+                if a.events:
+                    evs, cursor[0], _ = job.poll(cursor[0])
+                    for ev in evs:
+                        out.write(json.dumps({"id": row["id"], "event": ev}, ensure_ascii=False, default=jsonable) + "\n")
+                if not job.active:
+                    pending.remove(item)
+                    res = result_row(row, job, sid)
+                    counts[res["status"]] += 1
+                    out.write(json.dumps(res, ensure_ascii=False, default=jsonable) + "\n")
+                    print(f"[{sum(counts.values())}/{len(rows)}] {row['id']} {res['status']} {res['run_s']:.1f}s" + (f" {res['error']}" if res["error"] else ""), file=sys.stderr)
+            out.flush()
+    except KeyboardInterrupt:
+        for row, sid, job, _ in pending:
+            job.cancel()
+        print(f"interrupted: cancelled {len(pending)} run(s)", file=sys.stderr)
+        return 130
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"{counts['done']} done, {counts['failed']} failed, {counts['cancelled']} cancelled in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+    return 0 if counts["done"] == len(rows) else 1
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m krew", description="Run Krew without the Streamlit UI.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("run", help="Run every task in a JSON Lines file and write one result line per task.")
+    r.add_argument("tasks", help="Task file (JSON Lines), '-' for stdin.")
+    r.add_argument("--team", help="JSON file with the default team: role names or {role, goal, expertise} objects.")
+    r.add_argument("--workers", type=int, default=4, help="Runs executing at once; the rest wait in order.")
+    r.add_argument("--out", default="-", help="JSON Lines output path, '-' for stdout.")
+    r.add_argument("--events", action="store_true", help="Also write every event as it happens ({id, event} lines).")
+    r.add_argument("--api-key", default=os.environ.get("OPENAI_API_KEY", ""))
+    r.add_argument("--base-url", default=os.environ.get("OPENAI_BASE_URL"))
+    r.add_argument("--max-turns", type=int, default=12)
+    r.add_argument("--mode", choices=["rounds", "graph"], default="rounds")
+    r.add_argument("--parallel", action="store_true", help="Run the first round for all agents at once.")
+    r.add_argument("--deterministic", action="store_true", help="Temperature 0 (and cacheable responses).")
+    r.add_argument("--no-cache", action="store_true")
+    r.add_argument("--no-early-stop", action="store_true")
+    r.add_argument("--summarize", action="store_true", help="Condense older rounds with the summary model.")
+    r.add_argument("--route", action="store_true", help="Route models per phase/role with MODEL_ROUTES.")
+    r.add_argument("--layout", choices=list(Manager.LAYOUTS), default="window", help="'stable' keeps a shared prompt prefix so provider prefix caching applies.")
+    r.add_argument("--journal", action="store_true", help="Log runs to the session event log so the app can replay them.")
+    a = ap.parse_args(argv)
+    return cmd_run(a)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,14 @@
+import threading
+import pytest
+
+from bench.stub_server import serve, StubConfig
+
+@pytest.fixture
+def stub():
+    # Local OpenAI-compatible server: fast, never answers FINAL_ANSWER early, so runs have a fixed shape.
+    cfg = StubConfig(latency="const:0.01", final_rate=0.0)
+    srv = serve(0, cfg)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield cfg, f"http://127.0.0.1:{srv.server_address[1]}/v1"
+    srv.shutdown()
+    srv.server_close()
@@ -0,0 +1,54 @@
+import asyncio
+
+from core.agents import Employee
+from core.cache import ResponseCache, cache_key
+
+MESSAGES = [{"role": "system", "content": "You are a tester."}, {"role": "user", "content": "hi"}]
+
+def test_key_covers_model_messages_and_params():
+    k = cache_key("m", MESSAGES, temperature=0.0)
+    assert k == cache_key("m", [dict(m) for m in MESSAGES], temperature=0.0)
+    assert k != cache_key("other", MESSAGES, temperature=0.0)
+    assert k != cache_key("m", MESSAGES, temperature=0.5)
+    assert k != cache_key("m", MESSAGES[:1], temperature=0.0)
+
+def test_memory_tier_is_lru():
+    c = ResponseCache(max_items=2)
+    c.put("a", "1")
+    c.put("b", "2")
+    assert c.get("a") == "1"
+    c.put("c", "3")
+    assert c.get("b") is None and c.get("a") == "1" and c.get("c") == "3"
+    assert c.summary()["memory_items"] == 2
+
+def test_disk_tier_survives_a_restart_and_expires(tmp_path):
+    path = str(tmp_path / "responses.sqlite")
+    ResponseCache(path).put("k", "answer")
+    c = ResponseCache(path)
+    assert c.get("k") == "answer"
+    assert c.stats["disk_hits"] == 1 and c.summary()["disk_items"] == 1
+    assert ResponseCache(path, ttl=-1).get("k") is None
+
+def test_disk_tier_evicts_least_recently_used_over_max_bytes(tmp_path):
+    c = ResponseCache(str(tmp_path / "responses.sqlite"), max_items=1, max_bytes=25)
+    c.put("old", "x" * 10)
+    c.put("used", "y" * 10)
+    c.get("old")
+    c.put("new", "z" * 10)
+    assert c.get("used") is None and c.get("old") == "x" * 10
+    assert c.summary()["disk_bytes"] == 20
+
+def test_agent_serves_repeated_deterministic_calls_from_cache(stub):
+    cfg, url = stub
+    cache = ResponseCache()
+    e = Employee("Tester", "test", api_key="sk-test", base_url=url, temperature=0.0, cache=cache)
+    before = cfg.stats["requests"]
+    stats = {}
+    first = asyncio.run(e.agenerate("same question"))
+    second = asyncio.run(e.agenerate("same question", stats=stats))
+    assert first == second and stats["cached"] and stats["cost_usd"] == 0.0
+    assert cfg.stats["requests"] - before == 1
+    # Sampled calls are not cached by default.
+    e.temperature = 0.7
+    asyncio.run(e.agenerate("same question"))
+    assert cfg.stats["requests"] - before == 2
@@ -0,0 +1,46 @@
+import pytest
+
+from core.agents import Employee, Manager
+from core.convergence import ConvergencePolicy, ConvergenceMonitor
+
+def test_novelty_falls_for_repeated_content():
+    mon = ConvergenceMonitor(ConvergencePolicy(), planned_turns=6)
+    mon.seed("launch the product in march with a small pilot group")
+    assert mon.observe("we should hire a designer and expand the budget for ads") == 1.0
+    assert mon.observe("launch the product in march with a small pilot group") == 0.0
+
+def test_patience_needs_consecutive_low_novelty_turns():
+    mon = ConvergenceMonitor(ConvergencePolicy(threshold=0.5, patience=2), planned_turns=6)
+    mon.seed("alpha beta gamma delta")
+    mon.observe("alpha beta gamma delta")
+    assert not mon.converged
+    mon.observe("alpha beta gamma delta")
+    assert mon.converged and mon.stop()
+    s = mon.summary()
+    assert s["turns_run"] == 2 and s["turns_saved"] == 4 and s["stopped_early"]
+
+def test_turns_before_arming_do_not_count_towards_patience():
+    mon = ConvergenceMonitor(ConvergencePolicy(threshold=0.5, patience=2), planned_turns=9)
+    mon.seed("alpha beta gamma delta")
+    for _ in range(3):
+        mon.observe("alpha beta gamma delta")
+    mon.arm()
+    mon.observe("alpha beta gamma delta")
+    assert not mon.converged
+    mon.observe("alpha beta gamma delta")
+    assert mon.converged
+
+def test_disabled_policy_never_converges():
+    mon = ConvergenceMonitor(ConvergencePolicy(enabled=False, patience=1), planned_turns=3)
+    mon.observe("")
+    assert not mon.stop()
+
+@pytest.mark.parametrize("parallel", [True, False])
+def test_round_one_does_not_count_towards_the_first_stop_check(stub, parallel):
+    # Every turn counts as converged; with patience 2 the run still needs two round-2 turns.
+    _, url = stub
+    team = [Employee(r, "goal", api_key="sk-test", base_url=url) for r in ("Analyst", "Engineer", "Writer")]
+    m = Manager(team, api_key="sk-test", base_url=url, max_turns=9, convergence=ConvergencePolicy(threshold=1.01, patience=2))
+    events = list(m.delegate_task("Plan a product launch", parallel=parallel, lookahead=0))
+    assert sum(e["type"] == "agent" for e in events) == 5
+    assert events[-1]["convergence"]["stopped_early"]
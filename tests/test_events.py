@@ -0,0 +1,36 @@
+import json
+import pytest
+
+from core.events import Event, EventType, jsonable
+
+def test_events_read_like_the_dicts_they_replace():
+    ev = Event("Analyst", "answer", "agent", agent_id="a1", node="n2")
+    assert ev["type"] == "agent" and ev.type is EventType.AGENT
+    assert ev.get("phase") is None and "phase" not in ev
+    assert {**ev} == ev.to_dict()
+    assert set(ev) == {"sender", "message", "type", "timestamp", "ts_ns", "agent_id", "node"} and len(ev) == 7
+    with pytest.raises(KeyError):
+        ev["plan"]
+
+def test_events_and_their_telemetry_are_immutable():
+    stats = {"model": "gpt-4o-mini", "latency_s": 0.5}
+    ev = Event("Analyst", "answer", "agent", telemetry=stats)
+    # Later changes to the caller's dict do not reach the event.
+    stats["model"] = "gpt-4o"
+    assert ev["telemetry"]["model"] == "gpt-4o-mini"
+    with pytest.raises(TypeError):
+        ev["telemetry"]["model"] = "gpt-4o"
+    with pytest.raises(AttributeError):
+        ev.message = "changed"
+
+def test_with_copies_and_keeps_the_time():
+    ev = Event("Analyst", "answer", "agent", telemetry={"model": "gpt-4o-mini"})
+    other = ev.with_(message="edited", phase="round1")
+    assert (other.message, other.phase, other.t_ns) == ("edited", "round1", ev.t_ns)
+    assert dict(other["telemetry"]) == {"model": "gpt-4o-mini"} and ev.message == "answer"
+
+def test_events_serialize_through_jsonable():
+    ev = Event("Analyst", "answer", "agent", telemetry={"model": "gpt-4o-mini"})
+    out = json.loads(json.dumps({"event": ev, "spread": {**ev}}, default=jsonable))
+    assert out["event"] == out["spread"] == json.loads(json.dumps(ev.to_dict()))
+    assert out["event"]["telemetry"] == {"model": "gpt-4o-mini"}
@@ -0,0 +1,54 @@
+import json
+import zipfile
+import pytest
+
+from core import export
+from core.events import Event
+
+def messages():
+    return [
+        Event("Manager", "🎯 New Mission", "manager", phase="brief"),
+        Event("Analyst", "par", "agent_delta"),
+        Event("Analyst", "partial answer", "agent", agent_id="a1", telemetry={"phase": "round1", "model": "gpt-4o-mini", "latency_s": 0.5, "prompt_tokens": 10, "completion_tokens": 4, "cost_usd": 0.001}),
+        {"sender": "Manager", "message": "Final plan", "type": "final_result", "timestamp": "12:00:00", "ts_ns": 1, "task_complete": True},
+    ]
+
+@pytest.mark.parametrize("compression", list(export.COMPRESSION))
+def test_package_holds_every_entry(compression):
+    with export.build_export_package("abcd1234", messages(), [{"role": "Analyst"}], 6, compression) as fh:
+        z = zipfile.ZipFile(fh)
+        names = z.namelist()
+        assert {"transcript.txt", "messages.json", "messages.jsonl", "config.json", "telemetry.json", "final_result.md"} <= set(names)
+        assert ("messages.parquet" in names) == (export.pq is not None)
+        assert z.read("final_result.md").decode() == "Final plan"
+        assert json.loads(z.read("config.json"))["compression"] == compression
+
+def test_entries_match_the_events():
+    with export.build_export_package("abcd1234", messages(), [], 6) as fh:
+        z = zipfile.ZipFile(fh)
+        full = json.loads(z.read("messages.json"))
+        lines = [json.loads(l) for l in z.read("messages.jsonl").decode().splitlines()]
+        transcript = z.read("transcript.txt").decode()
+        telemetry = json.loads(z.read("telemetry.json"))
+    # Streamed deltas are in the full dump only.
+    assert [m["type"] for m in full] == ["manager", "agent_delta", "agent", "final_result"]
+    assert [m["type"] for m in lines] == ["manager", "agent", "final_result"]
+    assert lines[1]["telemetry"]["model"] == "gpt-4o-mini" and lines[1]["agent_id"] == "a1"
+    assert "Analyst (agent):\npartial answer" in transcript and "par\n" not in transcript
+    assert telemetry["total"]["calls"] == 1
+
+@pytest.mark.skipif(export.pq is None, reason="pyarrow not installed")
+def test_parquet_has_typed_telemetry_columns():
+    with export.build_export_package("abcd1234", messages(), [], 6) as fh:
+        with zipfile.ZipFile(fh).open("messages.parquet") as e:
+            t = export.pq.read_table(e)
+    assert t.num_rows == 3
+    assert t.column("latency_s").to_pylist() == [None, 0.5, None]
+    assert str(t.schema.field("prompt_tokens").type) == "int64"
+
+def test_large_packages_spill_to_disk(monkeypatch):
+    monkeypatch.setattr(export, "SPOOL_BYTES", 1024)
+    big = messages() + [Event("Writer", "x" * 200_000, "agent")]
+    with export.build_export_package("abcd1234", big, [], 6, "stored") as fh:
+        assert fh._rolled
+        assert fh.tell() == 0 and zipfile.ZipFile(fh).testzip() is None
@@ -0,0 +1,52 @@
+import asyncio
+import threading
+import time
+import pytest
+
+from core.agents import Employee, Manager
+from core.convergence import ConvergencePolicy
+from core.jobs import JobQueue, Saturated
+from core.tokens import Tokenizer
+
+def wait(job, timeout: float = 20.0):
+    end = time.monotonic() + timeout
+    while job.active and time.monotonic() < end:
+        time.sleep(0.01)
+    assert not job.active
+
+@pytest.mark.parametrize("mode,layout", [("rounds", "window"), ("rounds", "stable"), ("graph", "window")])
+def test_runs_keep_tokenizer_work_off_the_shared_loop(stub, monkeypatch, mode, layout):
+    _, url = stub
+    on_loop = []
+    for name in ("count", "head", "tail"):
+        fn = getattr(Tokenizer, name)
+
+        def traced(self, *args, _fn=fn, _name=name):
+            if threading.current_thread().name == "krew-loop":
+                on_loop.append(_name)
+            return _fn(self, *args)
+        monkeypatch.setattr(Tokenizer, name, traced)
+    team = [Employee(r, "goal", api_key="sk-test", base_url=url) for r in ("Analyst", "Engineer", "Writer")]
+    m = Manager(team, api_key="sk-test", base_url=url, max_turns=9, convergence=ConvergencePolicy(enabled=True, threshold=0.0), summary_model="gpt-4.1-nano", layout=layout)
+    job = JobQueue().submit("s", lambda: m.adelegate_task("Plan a product launch", "notes " * 500, stream=True, parallel=True, mode=mode))
+    wait(job)
+    assert job.status == "done" and job.events[-1]["type"] == "final_result"
+    assert on_loop == []
+
+def test_full_queue_refuses_new_runs_but_not_replacements():
+    async def slow():
+        await asyncio.sleep(10)
+        yield {}
+    q = JobQueue(max_concurrent=1, max_queued=1)
+    first, second = q.submit("a", slow), q.submit("b", slow)
+    time.sleep(0.05)
+    assert (first.status, second.status) == ("running", "queued")
+    assert not q.admits("c")
+    with pytest.raises(Saturated):
+        q.submit("c", slow)
+    assert q.admits("b")
+    for sid in ("a", "b"):
+        q.cancel(sid)
+    wait(first)
+    wait(second)
+    assert first.status == "cancelled" and q.summary()["rejected"] == 1
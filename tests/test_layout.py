@@ -0,0 +1,21 @@
+import sys
+
+from streamlit.testing.v1 import AppTest
+
+def page():
+    import streamlit as st
+    from core.timeline import Timeline
+    from ui.layout import render_messages
+    if "timeline" not in st.session_state:
+        final = {"sender": "Manager", "type": "final_result", "timestamp": "12:00:00", "phase": "synthesis"}
+        # Two results logged in the same second, as a resumed or refined run can produce.
+        st.session_state.timeline = Timeline([{**final, "message": "first", "ts_ns": 1}, {**final, "message": "second", "ts_ns": 2, "phase": None}])
+        st.session_state.user_suggestions = ""
+    render_messages()
+
+def test_results_with_the_same_timestamp_get_their_own_widgets(monkeypatch):
+    # The script run replaces __main__, which spawned worker processes would then re-run.
+    monkeypatch.setitem(sys.modules, "__main__", sys.modules["__main__"])
+    at = AppTest.from_function(page).run()
+    assert not at.exception
+    assert len({w.key for w in at.text_input}) == 2
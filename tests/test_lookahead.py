@@ -0,0 +1,51 @@
+import asyncio
+import pytest
+
+from core.lookahead import Lookahead
+
+def events(produced, n=6, fail=False):
+    async def gen():
+        for i in range(n):
+            produced.append(i)
+            yield {"type": "agent_delta", "i": i}
+            yield {"type": "agent", "i": i}
+        if fail:
+            raise RuntimeError("boom")
+    return gen()
+
+def test_runs_ahead_up_to_the_depth_in_order():
+    async def main():
+        produced = []
+        la = Lookahead(events(produced), depth=2)
+        first = await la.__anext__()
+        await asyncio.sleep(0.05)
+        # Deltas are not held back; only complete events count against the depth.
+        ahead = len(produced)
+        rest = [ev async for ev in la]
+        return first, ahead, rest, la.summary()
+    first, ahead, rest, s = asyncio.run(main())
+    assert first == {"type": "agent_delta", "i": 0}
+    assert ahead == 3
+    assert [(e["type"], e["i"]) for e in [first, *rest]] == [(t, i) for i in range(6) for t in ("agent_delta", "agent")]
+    assert s["max_buffered"] == 2 and s["stalls"] > 0
+
+def test_errors_are_raised_after_the_buffered_events():
+    async def main():
+        seen = []
+        with pytest.raises(RuntimeError):
+            async for ev in Lookahead(events([], n=2, fail=True), depth=8):
+                seen.append(ev["i"])
+        return seen
+    assert asyncio.run(main()) == [0, 0, 1, 1]
+
+def test_closing_stops_the_generator():
+    async def main():
+        produced = []
+        la = Lookahead(events(produced, n=100), depth=1)
+        await la.__anext__()
+        await la.aclose()
+        n = len(produced)
+        await asyncio.sleep(0.02)
+        return n, len(produced)
+    n, later = asyncio.run(main())
+    assert n < 100 and later == n
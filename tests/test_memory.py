@@ -0,0 +1,59 @@
+import asyncio
+
+from core.memory import RollingMemory, Digest
+from core.transcript import Transcript
+
+class Summarizer:
+    def __init__(self, fail: bool = False):
+        self.calls = 0
+        self.fail = fail
+
+    async def agenerate(self, prompt, stats=None, priority=None):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError("down")
+        return f"- digest {self.calls}"
+
+def memory(summarizer, **kw) -> RollingMemory:
+    return RollingMemory(Transcript("BRIEF"), summarizer, **kw)
+
+async def play(m: RollingMemory, rounds: int):
+    # Three turns per round, settling as each new round starts, like Manager._arounds.
+    ready = []
+    for r in range(rounds):
+        ready += await m.settle()
+        for i in range(3):
+            m.append(f"Agent{i}", f"R{r + 1}", f"round {r + 1} turn {i} " + "detail " * 30)
+        m.close_segment(f"Round {r + 1}")
+    ready += await m.settle(final=True)
+    return ready
+
+def test_closed_rounds_reach_the_window_as_digests():
+    m = memory(Summarizer(), digest_tokens=1000)
+    ready = asyncio.run(play(m, 3))
+    assert [d.label for d in ready] == ["Round 1", "Round 2", "Round 3"]
+    w = m.window(10_000)
+    assert w.startswith("BRIEF") and "[Round 1] - digest" in w
+    # Turns covered by a digest are not repeated verbatim.
+    assert "round 1 turn 0" not in w and "round 3 turn 2" not in w
+
+def test_oldest_digests_are_merged_once_they_outgrow_the_budget():
+    s = Summarizer()
+    m = memory(s, digest_tokens=2)
+    ready = asyncio.run(play(m, 4))
+    merged = [d for d in ready if d.level == 2]
+    assert merged and merged[0].label == "Round 1 – Round 2" and (merged[0].start, merged[0].end) == (0, 6)
+    assert m.digests[0] is merged[0] and s.calls == 5
+
+def test_failed_summaries_fall_back_to_the_head_of_the_segment():
+    m = memory(Summarizer(fail=True), digest_tokens=20)
+    ready = asyncio.run(play(m, 1))
+    assert ready[0].text.startswith("**Agent0 (R1):** round 1 turn 0") and "error" in ready[0].stats
+
+def test_known_digests_are_reused_instead_of_summarized():
+    logged = Digest("Round 1", "- from the log", 5, 600, 0, 3)
+    s = Summarizer()
+    m = memory(s, digest_tokens=1000, known=[Digest.restore({"digest": logged.text, "segment": logged.segment()})])
+    ready = asyncio.run(play(m, 2))
+    assert ready[0].text == "- from the log" and ready[0].replayed and not ready[1].replayed
+    assert s.calls == 1
@@ -0,0 +1,34 @@
+import pytest
+
+from core.agents import Employee, Manager
+from core.convergence import ConvergencePolicy
+from core.prefix import PrefixMonitor, common_prefix, cacheable, CACHE_MIN, CACHE_STEP
+from core.tokens import Tokenizer
+
+def test_common_prefix_and_cacheable_sizes():
+    assert common_prefix("abcdef", "abcxyz") == 3
+    assert common_prefix("abc", "abc") == 3 and common_prefix("", "abc") == 0
+    assert cacheable(CACHE_MIN - 1) == 0
+    assert cacheable(CACHE_MIN + CACHE_STEP + 5) == CACHE_MIN + CACHE_STEP
+
+def test_repeated_prompt_starts_count_as_prefix():
+    mon, tok = PrefixMonitor(), Tokenizer("gpt-4o-mini")
+    system = {"role": "system", "content": "shared instructions " * 50}
+    first = mon.observe([system, {"role": "user", "content": "one"}], tok)
+    second = mon.observe([system, {"role": "user", "content": "two"}], tok)
+    assert first["prefix_tokens"] == 0
+    assert 0 < second["prefix_tokens"] <= tok.count(system["content"]) + 1
+    s = mon.summary()
+    assert s["calls"] == 2 and 0 < s["overlap"] < 1
+
+@pytest.mark.parametrize("layout", ["window", "stable"])
+def test_only_the_stable_layout_is_monitored(stub, layout):
+    _, url = stub
+    team = [Employee(r, "goal", api_key="sk-test", base_url=url) for r in ("Analyst", "Writer")]
+    m = Manager(team, api_key="sk-test", base_url=url, max_turns=4, layout=layout, convergence=ConvergencePolicy(enabled=False))
+    done = [e for e in m.delegate_task("Plan a product launch", lookahead=0) if e["type"] == "agent"]
+    if layout == "window":
+        assert m.prefix_monitor is None and all("prefix_tokens" not in e["telemetry"] for e in done)
+    else:
+        assert m.prefix_monitor.summary()["calls"] >= len(done)
+        assert any(e["telemetry"]["prefix_tokens"] > 0 for e in done)
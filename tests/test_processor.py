@@ -0,0 +1,45 @@
+import pytest
+
+from core import processor
+
+class Upload:
+    def __init__(self, name: str, data: bytes, file_id: str = None):
+        self.name, self.data, self.file_id = name, data, file_id or name
+
+    def getvalue(self) -> bytes:
+        return self.data
+
+@pytest.fixture(autouse=True)
+def cache_dirs(tmp_path, monkeypatch):
+    monkeypatch.setattr(processor, "EXTRACT_DIR", str(tmp_path / "extract"))
+    monkeypatch.setattr(processor, "TABLE_DIR", str(tmp_path / "tables"))
+    monkeypatch.setattr(processor, "_texts", processor.OrderedDict())
+
+def test_ingest_extracts_each_format_and_reports_it():
+    files = [Upload("notes.txt", b"line one\nline two\n"), Upload("data.csv", b"name,qty\nbolt,3\nnut,5\n"), Upload("broken.pdf", b"not a pdf")]
+    texts, report = processor.ingest(files)
+    assert texts["notes.txt"] == "line one\nline two"
+    assert "bolt, 3" in texts["data.csv"]
+    assert texts["broken.pdf"].startswith("[Could not extract broken.pdf")
+    assert [r["name"] for r in report] == ["notes.txt", "data.csv", "broken.pdf"]
+    assert not any(r["cached"] for r in report) and report[0]["chars"] == len(texts["notes.txt"])
+
+def test_texts_are_memoized_by_content(monkeypatch):
+    processor.ingest([Upload("a.txt", b"same bytes")])
+    monkeypatch.setattr(processor, "_texts", processor.OrderedDict())
+    # A new upload id with the same content is served from the disk tier.
+    texts, report = processor.ingest([Upload("b.txt", b"same bytes", file_id="other")])
+    assert texts["b.txt"] == "same bytes" and report[0]["cached"]
+
+def test_failures_are_not_persisted(monkeypatch):
+    processor.ingest([Upload("broken.pdf", b"not a pdf")])
+    monkeypatch.setattr(processor, "_texts", processor.OrderedDict())
+    assert not processor.ingest([Upload("broken.pdf", b"not a pdf")])[1][0]["cached"]
+
+def test_upload_hash_memo_is_bounded(monkeypatch):
+    monkeypatch.setattr(processor, "_upload_hashes", processor.OrderedDict())
+    monkeypatch.setattr(processor, "MAX_UPLOAD_HASHES", 3)
+    for i in range(10):
+        processor._digest(Upload(f"f{i}.txt", b"x"), b"x")
+    assert len(processor._upload_hashes) == 3
+    assert [k[1] for k in processor._upload_hashes] == ["f7.txt", "f8.txt", "f9.txt"]
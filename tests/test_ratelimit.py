@@ -0,0 +1,121 @@
+import asyncio
+import pytest
+
+from core.agents import Employee
+from core.ratelimit import RateScheduler
+
+def scheduler(**kw) -> RateScheduler:
+    s = RateScheduler(**kw)
+    s.POLL = 0.001
+    return s
+
+async def grant_order(s: RateScheduler, requests):
+    # Holds the only slot while every request queues, then lets them through one at a time.
+    await s.aacquire("m", session="holder")
+    order = []
+
+    async def one(label, session, priority, tokens):
+        await s.aacquire("m", tokens=tokens, priority=priority, session=session)
+        order.append(label)
+        s.release(session)
+
+    tasks = []
+    for req in requests:
+        tasks.append(asyncio.create_task(one(*req)))
+        await asyncio.sleep(0)
+    s.release("holder")
+    await asyncio.gather(*tasks)
+    return order
+
+def test_priority_is_granted_first():
+    s = scheduler(max_inflight=1)
+    order = asyncio.run(grant_order(s, [("brainstorm", "a", 3, 10), ("synthesis", "a", 0, 10), ("consensus", "a", 1, 10)]))
+    assert order == ["synthesis", "consensus", "brainstorm"]
+
+def test_sessions_share_calls_fairly():
+    # A session queuing many calls does not make a later session wait behind all of them.
+    s = scheduler(max_inflight=1)
+    big = [(f"big{i}", "big", 2, 100) for i in range(4)]
+    order = asyncio.run(grant_order(s, big + [("small", "small", 2, 100)]))
+    assert order.index("small") == 1
+
+def test_weights_scale_the_share():
+    s = scheduler(max_inflight=1)
+    s.weight("heavy", 3.0)
+    reqs = [(f"light{i}", "light", 2, 100) for i in range(3)] + [(f"heavy{i}", "heavy", 2, 100) for i in range(3)]
+    order = asyncio.run(grant_order(s, reqs))
+    # Three times the weight: three heavy calls for each light one.
+    assert sum(x.startswith("light") for x in order[:4]) == 1
+
+def test_session_cap_does_not_block_other_sessions():
+    async def run():
+        s = scheduler(session_inflight=1)
+        await s.aacquire("m", session="a")
+        waiting = asyncio.create_task(s.aacquire("m", session="a"))
+        await asyncio.sleep(0.01)
+        await asyncio.wait_for(s.aacquire("m", session="b"), 1)
+        assert not waiting.done()
+        assert s.load()["sessions"]["a"]["waiting"] == 1
+        s.release("a")
+        await asyncio.wait_for(waiting, 1)
+        assert s.load()["inflight"] == 2
+    asyncio.run(run())
+
+def test_server_cap():
+    async def run():
+        s = scheduler(max_inflight=2)
+        await s.aacquire("m", session="a")
+        await s.aacquire("m", session="b")
+        third = asyncio.create_task(s.aacquire("m", session="c"))
+        await asyncio.sleep(0.01)
+        assert not third.done() and s.load()["waiting"] == 1
+        s.release("b")
+        await asyncio.wait_for(third, 1)
+        assert s.load()["inflight"] == 2
+    asyncio.run(run())
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def run():
+        s = scheduler(max_inflight=1)
+        await s.aacquire("m", session="a")
+        waiter = asyncio.create_task(s.aacquire("m", session="b"))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        load = s.load()
+        assert load["waiting"] == 0 and load["sessions"]["b"]["waiting"] == 0
+        s.release("a")
+        await asyncio.wait_for(s.aacquire("m", session="c"), 1)
+    asyncio.run(run())
+
+def test_cancelled_call_releases_its_slot():
+    async def run():
+        s = scheduler(max_inflight=1)
+        started = asyncio.Event()
+
+        async def slow():
+            started.set()
+            await asyncio.sleep(10)
+
+        call = asyncio.create_task(s.acall("m", slow, session="a"))
+        await started.wait()
+        assert s.load()["inflight"] == 1
+        call.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await call
+        assert s.load()["inflight"] == 0 and s.load()["sessions"]["a"]["inflight"] == 0
+    asyncio.run(run())
+
+def test_closed_stream_releases_its_held_slot(stub):
+    _, url = stub
+    s = scheduler(max_inflight=1)
+    e = Employee("Tester", "test", api_key="sk-test", base_url=url, scheduler=s)
+
+    async def run():
+        stream = e.agenerate_stream("hello")
+        await stream.__anext__()
+        assert s.load()["inflight"] == 1
+        await stream.aclose()
+        assert s.load()["inflight"] == 0
+    asyncio.run(run())
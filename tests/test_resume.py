@@ -0,0 +1,91 @@
+import pytest
+
+from core.agents import Employee, Manager
+from core.convergence import ConvergencePolicy
+from core.eventlog import EventLog, TURN_TYPES
+
+def manager(url: str, log: EventLog, sid: str, max_turns: int = 9, **kw) -> Manager:
+    team = [Employee(r, "goal", api_key="sk-test", base_url=url) for r in ("Analyst", "Engineer", "Writer")]
+    return Manager(team, api_key="sk-test", base_url=url, max_turns=max_turns, journal=log.journal(sid), convergence=ConvergencePolicy(enabled=False), session_id=sid, **kw)
+
+def run(url, log, sid, mode, parallel, replay=None, stop_after=None, digests=None, **kw):
+    events, agents = [], 0
+    gen = manager(url, log, sid, **kw).delegate_task("Plan a product launch", mode=mode, parallel=parallel, replay=replay, digests=digests, lookahead=0)
+    for ev in gen:
+        events.append(ev)
+        agents += ev["type"] == "agent"
+        if stop_after is not None and agents == stop_after:
+            break
+    gen.close()
+    return events
+
+@pytest.mark.parametrize("mode,parallel", [("rounds", True), ("rounds", False), ("graph", False)])
+def test_resumed_run_replays_completed_turns_and_logs_like_an_uninterrupted_one(stub, tmp_path, mode, parallel):
+    cfg, url = stub
+    log = EventLog(str(tmp_path / "sessions.sqlite"))
+    log.start("ref", {"task": "t"})
+    before = cfg.stats["requests"]
+    reference = run(url, log, "ref", mode, parallel)
+    calls = cfg.stats["requests"] - before
+    turns = [e for e in reference if e["type"] in TURN_TYPES]
+    assert calls == len(turns)
+
+    log.start("s", {"task": "t"})
+    run(url, log, "s", mode, parallel, stop_after=2)
+    replay = log.resume("s")
+    assert 2 <= len(replay) < len(turns)
+    assert log.session("s")["status"] == "running"
+
+    before = cfg.stats["requests"]
+    resumed = run(url, log, "s", mode, parallel, replay=replay)
+    # Only the turns that had not completed are asked for again...
+    assert cfg.stats["requests"] - before == len(turns) - len(replay)
+    # ...and the replayed answers come back at the same positions.
+    got = [e for e in resumed if e["type"] in TURN_TYPES]
+    assert [(e["type"], e["sender"]) for e in got] == [(e["type"], e["sender"]) for e in turns]
+    assert [e.get("answer", e["message"]) for e in got[:len(replay)]] == replay
+
+    # Nothing is logged twice or lost. The task graph announces only nodes still running when
+    # reached, which depends on timing, so its "thinking" notices are left out of the comparison.
+    shape = lambda evs: [(e["type"], e["sender"]) for e in evs if mode != "graph" or e["type"] != "thinking"]
+    assert shape(log.events("s")) == shape(log.events("ref"))
+    assert log.session("s")["status"] == "done"
+
+def test_a_replaced_run_cannot_write_into_its_successor(tmp_path):
+    log = EventLog(str(tmp_path / "sessions.sqlite"))
+    log.start("s", {"task": "first"})
+    old = log.journal("s")
+    log.start("s", {"task": "second"})
+    new = log.journal("s")
+    old.append({"type": "agent", "message": "late"})
+    old.finish("cancelled")
+    new.append({"type": "agent", "message": "kept"})
+    assert [e["message"] for e in log.events("s")] == ["kept"]
+    assert log.session("s")["status"] == "running"
+
+def test_resumed_run_reuses_the_digests_it_logged(stub, tmp_path):
+    cfg, url = stub
+    log = EventLog(str(tmp_path / "sessions.sqlite"))
+    log.start("ref", {"task": "t"})
+    before = cfg.stats["requests"]
+    run(url, log, "ref", "rounds", False, max_turns=12, summary_model="gpt-4.1-nano")
+    calls = cfg.stats["requests"] - before
+    reference = log.events("ref")
+
+    log.start("s", {"task": "t"})
+    run(url, log, "s", "rounds", False, stop_after=11, max_turns=12, summary_model="gpt-4.1-nano")
+    replay = log.resume("s")
+    digests = log.digests("s")
+    # Rounds 1 and 2 were condensed before the consensus turn it stopped after.
+    assert len(replay) == 11 and [d["segment"]["label"] for d in digests] == ["Round 1", "Round 2"]
+
+    before = cfg.stats["requests"]
+    run(url, log, "s", "rounds", False, replay=replay, digests=digests, max_turns=12, summary_model="gpt-4.1-nano")
+    # Neither the replayed turns nor the logged digests are asked for again...
+    assert cfg.stats["requests"] - before == calls - len(replay) - len(digests)
+    # ...and the resumed log has the same shape, with each digest logged once.
+    got = log.events("s")
+    assert [(e["type"], e["sender"]) for e in got] == [(e["type"], e["sender"]) for e in reference]
+    spans = lambda evs: [(e["segment"]["label"], e["segment"]["start"], e["segment"]["end"], e["segment"]["level"]) for e in evs if e["type"] == "summary"]
+    assert spans(got) == spans(reference)
+    assert [e["digest"] for e in got if e["type"] == "summary"][:2] == [d["digest"] for d in digests]
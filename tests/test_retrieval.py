@@ -0,0 +1,36 @@
+from core.retrieval import DocumentIndex, chunk_text, build_index, report_key
+from core.tokens import tokenizer_for
+
+FILES = {
+    "pricing.txt": "Our pricing has three tiers. " * 20 + "The enterprise tier costs 900 dollars per seat.",
+    "hiring.txt": "We plan to hire two engineers and a designer next quarter. " * 20,
+    "empty.txt": "",
+}
+
+def test_chunks_overlap_and_cover_the_text():
+    text = " ".join(f"w{i}" for i in range(1000))
+    chunks = chunk_text(text, size=300, overlap=50)
+    assert chunks[0][0] == 0 and text.endswith(chunks[-1][1])
+    for (a, pa), (b, _) in zip(chunks, chunks[1:]):
+        assert a < b <= a + len(pa)
+
+def test_search_ranks_the_relevant_chunk_first():
+    idx = DocumentIndex(FILES, size=300, overlap=50)
+    _, best = idx.search("enterprise seat price")[0]
+    assert idx.chunks[best][0] == "pricing.txt" and "900 dollars" in idx.chunks[best][2]
+    assert idx.search("zebra") == []
+
+def test_excerpt_stays_within_budget():
+    idx = DocumentIndex(FILES, size=300, overlap=50)
+    tok = tokenizer_for("gpt-4o-mini")
+    ex = idx.excerpt("hire engineers", 120, tok)
+    assert ex.startswith("[hiring.txt @") and tok.count(ex) <= 120
+    assert idx.excerpt("hire engineers", 5, tok)
+
+def test_indexes_are_memoized_by_key():
+    report = [{"name": "pricing.txt", "sha256": "a"}, {"name": "hiring.txt", "sha256": "b"}]
+    key = report_key(report)
+    assert key != report_key([{**report[0], "sha256": "c"}, report[1]])
+    assert build_index(FILES, key=key) is build_index(dict(FILES), key=key)
+    assert build_index(FILES) is not build_index({**FILES, "new.txt": "more"})
+    assert build_index({}) is None
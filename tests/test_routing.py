@@ -0,0 +1,43 @@
+from core.agents import Employee, Manager
+from core.convergence import ConvergencePolicy
+from core.routing import ModelRouter
+
+def test_rules_go_from_role_and_phase_to_role_to_phase():
+    r = ModelRouter(phases={"synthesis": "big", "round1": ""}, roles={"Writer/consensus": "mid", "Writer": "small"})
+    assert r.route("Writer", "consensus", "own") == ("Writer/consensus", "mid", False)
+    assert r.route("Writer", "synthesis", "own") == ("Writer", "small", False)
+    assert r.route("Analyst", "synthesis", "own") == ("synthesis", "big", False)
+    # Empty rules are dropped, so the agent's own model is used.
+    assert r.route("Analyst", "round1", "own") == ("default", "own", False)
+
+def test_slow_models_fall_back_until_the_cooldown_ends():
+    r = ModelRouter(phases={"round1": "big"}, fallback={"big": "small", "small": "big"}, slo_s=1.0, window=3, cooldown=60.0)
+    r.observe("big", 2.0)
+    r.observe("big", 0.5)
+    assert r.route("Analyst", "round1", "own")[1] == "big"
+    r.observe("big", 3.0)
+    assert r.route("Analyst", "round1", "own") == ("round1", "small", True)
+    assert set(r.degraded()) == {"big"}
+    # Fallback cycles stop at a model already tried.
+    r.observe("small", 5.0)
+    r.observe("small", 5.0)
+    r.observe("small", 5.0)
+    assert r.route("Analyst", "round1", "own")[1] == "small"
+    r.cooldown = 0.0
+    r._degraded.clear()
+    assert r.route("Analyst", "round1", "own")[1] == "big"
+
+def test_without_an_slo_nothing_is_degraded():
+    r = ModelRouter(fallback={"big": "small"})
+    for _ in range(5):
+        r.observe("big", 100.0)
+    assert r.degraded() == {}
+
+def test_manager_calls_use_and_record_their_route(stub):
+    _, url = stub
+    team = [Employee(r, "goal", api_key="sk-test", base_url=url) for r in ("Analyst", "Writer")]
+    router = ModelRouter.from_config({"phases": {"synthesis": "gpt-4o"}, "roles": {"Writer": "gpt-4.1-nano"}})
+    m = Manager(team, api_key="sk-test", base_url=url, max_turns=4, router=router, convergence=ConvergencePolicy(enabled=False))
+    done = [e for e in m.delegate_task("Plan a product launch", lookahead=0) if e["type"] in ("agent", "final_result")]
+    routes = {(e["sender"], e["telemetry"]["route"], e["telemetry"]["model"]) for e in done}
+    assert routes == {("Analyst", "default", "gpt-4o-mini"), ("Writer", "Writer", "gpt-4.1-nano"), ("Manager", "synthesis", "gpt-4o")}
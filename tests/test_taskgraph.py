@@ -0,0 +1,34 @@
+from core.taskgraph import parse_plan, topo_order, Node, depth
+
+ROLES = ["Research Specialist", "Technical Expert"]
+
+def test_parses_fenced_json_in_dependency_order():
+    text = 'Plan:\n```json\n{"nodes": [{"id": "b", "role": "Technical Expert", "task": "build", "depends_on": ["a"]}, {"id": "a", "role": "Research Specialist", "task": "research", "depends_on": []}]}\n```'
+    nodes = parse_plan(text, ROLES)
+    assert [n.id for n in nodes] == ["a", "b"]
+    assert nodes[1].deps == ["a"]
+
+def test_rejects_cycles():
+    text = '{"nodes": [{"id": "a", "task": "x", "depends_on": ["b"]}, {"id": "b", "task": "y", "depends_on": ["a"]}]}'
+    assert parse_plan(text, ROLES) is None
+    a, b = Node("a", "r", "x", ["b"]), Node("b", "r", "y", ["a"])
+    assert topo_order([a, b]) is None
+
+def test_bad_json_and_empty_plans():
+    assert parse_plan("no json here", ROLES) is None
+    assert parse_plan('{"nodes": [{"id": "a", "task": "x",}]}', ROLES) is None
+    assert parse_plan('{"nodes": "a"}', ROLES) is None
+    assert parse_plan('{"nodes": [{"id": "a", "task": "  "}]}', ROLES) is None
+    assert parse_plan('{"nodes": [{"id": "a", "task": "x"}]}', []) is None
+
+def test_cleans_roles_ids_and_dependencies():
+    text = '[{"id": "a", "role": "Astronaut", "task": "x", "depends_on": ["a", "zz", "a"]}, {"id": "a", "role": "Astronaut", "task": "y", "depends_on": ["a", "a"]}]'
+    nodes = parse_plan(text, ROLES)
+    assert [n.role for n in nodes] == ROLES
+    assert [n.id for n in nodes] == ["a", "a_2"]
+    assert nodes[0].deps == [] and nodes[1].deps == ["a"]
+    assert depth(nodes) == 2
+
+def test_caps_the_number_of_nodes():
+    text = '[' + ",".join(f'{{"id": "n{i}", "task": "t{i}"}}' for i in range(20)) + ']'
+    assert len(parse_plan(text, ROLES, max_nodes=5)) == 5
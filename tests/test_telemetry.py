@@ -0,0 +1,46 @@
+import asyncio
+import pytest
+
+from core.agents import Employee
+from core.telemetry import estimate_cost, price_for, summarize
+
+def test_prices_use_the_longest_model_prefix():
+    assert price_for("gpt-4o-mini-2024-07-18") == (0.15, 0.60)
+    assert price_for("gpt-4o-2024-08-06") == (2.50, 10.00)
+    assert price_for("my-local-model") is None
+    assert estimate_cost("my-local-model", 10, 10) is None
+
+def test_cached_prompt_tokens_are_discounted():
+    full = estimate_cost("gpt-4o", 1_000_000, 0)
+    assert full == pytest.approx(2.50)
+    assert estimate_cost("gpt-4o", 1_000_000, 0, cached_tokens=1_000_000) == pytest.approx(1.25)
+    assert estimate_cost("gpt-4o-mini", 0, 1_000_000) == pytest.approx(0.60)
+
+def test_summary_groups_calls_by_agent_phase_and_model():
+    msgs = [
+        {"sender": "Analyst", "type": "agent", "telemetry": {"phase": "round1", "model": "m", "latency_s": 1.0, "prompt_tokens": 10, "completion_tokens": 5, "cost_usd": 0.1}},
+        {"sender": "Analyst", "type": "agent", "telemetry": {"phase": "round2", "model": "m", "latency_s": 3.0, "prompt_tokens": 20, "completion_tokens": 5, "cost_usd": 0.2, "cached": True}},
+        {"sender": "Writer", "type": "agent", "telemetry": {"phase": "round1", "model": "n", "latency_s": 2.0, "prompt_tokens": 30, "completion_tokens": 5, "cost_usd": None}},
+        {"sender": "Manager", "type": "manager", "message": "no call"},
+    ]
+    s = summarize(msgs)
+    assert s["total"]["calls"] == 3 and s["total"]["cached"] == 1
+    assert s["total"]["prompt_tokens"] == 60 and s["total"]["cost_usd"] == pytest.approx(0.3)
+    assert s["by_agent"]["Analyst"]["calls"] == 2 and s["by_agent"]["Analyst"]["latency_s"] == 4.0
+    assert set(s["by_phase"]) == {"round1", "round2"} and set(s["by_model"]) == {"m", "n"}
+    assert s["by_route"] == {"—": s["total"]}
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_calls_fill_the_callers_stats(stub, stream):
+    _, url = stub
+    e = Employee("Tester", "test", api_key="sk-test", base_url=url)
+    stats = {}
+
+    async def run():
+        if stream:
+            return "".join([d async for d in e.agenerate_stream("hello", stats=stats)])
+        return await e.agenerate("hello", stats=stats)
+    assert asyncio.run(run())
+    assert stats["model"] == "gpt-4o-mini" and not stats["cached"]
+    assert stats["prompt_tokens"] > 0 and stats["completion_tokens"] > 0
+    assert 0 < stats["ttft_s"] <= stats["latency_s"] and stats["cost_usd"] > 0
@@ -0,0 +1,38 @@
+from core.agents import Employee, Manager
+from core.tokens import Tokenizer, PromptBudget, context_window, tokenizer_for
+
+def test_context_window_uses_the_longest_model_prefix():
+    assert context_window("gpt-4o-mini") == 128_000
+    assert context_window("gpt-4-0613") == 8_192
+    assert context_window("unknown-model") == 8_192
+
+def test_head_and_tail_stay_within_the_token_budget():
+    tok = tokenizer_for("gpt-4o-mini")
+    text = " ".join(f"word{i}" for i in range(2000))
+    head, tail = tok.head(text, 50), tok.tail(text, 50)
+    assert text.startswith(head) and text.endswith(tail)
+    assert 0 < tok.count(head) <= 50 and 0 < tok.count(tail) <= 50
+    assert tok.head("short", 50) == "short" and tok.head(text, 0) == ""
+
+def test_memo_does_not_keep_the_input_text():
+    tok = Tokenizer("gpt-4o-mini")
+    blob = "upload " * 50_000
+    first = tok.head(blob, 100)
+    assert tok.head(blob, 100) == first
+    keys = list(tok._cache)
+    assert keys and not any(isinstance(part, str) and len(part) > 16 for k in keys for part in k)
+
+def test_budget_is_split_between_slots():
+    b = PromptBudget("gpt-4o-mini", total=10_000)
+    assert b["system"] + b["file"] + b["transcript"] + b["completion"] <= 10_000
+    assert PromptBudget("gpt-4o-mini").total == PromptBudget.MAX_TOTAL
+    assert PromptBudget("gpt-4").total == 4096
+    assert PromptBudget("gpt-4", total=100_000).total == 8_192
+
+def test_manager_windows_follow_the_prompt_budget():
+    def manager(total):
+        e = Employee("Tester", "test", api_key="sk-test")
+        return Manager([e], api_key="sk-test", budget=PromptBudget("gpt-4o-mini", total=total))
+    small, large = manager(4000), manager(16000)
+    assert large._window("round") == 4 * small._window("round")
+    assert small._window("context") + small._window("round") <= small.budget["transcript"]
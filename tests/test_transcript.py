@@ -0,0 +1,56 @@
+from core.transcript import Transcript
+
+def transcript(n: int = 6) -> Transcript:
+    t = Transcript("BRIEF: plan a launch")
+    for i in range(n):
+        t.append(f"Agent{i % 3}", f"R{i // 3 + 1}", f"turn {i} " + "detail " * 20)
+    return t
+
+def test_window_keeps_whole_turns_within_budget():
+    t = transcript()
+    per_turn = t.turns[0].tokens
+    w = t.window(t.header_tokens + 2 * per_turn + 1)
+    assert w.startswith("BRIEF")
+    assert "turn 4 " in w and "turn 5 " in w and "turn 3 " not in w
+    assert t.tok.count(w) <= t.header_tokens + 2 * per_turn + 5
+
+def test_window_drops_a_header_that_does_not_fit_and_honours_since():
+    t = transcript()
+    w = t.window(t.turns[0].tokens * 3, header=False, since=4)
+    assert not w.startswith("BRIEF")
+    assert w.count("**Agent") == 2
+
+def test_oversized_turn_is_clipped_to_its_tail():
+    t = Transcript()
+    t.append("Agent", "R1", "word " * 500 + "END")
+    w = t.window(20, header=False)
+    assert w.startswith("…") and w.endswith("END")
+    assert t.tok.count(w) <= 21
+
+def test_windows_are_refreshed_after_append():
+    t = transcript(3)
+    before = t.window(10_000)
+    t.append("Agent9", "R9", "fresh")
+    assert "fresh" in t.window(10_000) and "fresh" not in before
+
+def test_extended_windows_match_fresh_renders():
+    t = transcript(0)
+    keys = [(200, True, 0), (60, False, 0), (120, True, 4), (5, False, 0)]
+    for i in range(14):
+        t.append(f"Agent{i % 3}", "R1", f"turn {i} " + "detail " * (5 + 7 * (i % 4)))
+        fresh = transcript(0)
+        for u in t.turns:
+            fresh.append(u.sender, u.tag, u.text)
+        for k in keys:
+            assert t.window(*k) == fresh.window(*k)
+
+def test_log_is_an_append_only_prefix_until_it_outgrows_the_budget():
+    t = transcript(2)
+    budget = t.turns[0].tokens * 4
+    first = t.log(budget)
+    t.append("Agent2", "R1", "turn 2 " + "detail " * 20)
+    second = t.log(budget)
+    assert second.startswith(first)
+    for i in range(3, 12):
+        t.append("Agent0", "R2", f"turn {i} " + "detail " * 20)
+        assert t.tok.count(t.log(budget)) <= budget + len(t.turns)
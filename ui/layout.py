@@ -1,5 +1,6 @@
 import streamlit as st
 from config.predefined_agents import PREDEFINED_AGENTS
+from core.timeline import Timeline
 from datetime import datetime
 
 CSS = """
@@ -12,65 +13,118 @@ def render_header():
     st.markdown(CSS, unsafe_allow_html=True)
     st.markdown('<div class="main-header"><h1>🤖 Krew - The AI Agent Organization</h1><p>Specialized agents collaborate to solve complex tasks</p><p>Made by AMP Squad - MIT ADTU, SIH 2025</p></div>', unsafe_allow_html=True)
 
-def render_messages():
+PAGE_SIZE = 10
+
+def render_messages(tl: Timeline = None):
+    tl = st.session_state.timeline if tl is None else tl
     st.subheader("💬 Agent Collaboration")
-    total = len(st.session_state.messages)
-    agent_msgs = len([m for m in st.session_state.messages if m.get("type") == "agent"])
-    finals = len([m for m in st.session_state.messages if m.get("type") == "final_result"])
     c1, c2, c3, c4 = st.columns(4)
-    with c1: st.metric("Total Messages", total)
-    with c2: st.metric("Agent Responses", agent_msgs)
-    with c3: st.metric("Completed Tasks", finals)
-    with c4:
-        if st.session_state.messages:
-            first_ts = st.session_state.messages[0].get("timestamp")
-            st.metric("Session Time", "—" if not first_ts else "Active")
+    with c1: st.metric("Total Messages", len(tl))
+    with c2: st.metric("Agent Responses", tl.counts["agent"])
+    with c3: st.metric("Completed Tasks", tl.counts["final_result"])
+    tel = tl.telemetry()
+    tot = tel["total"]
+    with c4: st.metric("Est. Cost", f"${tot['cost_usd']:.4f}", help=f"{tot['prompt_tokens']:,} prompt + {tot['completion_tokens']:,} completion tokens over {tot['calls']} call(s), {tot['cached']} cached")
+    if tot["calls"]:
+        with st.expander(f"⏱️ Telemetry — {tot['latency_s']:.1f}s model time, avg {tot['avg_latency_s']:.2f}s, p95 {tot['p95_latency_s']:.2f}s, TTFT {tot['avg_ttft_s']:.2f}s"):
+            for title, key in (("By agent", "by_agent"), ("By phase", "by_phase"), ("By model", "by_model"), ("By route", "by_route")):
+                st.markdown(f"**{title}**")
+                st.dataframe([{"": k, **v} for k, v in tel[key].items()], hide_index=True, use_container_width=True)
+    if not tl.sections:
+        return
+
+    # Only one phase section is drawn; earlier ones collapse into the selector. The selector
+    # has no key, so it follows the newest section whenever a new phase starts.
+    n = len(tl.sections)
+    sec = st.radio("Section", range(n), index=n - 1, horizontal=True, format_func=lambda i: f"{tl.label(i)} ({tl.size(i)}" + ("" if tl.seconds(i) is None else f" · {tl.seconds(i):.1f}s") + ")", label_visibility="collapsed")
+    items = tl.section(sec)
+    start = tl.sections[sec][1]
+    # "thinking" notices are only useful while that turn is still pending. Each item keeps
+    # its position in the run, which keys its widgets.
+    items = [(start + k, m) for k, m in enumerate(items) if m.get("type") != "thinking" or k == len(items) - 1]
+    pages = max(1, -(-len(items) // PAGE_SIZE))
+    page = pages
+    if pages > 1:
+        page = st.number_input(f"Page (of {pages}, newest last)", 1, pages, pages, key=f"page_{sec}_{pages}")
+    # Pages are cut from the end so the newest page is always full.
+    end = len(items) - (pages - page) * PAGE_SIZE
+    for seq, m in items[max(0, end - PAGE_SIZE):end]:
+        _render_message(m, seq)
+
+def _render_message(m, seq: int):
+    t = m.get("type", "message")
+    sender = m.get("sender", "Unknown")
+    content = m.get("message", "")
+    ts = m.get("timestamp", "")
+    if t == "final_result":
+        st.markdown(f"### 🎉 Final Result from {sender}  \n<small>{ts}</small>", unsafe_allow_html=True)
+        st.markdown(content)
+        _telemetry_caption(m)
+        cv = m.get("convergence")
+        if cv:
+            st.caption(f"Turns run: {cv['turns_run']}/{cv['turns_planned']} · saved {cv['turns_saved']} turn(s), ≈{cv['tokens_saved_est']:,} tokens" + (" · stopped on convergence" if cv["stopped_early"] else ""))
+        c1, c2, c3 = st.columns(3)
+        with c1:
+            if st.feedback("thumbs", key=f"fb_{seq}_{m.get('ts_ns', '')}") is not None:
+                st.caption("Feedback recorded")
+        with c2.popover("🔄 Request Refinement", use_container_width=True):
+            r = st.text_input("What would you like improved?", key=f"in_{seq}_{m.get('ts_ns', '')}")
+            if r and f"Refinement: {r}" not in st.session_state.user_suggestions:
+                st.session_state.user_suggestions += f"\nRefinement: {r}"
+        with c3.popover("📤 Share Result", use_container_width=True):
+            st.code(content)
+    elif t == "manager":
+        with st.chat_message("assistant", avatar="👨‍💼"):
+            st.markdown(f"**{sender}** *{ts}*")
+            st.markdown(content)
+    elif t == "agent":
+        icon = PREDEFINED_AGENTS.get(sender, {}).get("icon", "🤖")
+        with st.chat_message("assistant", avatar=icon):
+            st.markdown(f"**{sender}** *{ts}*" + (f" · `{m['node']}`" if m.get("node") else ""))
+            st.markdown(content)
+            _telemetry_caption(m)
+    elif t == "summary":
+        with st.expander(content.replace("**", "")):
+            st.markdown(m.get("digest", ""))
+            _telemetry_caption(m)
+    elif t == "thinking":
+        with st.chat_message("assistant"):
+            st.markdown(f"*{content}*")
+    elif t == "completion":
+        st.success(content)
+    elif t == "timeout":
+        st.warning(content)
+    else:
+        with st.chat_message("assistant"):
+            st.markdown(f"**{sender}** *{ts}*")
+            st.markdown(content)
+
+def _telemetry_caption(m):
+    t = m.get("telemetry")
+    if not t or "latency_s" not in t:
+        return
+    cost = "cached" if t["cached"] else ("—" if t["cost_usd"] is None else f"${t['cost_usd']:.4f}")
+    st.caption(f"{t['model']} · {t['latency_s']:.2f}s (TTFT {t['ttft_s']:.2f}s) · {t['prompt_tokens']:,}→{t['completion_tokens']:,} tok{'≈' if t['estimated_tokens'] else ''}" + (f" ({t['cached_tokens']:,} cached)" if t.get("cached_tokens") else "") + f" · {cost}")
+
+STATUS_ICONS = {"running": "🟡", "done": "🟢", "failed": "🔴", "cancelled": "⚪"}
 
-    box = st.container()
-    with box:
-        for i, m in enumerate(st.session_state.messages):
-            t = m.get("type", "message")
-            sender = m.get("sender", "Unknown")
-            content = m.get("message", "")
-            ts = m.get("timestamp", "")
-            if t == "final_result":
-                st.markdown(f"### 🎉 Final Result from {sender}  \n<small>{ts}</small>", unsafe_allow_html=True)
-                st.markdown(content)
-                c1, c2, c3 = st.columns(3)
-                with c1:
-                    if st.button("👍 Great Result", key=f"like_{i}"):
-                        st.success("Feedback recorded")
-                with c2:
-                    if st.button("🔄 Request Refinement", key=f"ref_{i}"):
-                        r = st.text_input("What would you like improved?", key=f"in_{i}")
-                        if r:
-                            st.session_state.user_suggestions += f"\nRefinement: {r}"
-                with c3:
-                    if st.button("📤 Share Result", key=f"sh_{i}"):
-                        st.code(content)
-            elif t == "manager":
-                with st.chat_message("assistant", avatar="👨‍💼"):
-                    st.markdown(f"**{sender}** *{ts}*")
-                    st.markdown(content)
-            elif t == "agent":
-                icon = PREDEFINED_AGENTS.get(sender, {}).get("icon", "🤖")
-                with st.chat_message("assistant", avatar=icon):
-                    st.markdown(f"**{sender}** *{ts}*")
-                    st.markdown(content)
-            elif t == "thinking":
-                with st.chat_message("assistant"):
-                    st.markdown(f"*{content}*")
-            elif t == "completion":
-                st.success(content)
-            elif t == "timeout":
-                st.warning(content)
-            else:
-                with st.chat_message("assistant"):
-                    st.markdown(f"**{sender}** *{ts}*")
-                    st.markdown(content)
-    if st.session_state.messages:
-        st.markdown('<div id="bottom"></div>', unsafe_allow_html=True)
-        st.markdown("<script>document.getElementById('bottom').scrollIntoView({behavior:'smooth'});</script>", unsafe_allow_html=True)
+def render_history(sessions, jobs):
+    # Past runs from the event log. Returns ("replay" | "resume", session_id) when a button is clicked.
+    if not sessions:
+        return None
+    action = None
+    with st.expander(f"🗂️ Session History ({len(sessions)})", expanded=False):
+        for s in sessions:
+            job = jobs.get(s["session_id"])
+            live = job is not None and job.active
+            c1, c2, c3 = st.columns([6, 1, 1])
+            c1.markdown(f"{STATUS_ICONS.get(s['status'], '⚪')} **{s['task'][:60] or 'Untitled'}**  \n<small>`{s['session_id'][:8]}` · {s['status']}{' (live)' if live else ''} · {s['events']} events · {datetime.fromtimestamp(s['updated']).strftime('%Y-%m-%d %H:%M')}</small>", unsafe_allow_html=True)
+            if c2.button("👁️ Replay", key=f"replay_{s['session_id']}", use_container_width=True):
+                action = ("replay", s["session_id"])
+            # "running" without a live job means the process died mid-run.
+            if c3.button("▶️ Resume", key=f"resume_{s['session_id']}", use_container_width=True, disabled=live or s["status"] == "done" or not st.session_state.api_key.startswith("sk-")):
+                action = ("resume", s["session_id"])
+    return action
 
 def render_footer():
     st.markdown("---")
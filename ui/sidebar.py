@@ -1,5 +1,15 @@
 import streamlit as st
 from config.predefined_agents import PREDEFINED_AGENTS
+from core.clients import pool_stats
+from core.cache import shared_cache
+from core.ratelimit import shared_scheduler
+from core.jobs import shared_jobs
+from core.memory import SUMMARY_MODEL
+from core.telemetry import PRICES
+from core.session import reset_messages
+
+ROUTED_PHASES = {"round1": "Initial Analysis Model", "round2": "Building Model", "consensus": "Consensus Model", "synthesis": "Synthesis Model"}
+MODEL_CHOICES = [""] + list(PRICES)
 
 def render_sidebar():
     st.title("🛠️ Control Center")
@@ -11,13 +21,76 @@ def render_sidebar():
 
     st.subheader("⚙️ Session Settings")
     st.session_state.max_turns = st.slider("Max Collaboration Rounds", 5, 25, st.session_state.max_turns)
+    st.session_state.workflow = st.radio("Workflow", ["rounds", "graph"], index=["rounds", "graph"].index(st.session_state.workflow), horizontal=True, format_func={"rounds": "Round-robin", "graph": "Task graph"}.get, help="Task graph: the Manager plans dependent subtasks; independent ones run in parallel and each sees only its inputs.")
+    st.session_state.parallel_rounds = st.toggle("Parallel Initial Analysis", value=st.session_state.parallel_rounds, help="Run the first round for all agents at once (async).")
+    st.session_state.stream_responses = st.toggle("Stream Responses", value=st.session_state.stream_responses, help="Show agent replies token by token as they are generated.")
+    st.session_state.deterministic = st.toggle("Deterministic Mode", value=st.session_state.deterministic, help="Temperature 0. Repeated runs on identical inputs are served from the response cache.")
+    st.session_state.early_stop = st.toggle("Early Stop on Convergence", value=st.session_state.early_stop, help="Skip remaining turns once replies stop adding new content.")
+    if st.session_state.early_stop:
+        st.session_state.novelty_threshold = st.slider("Novelty Threshold", 0.05, 0.8, st.session_state.novelty_threshold, 0.05, help="A reply with less than this share of new word 3-grams counts as repetitive.")
+    st.session_state.rolling_summaries = st.toggle("Rolling Summaries", value=st.session_state.rolling_summaries, help=f"Condense older rounds with {SUMMARY_MODEL} so long runs keep their early decisions in view within the same prompt budget.")
+    st.session_state.stable_prompts = st.toggle("Prefix-stable Prompts", value=st.session_state.stable_prompts, help="Every prompt starts with the same team rules, brief and file excerpt, and the discussion is an append-only log, so provider prefix caching can reuse earlier prompts.")
+    st.session_state.model_routing = st.toggle("Model Routing", value=st.session_state.model_routing, help="Pick the model per phase and role (see MODEL_ROUTES in config/predefined_agents.py) instead of one model for every call.")
+    if st.session_state.model_routing:
+        routes = st.session_state.model_routes
+        for phase, label in ROUTED_PHASES.items():
+            cur = routes["phases"].get(phase, "")
+            routes["phases"][phase] = st.selectbox(label, MODEL_CHOICES, index=MODEL_CHOICES.index(cur) if cur in MODEL_CHOICES else 0, format_func=lambda m: m or "Agent default", key=f"route_{phase}")
+        slo = st.number_input("Latency SLO (s)", 0.0, 120.0, float(routes.get("slo_s") or 0.0), 0.5, help="Median time to first token above this moves a model's calls to its fallback for a minute. 0 disables.")
+        routes["slo_s"] = slo or None
+    st.session_state.use_cache = st.toggle("Response Cache", value=st.session_state.use_cache, help="Reuse answers for identical requests. Only temperature-0 calls are cached.")
 
     if st.session_state.messages:
-        m = len(st.session_state.messages)
-        a = len([x for x in st.session_state.messages if x.get("type") == "agent"])
         c1, c2 = st.columns(2)
-        c1.metric("Messages", m)
-        c2.metric("Agent Responses", a)
+        c1.metric("Messages", len(st.session_state.timeline))
+        c2.metric("Agent Responses", st.session_state.timeline.counts["agent"])
+    with st.expander("🔌 Connection Pool", expanded=False):
+        ps = pool_stats()
+        c1, c2 = st.columns(2)
+        c1.metric("Requests", ps["requests"])
+        c2.metric("Connections", ps["connections_opened"])
+        c1.metric("Reuse", f"{ps['reuse_ratio']:.0%}")
+        c2.metric("Avg Latency", f"{ps['avg_latency_ms']:.0f} ms")
+        st.caption(f"HTTP/2: {'on' if ps['http2'] else 'off'} · max {ps['max_connections']} connections")
+    with st.expander("🧵 Background Runs", expanded=False):
+        js = shared_jobs().summary()
+        c1, c2 = st.columns(2)
+        c1.metric("Running", f"{js['running']}/{js['max_concurrent']}")
+        c2.metric("Queued", js["queued"] if js["max_queued"] is None else f"{js['queued']}/{js['max_queued']}")
+        st.caption(f"Avg wait {js['avg_wait_s']}s · oldest waiting {js['oldest_wait_s']}s" + (f" · {js['rejected']} refused" if js["rejected"] else ""))
+        job = shared_jobs().get(st.session_state.session_id)
+        if job is not None:
+            j = job.summary()
+            st.caption(f"This session: {j['status']} · waited {j['wait_s']}s · ran {j['run_s']}s")
+    with st.expander("🚦 Rate Limits", expanded=False):
+        rl, ld = shared_scheduler().summary(), shared_scheduler().load()
+        mine = ld["sessions"].get(st.session_state.session_id)
+        cap = lambda n: "∞" if n is None else n
+        st.caption(f"In flight {ld['inflight']}/{cap(ld['max_inflight'])} (≤{cap(ld['session_inflight'])} per run) · {ld['waiting']} waiting · {len(ld['sessions'])} session(s)")
+        if mine:
+            st.caption(f"This session: {mine['calls']} calls · avg wait {mine['avg_queued_s']}s · max {mine['max_queued_s']}s")
+        if not rl:
+            st.caption("No model calls yet")
+        for model, r in rl.items():
+            st.markdown(f"**{model}**")
+            c1, c2 = st.columns(2)
+            c1.metric("Calls", r["calls"])
+            c2.metric("Throttled (429)", r["throttled"])
+            c1.metric("Retries", r["retries"])
+            c2.metric("Queued", f"{r['queued_s']:.1f} s")
+            lim = lambda b: "unknown" if b["limit"] is None else f"{b['available']:,.0f}/{b['limit']:,.0f}"
+            st.caption(f"Requests {lim(r['requests'])} · tokens {lim(r['tokens'])} per min" + (f" · paused {r['blocked_s']}s" if r["blocked_s"] else ""))
+    with st.expander("🗃️ Response Cache", expanded=False):
+        cs = shared_cache().summary()
+        c1, c2 = st.columns(2)
+        c1.metric("Hit Ratio", f"{cs['hit_ratio']:.0%}")
+        c2.metric("Misses", cs["misses"])
+        c1.metric("Memory Hits", cs["memory_hits"])
+        c2.metric("Disk Hits", cs["disk_hits"])
+        st.caption(f"{cs.get('disk_items', 0)} entries · {cs.get('disk_bytes', 0) / 1024:.0f} KB on disk")
+        if st.button("🧹 Clear Cache", use_container_width=True):
+            shared_cache().clear()
+            st.rerun()
     st.divider()
 
     st.subheader("👥 Team Management")
@@ -84,8 +157,10 @@ def render_sidebar():
 
     st.divider()
     if st.button("🔄 New Session", use_container_width=True, type="secondary"):
-        for k in ["messages", "file_content", "current_task", "user_suggestions"]:
-            st.session_state[k] = [] if k == "messages" else ({} if k == "file_content" else "")
+        shared_jobs().cancel(st.session_state.session_id)
+        reset_messages()
+        for k in ["file_content", "current_task", "user_suggestions"]:
+            st.session_state[k] = {} if k == "file_content" else ""
         import uuid
         st.session_state.session_id = str(uuid.uuid4())
         st.rerun()